@@ -0,0 +1,120 @@
+"""
+Circuit breaker for an upstream endpoint.
+
+Closed: requests flow and failures are counted; `failure_threshold`
+failures in a row open the circuit. Open: requests are refused without touching
+the upstream until `recovery_timeout` has passed. Half-open: a single trial
+request is let through; success closes the circuit, failure opens it again
+with the recovery timeout doubled (up to `max_recovery_timeout`). Requests
+hold the ticket `allow` gave them, so only the trial itself frees the
+trial slot when it ends without a verdict.
+"""
+
+import random
+import time
+from collections.abc import Callable
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Three-state circuit breaker with exponential, jittered recovery."""
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        recovery_timeout: float = 1.0,
+        max_recovery_timeout: float = 60.0,
+        on_change: Callable[[str], None] | None = None,
+    ) -> None:
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            recovery_timeout: Seconds the circuit stays open the first time
+            max_recovery_timeout: Upper bound for the doubled open time
+            on_change: Optional callback with the new state on every transition
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.max_recovery_timeout = max_recovery_timeout
+        self.on_change = on_change
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.trips = 0  # consecutive openings, for the exponential backoff
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self._trials = 0  # number of the latest trial, its ticket
+
+    def available(self, now: float) -> bool:
+        """Whether a request could be let through now (no state change)."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return now >= self.open_until
+        return not self.trial_in_flight
+
+    def allow(self, now: float) -> int | None:
+        """
+        Admit a request, moving from open to half-open once the timeout passed.
+
+        Returns:
+            None if the request must be refused, otherwise the ticket to pass
+            to `finish`: the trial's number for a half-open trial, else 0
+        """
+        if not self.available(now):
+            return None
+        if self.state == OPEN:
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            self.trial_in_flight = True
+            self._trials += 1
+            return self._trials
+        return 0
+
+    def finish(self, ticket: int) -> None:
+        """
+        A request ended. If it was the current trial and ended without a
+        verdict (e.g. cancelled), allow a new trial; requests admitted
+        before the circuit went half-open leave the trial slot alone.
+        """
+        if ticket and ticket == self._trials:
+            self.trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self.trips = 0
+        self.trial_in_flight = False
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        """Count a failed request; a failed trial reopens the circuit at once."""
+        self.consecutive_failures += 1
+        self.trial_in_flight = False
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    def half_open(self) -> None:
+        """Allow a trial request right away (e.g. after a successful probe)."""
+        if self.state == OPEN:
+            self.open_until = 0.0
+            self._set_state(HALF_OPEN)
+
+    def retry_after(self, now: float) -> float:
+        """Seconds until the circuit lets a request through again."""
+        return max(self.open_until - now, 0.0) if self.state == OPEN else 0.0
+
+    def _open(self) -> None:
+        timeout = min(self.max_recovery_timeout, self.recovery_timeout * 2**self.trips)
+        self.trips += 1
+        self.open_until = time.monotonic() + timeout * random.uniform(0.8, 1.2)
+        if self.state != OPEN:
+            self._set_state(OPEN)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        if self.on_change is not None:
+            self.on_change(state)
@@ -0,0 +1,151 @@
+"""
+Bounded in-memory cache with single-flight request coalescing.
+
+Entries are evicted least-recently-used first once either the entry count or
+the total byte estimate exceeds its cap, and expire after a fixed TTL.
+Concurrent lookups for a key that is already being computed wait on the same
+computation instead of starting another one; the computation is cancelled
+only once every caller waiting on it has been cancelled.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+from typing import Any, Literal
+
+CacheOutcome = Literal["hit", "miss", "coalesced", "bypass"]
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    expires_at: float
+
+
+class ResponseCache:
+    """LRU + TTL cache with a byte-size cap and single-flight computation."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        ttl: float,
+        sizeof: Callable[[Hashable, Any], int],
+    ) -> None:
+        """
+        Args:
+            max_entries: Maximum number of cached entries
+            max_bytes: Maximum total estimated size of cached entries
+            ttl: Seconds an entry stays valid after it is stored
+            sizeof: Estimates the memory footprint of a (key, value) pair
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.total_bytes = 0
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self._waiters: dict[asyncio.Future, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any | None:
+        """Return a fresh cached value and mark it recently used, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting least-recently-used entries to fit the caps."""
+        size = self.sizeof(key, value)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(value, size, time.monotonic() + self.ttl)
+        self.total_bytes += size
+        while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def delete(self, key: Hashable) -> None:
+        """Remove an entry if present."""
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.total_bytes = 0
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        lookup: bool = True,
+        store: bool = True,
+    ) -> tuple[Any, CacheOutcome]:
+        """
+        Return the cached value for `key`, computing it at most once.
+
+        The computation runs as its own task, so a waiter that is cancelled
+        does not abort it for the others; when the last waiter is cancelled
+        the computation is cancelled too. Its result is stored when it
+        finishes successfully. Failures are never cached.
+
+        Args:
+            key: Cache key
+            compute: Coroutine factory producing the value on a miss
+            lookup: Serve from cache / join an in-flight computation
+            store: Store the computed value
+
+        Returns:
+            Tuple of (value, outcome)
+        """
+        if lookup:
+            value = self.get(key)
+            if value is not None:
+                return value, "hit"
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                return await self._join(inflight), "coalesced"
+
+        task = asyncio.ensure_future(compute())
+        if lookup:
+            self._inflight[key] = task
+
+        def finish(done: asyncio.Future) -> None:
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
+            if store and not done.cancelled() and done.exception() is None:
+                self.put(key, done.result())
+
+        task.add_done_callback(finish)
+        value = await self._join(task)
+        return value, "miss" if lookup else "bypass"
+
+    async def _join(self, task: asyncio.Future) -> Any:
+        """Wait for a computation, cancelling it if this was its last waiter."""
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1:
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self.total_bytes -= entry.size
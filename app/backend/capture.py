@@ -0,0 +1,67 @@
+"""
+Traffic capture: an append-only JSONL log of the requests the backend served.
+
+Each entry holds a request's arrival time, endpoint, sanitized parameters,
+outcome and Ollama timings, which is what `benchmarks/replay.py` needs to
+send the same traffic again with the same gaps between arrivals.
+
+`record` only appends to an in-memory buffer, so capturing never blocks a
+request. `run` writes the buffer to the file every `flush_interval`
+seconds from a worker thread. When the buffer is full, new entries are
+dropped rather than slowing requests down.
+"""
+
+import asyncio
+import json
+import threading
+from pathlib import Path
+from typing import Any
+
+
+class TrafficRecorder:
+    """Buffered, non-blocking writer of capture entries."""
+
+    def __init__(self, path: str, max_buffered: int = 10_000, flush_interval: float = 1.0) -> None:
+        """
+        Args:
+            path: JSONL file to append to, created with its directory if missing
+            max_buffered: Entries held between flushes; more are dropped
+            flush_interval: Seconds between writes
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_buffered = max_buffered
+        self.flush_interval = flush_interval
+        self._buffer: list[dict[str, Any]] = []
+        self._write_lock = threading.Lock()
+
+    def record(self, entry: dict[str, Any]) -> bool:
+        """Queue an entry for writing; False if the buffer is full and it was dropped."""
+        if len(self._buffer) >= self.max_buffered:
+            return False
+        self._buffer.append(entry)
+        return True
+
+    async def flush(self) -> None:
+        entries, self._buffer = self._buffer, []
+        if entries:
+            await asyncio.to_thread(self._write, entries)
+
+    async def run(self) -> None:
+        """Background task: flush periodically, and once more when cancelled."""
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+        finally:
+            entries, self._buffer = self._buffer, []
+            if entries:
+                self._write(entries)
+
+    def _write(self, entries: list[dict[str, Any]]) -> None:
+        data = "".join(
+            json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for entry in entries
+        )
+        with self._write_lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
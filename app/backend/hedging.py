@@ -0,0 +1,142 @@
+"""
+Hedged requests: race several attempts at the same work, keep the first good one.
+
+`hedge` starts one candidate and, if it has not produced an acceptable
+result within `delay` seconds, starts the remaining candidates next to it.
+The first acceptable result wins and the other candidates are cancelled.
+A candidate that fails or returns an unacceptable result before the delay
+passes starts the remaining ones at once, since waiting no longer helps.
+
+With the delay set to a high percentile of normal latency (`LatencyWindow`),
+only the slowest requests are hedged, so the extra load stays small while
+their tail latency drops to roughly that of the fastest candidate.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class HedgeSkipped(Exception):
+    """Raised by a candidate that declines to run (e.g. no spare capacity)."""
+
+
+class LatencyWindow:
+    """The most recent latency samples, for percentile-based hedge delays."""
+
+    def __init__(self, size: int = 256, min_samples: int = 20) -> None:
+        """
+        Args:
+            size: Samples kept; older ones are dropped
+            min_samples: Samples needed before `quantile` returns a value
+        """
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        """Nearest-rank `q` quantile, or None until `min_samples` are seen."""
+        if len(self._samples) < max(self.min_samples, 1):
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(max(math.ceil(q * len(ordered)) - 1, 0), len(ordered) - 1)]
+
+
+@dataclass
+class HedgeOutcome(Generic[T]):
+    """Result of a hedged race."""
+
+    value: T
+    winner: int  # index of the candidate whose result was returned
+    launched: int  # candidates started, skipped ones excluded
+    accepted: bool  # False if no candidate was acceptable and the best effort is returned
+    elapsed: float  # seconds until the race was decided
+
+
+async def hedge(
+    start: Callable[[int], Awaitable[T]],
+    accept: Callable[[T], bool],
+    candidates: int,
+    delay: float,
+) -> HedgeOutcome[T]:
+    """
+    Race up to `candidates` calls of `start(index)`.
+
+    Args:
+        start: Runs candidate `index`; candidate 0 is the primary attempt.
+            It may raise HedgeSkipped to decline, which does not count as
+            a failure.
+        accept: Whether a candidate's result is good enough to win
+        candidates: Maximum number of candidates
+        delay: Seconds to wait for the primary before starting the others
+
+    Returns:
+        The first acceptable result. If none is, the result of the
+        lowest-index candidate that returned one.
+
+    Raises:
+        Exception: The primary's error (or the first one raised) if no
+            candidate returned a result
+    """
+    started = time.monotonic()
+    tasks: dict[asyncio.Task, int] = {}
+    results: dict[int, T] = {}
+    errors: dict[int, BaseException] = {}
+    next_index = 0
+    hedge_at = started + delay
+
+    def launch(count: int) -> None:
+        nonlocal next_index
+        for _ in range(count):
+            if next_index >= candidates:
+                return
+            tasks[asyncio.ensure_future(start(next_index))] = next_index
+            next_index += 1
+
+    def outcome(value: T, winner: int, accepted: bool) -> HedgeOutcome[T]:
+        launched = next_index - sum(isinstance(e, HedgeSkipped) for e in errors.values())
+        return HedgeOutcome(value, winner, launched, accepted, time.monotonic() - started)
+
+    launch(1)
+    try:
+        while tasks:
+            timeout = max(hedge_at - time.monotonic(), 0) if next_index < candidates else None
+            done, _ = await asyncio.wait(
+                tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:  # the primary is slow: hedge
+                launch(candidates)
+                continue
+            for task in sorted(done, key=tasks.__getitem__):
+                index = tasks.pop(task)
+                if task.cancelled():
+                    errors[index] = asyncio.CancelledError()
+                elif task.exception() is not None:
+                    errors[index] = task.exception()
+                else:
+                    results[index] = task.result()
+                    if accept(results[index]):
+                        return outcome(results[index], index, True)
+            # Nothing acceptable yet and no reason to keep waiting for the delay
+            launch(candidates)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if results:
+        winner = min(results)
+        return outcome(results[winner], winner, False)
+    real_errors = [e for _, e in sorted(errors.items()) if not isinstance(e, HedgeSkipped)]
+    raise (real_errors or list(errors.values()))[0]
@@ -0,0 +1,331 @@
+"""
+Asynchronous jobs with a persistent SQLite store.
+
+A job wraps one request payload. It is stored as `queued`, picked up by
+one of a fixed number of workers (`running`), and ends as `succeeded`,
+`failed` or `cancelled` with its result or error. Every transition is
+written to SQLite before it is announced, so finished results survive a
+restart, and jobs that were queued or running when the process stopped are
+queued again on the next start.
+
+Finished jobs expire `ttl` seconds after they finish and are deleted by
+`collect_garbage`. Job timestamps are wall-clock (`time.time()`) because
+they outlive the process.
+
+SQLite runs in WAL mode with `synchronous=NORMAL`: a commit appends to the
+log without an fsync, so the store's calls take microseconds and are made
+directly on the event loop.
+"""
+
+import asyncio
+import json
+import sqlite3
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    request TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_expires_at ON jobs (expires_at);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+"""
+
+
+@dataclass
+class Job:
+    """One asynchronous request and its outcome."""
+
+    id: str
+    status: str
+    request: dict[str, Any]
+    result: dict[str, Any] | None = None
+    error: dict[str, Any] | None = None
+    created_at: float = 0.0
+    started_at: float | None = None
+    finished_at: float | None = None
+    expires_at: float | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+
+class JobStore:
+    """Jobs persisted in a SQLite file."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path: SQLite database file (created with its directory if
+                missing), or ":memory:" for a throwaway store
+        """
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def insert(self, job: Job) -> None:
+        self._db.execute(
+            "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                job.id,
+                job.status,
+                json.dumps(job.request),
+                _dumps(job.result),
+                _dumps(job.error),
+                job.created_at,
+                job.started_at,
+                job.finished_at,
+                job.expires_at,
+            ),
+        )
+
+    def update(self, job: Job) -> None:
+        """Write a job's status, outcome and timestamps."""
+        self._db.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, started_at = ?, "
+            "finished_at = ?, expires_at = ? WHERE id = ?",
+            (
+                job.status,
+                _dumps(job.result),
+                _dumps(job.error),
+                job.started_at,
+                job.finished_at,
+                job.expires_at,
+                job.id,
+            ),
+        )
+
+    def get(self, job_id: str) -> Job | None:
+        row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row is not None else None
+
+    def delete(self, job_id: str) -> bool:
+        return self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount > 0
+
+    def unfinished(self) -> list[Job]:
+        """Queued and running jobs, oldest first."""
+        rows = self._db.execute(
+            "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+            (QUEUED, RUNNING),
+        ).fetchall()
+        return [_job(row) for row in rows]
+
+    def delete_expired(self, now: float) -> int:
+        """Delete finished jobs whose expiry has passed; return how many."""
+        return self._db.execute(
+            "DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+        ).rowcount
+
+    def count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+
+class JobRunner:
+    """Runs stored jobs on a fixed number of background workers."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        execute: Callable[[dict[str, Any]], Awaitable[dict[str, Any]]],
+        concurrency: int = 4,
+        ttl: float = 3600.0,
+        describe_error: Callable[[BaseException], dict[str, Any]] | None = None,
+        on_finish: Callable[[Job], None] | None = None,
+    ) -> None:
+        """
+        Args:
+            store: Where jobs are persisted
+            execute: Runs a job's request payload and returns its result
+            concurrency: Jobs executed at the same time
+            ttl: Seconds a finished job is kept
+            describe_error: Turns an exception from `execute` into the stored
+                error (default: its message as `detail`)
+            on_finish: Optional callback when a job reaches a final status
+        """
+        self.store = store
+        self.execute = execute
+        self.concurrency = concurrency
+        self.ttl = ttl
+        self.describe_error = describe_error or (lambda e: {"detail": str(e)})
+        self.on_finish = on_finish
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._queued: dict[str, float] = {}  # job id -> created_at, in queue order
+        self._running: dict[str, asyncio.Task] = {}
+        self._changed: dict[str, asyncio.Event] = {}
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queued)
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    def oldest_queued_age(self) -> float:
+        """Seconds the longest-waiting queued job has been waiting (0 if none)."""
+        if not self._queued:
+            return 0.0
+        return max(time.time() - next(iter(self._queued.values())), 0.0)
+
+    def submit(self, request: dict[str, Any]) -> Job:
+        """Store a new job and queue it."""
+        job = Job(id=uuid.uuid4().hex, status=QUEUED, request=request, created_at=time.time())
+        self.store.insert(job)
+        self._enqueue(job)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self.store.get(job_id)
+
+    def cancel(self, job_id: str) -> Job | None:
+        """
+        Cancel a queued or running job; a finished job is left as it is.
+
+        Returns:
+            The job after cancellation, or None if it does not exist
+        """
+        job = self.store.get(job_id)
+        if job is None or job.finished:
+            return job
+        task = self._running.pop(job_id, None)
+        if task is not None:
+            task.cancel()
+        self._queued.pop(job_id, None)
+        self._finish(job, CANCELLED, error={"detail": "Job cancelled"})
+        return job
+
+    def delete(self, job_id: str) -> bool:
+        """Cancel a job if it is still pending and remove it from the store."""
+        self.cancel(job_id)
+        return self.store.delete(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Job | None:
+        """
+        Wait until a job changes status or `timeout` passes, then return it.
+
+        Returns immediately if the job is already finished.
+        """
+        job = self.store.get(job_id)
+        if job is None or job.finished or timeout <= 0:
+            return job
+        changed = self._changed.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.store.get(job_id)
+
+    async def run(self) -> None:
+        """Background task: re-queue interrupted jobs, then run the workers."""
+        for job in self.store.unfinished():
+            if job.status == RUNNING:
+                job.status, job.started_at = QUEUED, None
+                self.store.update(job)
+            self._enqueue(job)
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def collect_garbage(self) -> int:
+        """Delete expired jobs; return how many were removed."""
+        return self.store.delete_expired(time.time())
+
+    def _enqueue(self, job: Job) -> None:
+        self._queued[job.id] = job.created_at
+        self._queue.put_nowait(job.id)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            if self._queued.pop(job_id, None) is None:
+                continue  # cancelled while queued
+            job = self.store.get(job_id)
+            if job is None or job.finished:
+                continue
+            job.status, job.started_at = RUNNING, time.time()
+            self.store.update(job)
+            self._notify(job.id)
+
+            task = asyncio.create_task(self.execute(job.request))
+            self._running[job.id] = task
+            try:
+                result, status, error = await task, SUCCEEDED, None
+            except asyncio.CancelledError:
+                # `cancel` unregisters the task before cancelling it
+                if self._running.pop(job.id, None) is task:
+                    raise  # the worker is stopping; the job is resumed on restart
+                continue  # cancelled through `cancel`, which recorded it
+            except Exception as e:
+                result, status, error = None, FAILED, self.describe_error(e)
+            # `cancel` removes the task; a result that raced with it is dropped
+            if self._running.pop(job.id, None) is task:
+                self._finish(job, status, result, error)
+
+    def _finish(
+        self,
+        job: Job,
+        status: str,
+        result: dict[str, Any] | None = None,
+        error: dict[str, Any] | None = None,
+    ) -> None:
+        job.status, job.result, job.error = status, result, error
+        job.finished_at = time.time()
+        job.expires_at = job.finished_at + self.ttl
+        self.store.update(job)
+        self._notify(job.id)
+        if self.on_finish is not None:
+            self.on_finish(job)
+
+    def _notify(self, job_id: str) -> None:
+        changed = self._changed.pop(job_id, None)
+        if changed is not None:
+            changed.set()
+
+
+def _dumps(value: dict[str, Any] | None) -> str | None:
+    return json.dumps(value) if value is not None else None
+
+
+def _job(row: tuple) -> Job:
+    job_id, status, request, result, error, created, started, finished, expires = row
+    return Job(
+        id=job_id,
+        status=status,
+        request=json.loads(request),
+        result=json.loads(result) if result is not None else None,
+        error=json.loads(error) if error is not None else None,
+        created_at=created,
+        started_at=started,
+        finished_at=finished,
+        expires_at=expires,
+    )
@@ -0,0 +1,324 @@
+"""
+Incremental JSON extractor for model output.
+
+Scans text once, left to right, and reports every balanced top-level JSON
+object or array as soon as its closing bracket arrives. Text can be fed in
+arbitrary chunks (e.g. straight from a token stream), and the work done is
+linear in the input size: a candidate that turns out not to be JSON is
+abandoned at the offending character instead of being re-scanned, and the
+scanned text of an open candidate is kept as a list of pieces that is only
+joined when a value ends, so feeding a chunk costs the same however long
+the candidate has been open. The scan runs in Python, so text dense with
+brackets costs about a microsecond per bracket.
+"""
+
+import json
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+# Characters that need attention outside of any JSON value: openers and
+# backticks (for ``` fences). Everything else is prose and skipped in C.
+_OUTSIDE_RE = re.compile(r"[{\[`]")
+
+# Inside a value: the next structural character, or anything that cannot
+# appear in JSON outside a string (which means this is not JSON after all).
+_INSIDE_RE = re.compile(r'[{}\[\]"]|[^\s,:0-9+\-.eEtrufalsn]')
+
+# Inside a string: the closing quote, an escape, or a raw control character
+# (JSON strings cannot contain unescaped newlines).
+_STRING_RE = re.compile(r'["\\\x00-\x1f]')
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+@dataclass
+class JSONMatch:
+    """A JSON value found by the scanner."""
+
+    value: dict[str, Any] | list[Any]
+    start: int
+    end: int
+    fence: str | None = None  # info string of the enclosing ``` block, if any
+    nested: bool = False  # True for fallbacks found inside an invalid value
+
+
+class JSONScanner:
+    """
+    Single-pass, brace- and string-aware JSON extractor.
+
+    Usage:
+        scanner = JSONScanner()
+        for chunk in stream:
+            if scanner.feed(chunk):
+                break  # scanner.first is now available
+        scanner.close()
+        match = scanner.best()
+    """
+
+    def __init__(self, stop_when: Callable[[JSONMatch], bool] | None = None) -> None:
+        """
+        Args:
+            stop_when: Optional predicate; once a match satisfies it, all
+                further input is ignored
+        """
+        self.stop_when = stop_when
+        self.stopped = False
+        self.matches: list[JSONMatch] = []
+        self._fallbacks: list[tuple[int, str, str | None]] = []
+        self._spans: list[tuple[int, int]] = []  # closed values in the open candidate
+        self._buffer = ""  # text from the scan position on (plus the chunk being scanned)
+        self._base = 0  # absolute offset of self._buffer[0]
+        self._pos = 0  # scan position within self._buffer
+        # Scanned text of the open candidate, from its start up to self._base,
+        # kept as pieces so that feeding a chunk never copies the whole candidate
+        self._history: list[str] = []
+        self._history_base = 0  # absolute offset of the first piece
+        self._stack: list[tuple[str, int]] = []  # (expected closer, absolute start)
+        self._in_string = False
+        self._fence: str | None = None
+        self._closed = False
+
+    @property
+    def first(self) -> JSONMatch | None:
+        """First complete top-level value, in text order."""
+        return self.matches[0] if self.matches else None
+
+    def feed(self, chunk: str) -> list[JSONMatch]:
+        """
+        Scan the next piece of text.
+
+        Args:
+            chunk: Text following everything fed so far
+
+        Returns:
+            Top-level values completed by this chunk
+        """
+        if self._closed:
+            raise ValueError("Cannot feed a closed JSONScanner")
+        if self.stopped:
+            return []
+        self._buffer += chunk
+        found = len(self.matches)
+        self._scan()
+        self._trim()
+        return self.matches[found:]
+
+    def close(self) -> list[JSONMatch]:
+        """
+        Mark the end of input and flush anything waiting for more text.
+
+        Returns:
+            Top-level values completed by the flush
+        """
+        self._closed = True
+        found = len(self.matches)
+        if not self.stopped:
+            self._scan()
+        if self._stack:
+            self._abandon(len(self._buffer))
+        self._buffer = ""
+        return self.matches[found:]
+
+    def best(self) -> JSONMatch | None:
+        """
+        Pick the most likely intended value.
+
+        Preference order mirrors how models format function calls: a value
+        inside a ```json fence, a value inside any fence, the first bare
+        object, the first bare array, then the first valid value nested in a
+        malformed or unterminated outer one.
+        """
+        for match in self.matches:
+            if match.fence == "json":
+                return match
+        for match in self.matches:
+            if match.fence is not None:
+                return match
+        for match in self.matches:
+            if isinstance(match.value, dict):
+                return match
+        if self.matches:
+            return self.matches[0]
+        for start, text, fence in self._fallbacks:
+            value = _loads(text)
+            if value is not None:
+                return JSONMatch(value, start, start + len(text), fence, nested=True)
+        return None
+
+    # ------------------------------------------------------------------------
+    # Scanning
+    # ------------------------------------------------------------------------
+
+    def _scan(self) -> None:
+        buffer = self._buffer
+        end = len(buffer)
+        pos = self._pos
+        while pos < end and not self.stopped:
+            if self._stack:
+                pos = self._scan_value(buffer, pos, end)
+            else:
+                pos = self._scan_outside(buffer, pos, end)
+            if pos < 0:  # need more input
+                return
+            self._pos = pos
+        self._pos = pos
+
+    def _scan_outside(self, buffer: str, pos: int, end: int) -> int:
+        match = _OUTSIDE_RE.search(buffer, pos)
+        if match is None:
+            return end
+        index = match.start()
+        char = buffer[index]
+        if char != "`":
+            self._stack.append((_CLOSERS[char], self._base + index))
+            return index + 1
+
+        run_end = index
+        while run_end < end and buffer[run_end] == "`":
+            run_end += 1
+        if run_end == end and not self._closed:
+            self._pos = index
+            return -1
+        if run_end - index < 3:
+            return run_end
+        if self._fence is not None:
+            self._fence = None
+            return run_end
+
+        newline = buffer.find("\n", run_end)
+        if newline < 0:
+            if not self._closed:
+                self._pos = index
+                return -1
+            newline = end
+        self._fence = buffer[run_end:newline].strip().lower()
+        return newline
+
+    def _scan_value(self, buffer: str, pos: int, end: int) -> int:
+        while pos < end:
+            if self._in_string:
+                match = _STRING_RE.search(buffer, pos)
+                if match is None:
+                    return end
+                index = match.start()
+                char = buffer[index]
+                if char == '"':
+                    self._in_string = False
+                    pos = index + 1
+                elif char == "\\":
+                    if index + 1 >= end and not self._closed:
+                        self._pos = index
+                        return -1
+                    pos = index + 2
+                else:
+                    return self._abandon(index)
+                continue
+
+            match = _INSIDE_RE.search(buffer, pos)
+            if match is None:
+                return end
+            index = match.start()
+            char = buffer[index]
+            if char == '"':
+                self._in_string = True
+            elif char in _CLOSERS:
+                self._stack.append((_CLOSERS[char], self._base + index))
+            elif char in "}]":
+                closer, start = self._stack.pop()
+                if char != closer:
+                    return self._abandon(index)
+                if not self._stack:
+                    self._complete(start, self._base + index + 1)
+                    return index + 1
+                # Remember maximal closed values in case the outer one fails
+                while self._spans and self._spans[-1][0] > start:
+                    self._spans.pop()
+                self._spans.append((start, self._base + index + 1))
+            else:
+                return self._abandon(index)
+            pos = index + 1
+        return end
+
+    def _text(self, start: int, end: int) -> str:
+        """Text between two absolute offsets within the open candidate."""
+        if start >= self._base:
+            return self._buffer[start - self._base : end - self._base]
+        if len(self._history) > 1:
+            self._history = ["".join(self._history)]
+        history = self._history[0]
+        head = history[start - self._history_base : end - self._history_base]
+        if end <= self._base:
+            return head
+        return head + self._buffer[: end - self._base]
+
+    def _complete(self, start: int, end: int) -> None:
+        text = self._text(start, end)
+        value = _loads(text)
+        if value is None:
+            self._keep_spans()
+            return
+        self._spans.clear()
+        match = JSONMatch(value, start, end, self._fence)
+        self.matches.append(match)
+        if self.stop_when is not None and self.stop_when(match):
+            self.stopped = True
+
+    def _abandon(self, index: int) -> int:
+        """Drop the open candidate; every open value contains the bad character."""
+        self._stack.clear()
+        self._in_string = False
+        self._keep_spans()
+        return index
+
+    def _keep_spans(self) -> None:
+        """Save the failed candidate's closed sub-values as fallbacks."""
+        for start, end in self._spans:
+            text = self._text(start, end)
+            self._fallbacks.append((start, text, self._fence))
+        self._spans.clear()
+
+    def _trim(self) -> None:
+        """Move scanned text to the history, or forget it if no value can use it."""
+        pos = self._pos
+        if not self._stack:
+            self._history.clear()
+        elif self._history and self._history_base == self._stack[0][1]:
+            self._history.append(self._buffer[:pos])  # the candidate is still open
+        else:
+            start = self._stack[0][1]
+            self._history = [self._buffer[start - self._base : pos]]
+            self._history_base = start
+        if pos:
+            self._buffer = self._buffer[pos:]
+            self._base += pos
+            self._pos = 0
+
+
+def _loads(text: str) -> dict[str, Any] | list[Any] | None:
+    try:
+        value = json.loads(text)
+    except (ValueError, RecursionError):
+        return None
+    return value if isinstance(value, (dict, list)) else None
+
+
+def find_json(text: str) -> JSONMatch | None:
+    """
+    Extract the most likely JSON object or array from a complete text.
+
+    Args:
+        text: Raw model output
+
+    Returns:
+        Best JSONMatch, or None if the text contains no valid JSON value
+    """
+    # Stop as soon as later text can no longer change the answer of best()
+    if "```" in text:
+        scanner = JSONScanner(stop_when=lambda match: match.fence == "json")
+    else:
+        scanner = JSONScanner(stop_when=lambda match: isinstance(match.value, dict))
+    scanner.feed(text)
+    scanner.close()
+    return scanner.best()
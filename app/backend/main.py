@@ -3,22 +3,174 @@ FastAPI Backend for Llama 3 Function Agent
 Handles chat requests and interfaces with Ollama API
 """
 
+import asyncio
+import hashlib
+import importlib
 import json
-import re
-from typing import Any
+import math
+import os
+import random
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Literal, TypeVar
 
 import httpx
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, Header, HTTPException, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+import metrics
+from cache import CacheOutcome, ResponseCache
+from capture import TrafficRecorder
+from jobs import SUCCEEDED, Job, JobRunner, JobStore
+from hedging import HedgeSkipped, LatencyWindow, hedge
+from json_scanner import JSONScanner, find_json
+from schema import Validator
+from ollama_pool import NoHealthyNode, OllamaNode, OllamaPool
+from ratelimit import RateLimited, Reservation, TokenRateLimiter, rate_limit_headers
+from scheduler import AdmissionController, AdmissionRejected
+from sessions import (
+    TURN_OVERHEAD_TOKENS,
+    Session,
+    SessionStore,
+    Turn,
+    estimate_tokens,
+)
+from tools import ToolCall, ToolRegistry, ToolResult, extract_tool_calls
+from tracing import SpanExporter, TracingMiddleware, record, span
+from warmup import ModelWarmer
 
 # ============================================================================
 # Configuration
 # ============================================================================
 
-OLLAMA_BASE_URL = "http://host.docker.internal:11434"
-OLLAMA_MODEL = "llama3-function-calling"  # Changed from "llama3"
-REQUEST_TIMEOUT = 120.0
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://host.docker.internal:11434")
+# Comma-separated list of Ollama nodes to load-balance across
+OLLAMA_BASE_URLS = [
+    url.strip() for url in os.getenv("OLLAMA_BASE_URLS", OLLAMA_BASE_URL).split(",") if url.strip()
+]
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3-function-calling")  # Changed from "llama3"
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "120.0"))
+
+# Send the pre-rendered Llama 3 prompt verbatim (`raw`) so every request
+# starts with the same bytes and Ollama can reuse the cached system prefix
+OLLAMA_RAW_PROMPT = os.getenv("OLLAMA_RAW_PROMPT", "true").lower() == "true"
+# How long Ollama keeps the model (and its KV cache) loaded after a request:
+# a duration such as "30m", seconds, or -1 to keep it loaded indefinitely
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+# Shared Ollama HTTP client (connection pool + per-phase timeouts)
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "32"))
+OLLAMA_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OLLAMA_MAX_KEEPALIVE_CONNECTIONS", "16"))
+OLLAMA_KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "30.0"))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5.0"))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", str(REQUEST_TIMEOUT)))
+OLLAMA_WRITE_TIMEOUT = float(os.getenv("OLLAMA_WRITE_TIMEOUT", "10.0"))
+OLLAMA_POOL_TIMEOUT = float(os.getenv("OLLAMA_POOL_TIMEOUT", "5.0"))
+HEALTH_CHECK_TIMEOUT = 5.0
+
+# Batch endpoint
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+BATCH_DEFAULT_CONCURRENCY = int(os.getenv("BATCH_DEFAULT_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+
+# Node health probing and per-node circuit breakers
+OLLAMA_PROBE_INTERVAL = float(os.getenv("OLLAMA_PROBE_INTERVAL", "10.0"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+# How long an open circuit stays open, doubled on every failed trial
+OLLAMA_EJECT_BASE_BACKOFF = float(os.getenv("OLLAMA_EJECT_BASE_BACKOFF", "1.0"))
+OLLAMA_EJECT_MAX_BACKOFF = float(os.getenv("OLLAMA_EJECT_MAX_BACKOFF", "60.0"))
+
+# Retries of transient Ollama failures (connect errors, 502/503)
+OLLAMA_RETRY_ATTEMPTS = int(os.getenv("OLLAMA_RETRY_ATTEMPTS", "2"))
+OLLAMA_RETRY_BASE_DELAY = float(os.getenv("OLLAMA_RETRY_BASE_DELAY", "0.1"))
+OLLAMA_RETRY_MAX_DELAY = float(os.getenv("OLLAMA_RETRY_MAX_DELAY", "2.0"))
+
+# Model warm-up on startup and keep-alive pings
+MODEL_WARMUP_ENABLED = os.getenv("MODEL_WARMUP_ENABLED", "true").lower() == "true"
+MODEL_KEEPALIVE_INTERVAL = float(os.getenv("MODEL_KEEPALIVE_INTERVAL", "300.0"))
+# Stop pinging after this many seconds without traffic and let Ollama unload
+# the model once keep_alive runs out; 0 keeps it loaded indefinitely
+MODEL_IDLE_TIMEOUT = float(os.getenv("MODEL_IDLE_TIMEOUT", "0"))
+
+# Exact-match response cache
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300.0"))
+# Only temperature 0 is deterministic; set to cache sampled responses too
+RESPONSE_CACHE_ALL_TEMPERATURES = (
+    os.getenv("RESPONSE_CACHE_ALL_TEMPERATURES", "false").lower() == "true"
+)
+
+# Multi-turn sessions
+MAX_SEQ_LENGTH = int(os.getenv("MAX_SEQ_LENGTH", "2048"))  # model's context window
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(32 * 1024 * 1024)))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800.0"))
+
+# Tool execution: comma-separated modules that each expose `register(registry)`
+TOOL_MODULES = [
+    module.strip()
+    for module in os.getenv("TOOL_MODULES", "sample_tools").split(",")
+    if module.strip()
+]
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "8"))  # threads for sync handlers
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024"))
+TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_TTL", "300.0"))
+
+# Hedged n-best sampling: extra candidates start after a percentile of
+# recent upstream latency, so only slow requests are hedged
+HEDGE_MAX_CANDIDATES = int(os.getenv("HEDGE_MAX_CANDIDATES", "4"))
+HEDGE_DELAY_QUANTILE = float(os.getenv("HEDGE_DELAY_QUANTILE", "0.95"))
+HEDGE_INITIAL_DELAY = float(os.getenv("HEDGE_INITIAL_DELAY", "1.0"))  # until enough samples
+HEDGE_LATENCY_WINDOW = int(os.getenv("HEDGE_LATENCY_WINDOW", "256"))
+HEDGE_TEMPERATURE_STEP = float(os.getenv("HEDGE_TEMPERATURE_STEP", "0.2"))
+
+# Asynchronous jobs, persisted in SQLite
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "data/jobs.db")
+JOBS_CONCURRENCY = int(os.getenv("JOBS_CONCURRENCY", "4"))
+JOBS_TTL = float(os.getenv("JOBS_TTL", "3600.0"))  # seconds a finished job is kept
+JOBS_GC_INTERVAL = float(os.getenv("JOBS_GC_INTERVAL", "60.0"))
+JOBS_TIMEOUT = float(os.getenv("JOBS_TIMEOUT", str(REQUEST_TIMEOUT)))  # per job, once started
+JOBS_MAX_WAIT = float(os.getenv("JOBS_MAX_WAIT", "60.0"))  # cap for long-polling
+JOBS_EVENTS_KEEPALIVE = 15.0  # seconds between SSE comments while a job is unchanged
+
+# Per-client rate limiting, charged in prompt plus generated tokens; clients
+# are identified by API key (X-API-Key or bearer token), otherwise by IP
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_TOKENS_PER_MINUTE = float(os.getenv("RATE_LIMIT_TOKENS_PER_MINUTE", "20000"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "40000"))  # bucket size
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+
+# Per-request tracing: a Server-Timing header on every response and, if
+# TRACE_EXPORT_PATH is set, a sample of traces appended to a rotating JSONL file
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_EXPORT_MAX_BYTES = int(os.getenv("TRACE_EXPORT_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_EXPORT_BACKUPS = int(os.getenv("TRACE_EXPORT_BACKUPS", "3"))
+
+# Traffic capture for offline replay (benchmarks/replay.py); off unless a path is set
+CAPTURE_PATH = os.getenv("CAPTURE_PATH", "")
+CAPTURE_MESSAGES = os.getenv("CAPTURE_MESSAGES", "true").lower() == "true"  # else only their size
+CAPTURE_FLUSH_INTERVAL = float(os.getenv("CAPTURE_FLUSH_INTERVAL", "1.0"))
+CAPTURE_MAX_BUFFERED = int(os.getenv("CAPTURE_MAX_BUFFERED", "10000"))  # entries between flushes
+
+# Admission control in front of Ollama
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "4"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_MAX_QUEUE_WAIT = float(os.getenv("ADMISSION_MAX_QUEUE_WAIT", "60.0"))
+ADMISSION_ADAPTIVE = os.getenv("ADMISSION_ADAPTIVE", "true").lower() == "true"
+ADMISSION_MIN_IN_FLIGHT = int(os.getenv("ADMISSION_MIN_IN_FLIGHT", "1"))
+ADMISSION_MAX_LIMIT = int(os.getenv("ADMISSION_MAX_LIMIT", "16"))
+ADMISSION_TARGET_LATENCY = float(os.getenv("ADMISSION_TARGET_LATENCY", "30.0"))
 
 # ============================================================================
 # Pydantic Models
@@ -47,6 +199,59 @@ class ChatRequest(BaseModel):
         le=8192,
         description="Maximum tokens in the response",
     )
+    priority: int = Field(
+        default=0,
+        ge=-10,
+        le=10,
+        description="Queue priority when Ollama is busy; higher is served first",
+    )
+    stop_on_json: bool = Field(
+        default=False,
+        description=(
+            "Stream from Ollama and cancel generation as soon as the first "
+            "complete JSON object or array has been produced"
+        ),
+    )
+    execute_tools: bool = Field(
+        default=False,
+        description="Execute the function calls in the parsed output with the registered tools",
+    )
+    format: Literal["json", "functions"] | None = Field(
+        default=None,
+        description=(
+            "Constrain generation with Ollama's `format`: `json` for JSON mode, "
+            "`functions` for the JSON schema of a call to a registered function"
+        ),
+    )
+    functions: list[str] | None = Field(
+        default=None,
+        min_length=1,
+        description="With format `functions`: the functions the call may name (default all)",
+        examples=[["get_weather"]],
+    )
+    candidates: int = Field(
+        default=1,
+        ge=1,
+        le=HEDGE_MAX_CANDIDATES,
+        description=(
+            "Hedged n-best sampling: race up to this many generations and return "
+            "the first whose JSON parses (and matches the function schema)"
+        ),
+    )
+    hedge_delay_ms: float | None = Field(
+        default=None,
+        ge=0,
+        description=(
+            "With candidates > 1: start the extra candidates after this delay "
+            "instead of the p95 of recent generation times (0 starts all at once)"
+        ),
+    )
+
+    @model_validator(mode="after")
+    def functions_need_schema_format(self) -> "ChatRequest":
+        if self.functions is not None and self.format != "functions":
+            raise ValueError("functions requires format 'functions'")
+        return self
 
 
 class ParsedOutput(BaseModel):
@@ -61,6 +266,134 @@ class ParsedOutput(BaseModel):
         default=None,
         description="Error message if JSON parsing failed",
     )
+    schema_errors: list[str] | None = Field(
+        default=None,
+        description="Where the parsed JSON violates the function schema (format `functions`)",
+    )
+
+
+class HedgeInfo(BaseModel):
+    """How a hedged request was decided."""
+
+    candidates: int = Field(..., description="Candidates requested")
+    launched: int = Field(..., description="Candidates started (hedges need a free slot)")
+    winner: int = Field(..., description="Index of the returned candidate (0 is the primary)")
+    valid: bool = Field(..., description="Whether the returned candidate's JSON was valid")
+    delay_ms: float = Field(..., description="Wait before the extra candidates were started")
+    extra_tokens: int = Field(..., description="Tokens generated by the losing candidates")
+
+
+class ToolExecution(BaseModel):
+    """Result of executing one function call."""
+
+    tool: str = Field(..., description="Function name from the model output")
+    arguments: Any = Field(..., description="Arguments the function was called with")
+    status: str = Field(
+        ...,
+        description="ok, invalid_arguments, unknown_tool, timeout or error",
+    )
+    result: Any = Field(default=None, description="Return value of the tool")
+    error: str | None = Field(default=None, description="Why the call failed")
+    latency_ms: float = Field(..., description="Validation plus execution time")
+    cached: bool = Field(default=False, description="Served from the pure-tool cache")
+
+
+class GenerationTimings(BaseModel):
+    """Timing and token counters for one Ollama generation."""
+
+    upstream_ms: float | None = Field(
+        default=None,
+        description="Wall-clock time of the Ollama request as seen by the backend",
+    )
+    upstream_queue_ms: float | None = Field(
+        default=None,
+        description=(
+            "Part of upstream_ms not spent loading, evaluating the prompt or "
+            "decoding (Ollama queueing and transport)"
+        ),
+    )
+    time_to_first_token_ms: float | None = Field(
+        default=None,
+        description=(
+            "Time from sending the request to Ollama to the first generated "
+            "token; measured when streaming, otherwise upstream_ms - eval_duration_ms"
+        ),
+    )
+    total_duration_ms: float | None = Field(
+        default=None,
+        description="Total time Ollama spent on the request",
+    )
+    load_duration_ms: float | None = Field(
+        default=None,
+        description="Time spent loading the model",
+    )
+    prompt_eval_count: int | None = Field(
+        default=None,
+        description="Number of prompt tokens evaluated",
+    )
+    prompt_eval_duration_ms: float | None = Field(
+        default=None,
+        description="Time spent evaluating the prompt",
+    )
+    eval_count: int | None = Field(
+        default=None,
+        description="Number of tokens generated",
+    )
+    eval_duration_ms: float | None = Field(
+        default=None,
+        description="Time spent generating tokens",
+    )
+    tokens_per_second: float | None = Field(
+        default=None,
+        description="Decode speed (eval_count / eval_duration)",
+    )
+
+    @classmethod
+    def from_ollama(
+        cls,
+        data: dict[str, Any],
+        upstream_ms: float | None = None,
+        time_to_first_token_ms: float | None = None,
+    ) -> "GenerationTimings":
+        """
+        Build timings from Ollama's final response (durations are nanoseconds).
+
+        Args:
+            data: Non-streaming response or final stream chunk
+            upstream_ms: Measured wall-clock time of the request
+            time_to_first_token_ms: Measured time to first token, if streaming
+        """
+
+        def to_ms(key: str) -> float | None:
+            value = data.get(key)
+            return value / 1_000_000 if value is not None else None
+
+        load_ms = to_ms("load_duration")
+        prompt_eval_ms = to_ms("prompt_eval_duration")
+        eval_ms = to_ms("eval_duration")
+        eval_count = data.get("eval_count")
+
+        upstream_queue_ms = None
+        if upstream_ms is not None and eval_ms is not None:
+            compute_ms = eval_ms + (load_ms or 0.0) + (prompt_eval_ms or 0.0)
+            upstream_queue_ms = max(upstream_ms - compute_ms, 0.0)
+        if time_to_first_token_ms is None and upstream_ms is not None and eval_ms is not None:
+            time_to_first_token_ms = max(upstream_ms - eval_ms, 0.0)
+
+        return cls(
+            upstream_ms=upstream_ms,
+            upstream_queue_ms=upstream_queue_ms,
+            time_to_first_token_ms=time_to_first_token_ms,
+            total_duration_ms=to_ms("total_duration"),
+            load_duration_ms=load_ms,
+            prompt_eval_count=data.get("prompt_eval_count"),
+            prompt_eval_duration_ms=prompt_eval_ms,
+            eval_count=eval_count,
+            eval_duration_ms=eval_ms,
+            tokens_per_second=(
+                eval_count / (eval_ms / 1000) if eval_count and eval_ms else None
+            ),
+        )
 
 
 class ChatResponse(BaseModel):
@@ -74,14 +407,86 @@ class ChatResponse(BaseModel):
         default=None,
         description="Number of tokens used in response",
     )
+    tokens_saved: int | None = Field(
+        default=None,
+        description=(
+            "Unused num_predict budget when generation was stopped early "
+            "(an upper bound on the decode tokens saved)"
+        ),
+    )
+    timings: GenerationTimings | None = Field(
+        default=None,
+        description="Generation timings (null when served from cache)",
+    )
+    tool_results: list[ToolExecution] | None = Field(
+        default=None,
+        description="Executed function calls, in output order (only with execute_tools)",
+    )
+    hedge: HedgeInfo | None = Field(
+        default=None,
+        description="Winning candidate and extra cost (only with candidates > 1)",
+    )
+
+
+class SchedulerStatus(BaseModel):
+    """Admission control state."""
+
+    in_flight: int = Field(..., description="Generations currently running")
+    concurrency_limit: int = Field(..., description="Current generation limit")
+    queue_depth: int = Field(..., description="Requests waiting for a slot")
+    queue_capacity: int = Field(..., description="Maximum waiting requests")
+    avg_wait_ms: float = Field(..., description="Moving average of queue wait")
+
+
+class NodeStatus(BaseModel):
+    """Health and load of one Ollama node."""
+
+    model_config = ConfigDict(protected_namespaces=())  # allow the model_* fields
+
+    url: str = Field(..., description="Ollama base URL")
+    connected: bool = Field(..., description="Reachable at the last probe")
+    model_available: bool = Field(..., description="Model present at the last probe")
+    ejected: bool = Field(..., description="Circuit open, no requests are routed to it")
+    circuit: str = Field(..., description="Circuit breaker state: closed, half_open or open")
+    outstanding: int = Field(..., description="Requests currently routed to the node")
+    tokens_per_second: float | None = Field(
+        default=None,
+        description="Recent decode speed",
+    )
+    consecutive_failures: int = Field(
+        ...,
+        description="Connect failures, timeouts and server errors in a row",
+    )
+    probe_latency_ms: float | None = Field(
+        default=None,
+        description="Round-trip time of the last probe",
+    )
+    probe_age_s: float | None = Field(
+        default=None,
+        description="Seconds since the last probe (null if never probed)",
+    )
+    model_state: str = Field(..., description="cold, warming, ready or idle")
 
 
 class HealthResponse(BaseModel):
     """Response model for health check."""
 
+    model_config = ConfigDict(protected_namespaces=())  # allow the model_* fields
+
     status: str = Field(..., description="API health status")
+    ready: bool = Field(..., description="Whether the model is loaded and traffic can be served")
+    model_state: str = Field(
+        ...,
+        description="Best model state across nodes: cold, warming, ready or idle",
+    )
     ollama_connected: bool = Field(..., description="Ollama connection status")
-    model_available: bool = Field(..., description="Whether the model is loaded")
+    model_available: bool = Field(..., description="Whether the model is installed")
+    staleness_s: float | None = Field(
+        default=None,
+        description="Age of the oldest node probe this status is based on",
+    )
+    nodes: list[NodeStatus] = Field(..., description="Per-node Ollama status")
+    scheduler: SchedulerStatus = Field(..., description="Admission control state")
 
 
 class ErrorResponse(BaseModel):
@@ -90,16 +495,265 @@ class ErrorResponse(BaseModel):
     detail: str = Field(..., description="Error details")
 
 
+class BatchChatRequest(BaseModel):
+    """Request model for batch chat endpoint."""
+
+    items: list[ChatRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=BATCH_MAX_ITEMS,
+        description="Chat requests to process",
+    )
+    concurrency: int = Field(
+        default=BATCH_DEFAULT_CONCURRENCY,
+        ge=1,
+        le=BATCH_MAX_CONCURRENCY,
+        description="Maximum items processed at the same time",
+    )
+
+
+class BatchItemError(BaseModel):
+    """Error for one failed batch item."""
+
+    status_code: int = Field(..., description="HTTP status the item would have had")
+    detail: str = Field(..., description="Error details")
+
+
+class BatchItemResult(BaseModel):
+    """One line of the batch chat NDJSON stream."""
+
+    index: int = Field(..., description="Position of the item in the request")
+    success: bool = Field(..., description="Whether the item succeeded")
+    result: ChatResponse | None = Field(default=None, description="Chat response")
+    error: BatchItemError | None = Field(default=None, description="Item error")
+
+
+class SessionChatRequest(BaseModel):
+    """Request model for one turn of a session."""
+
+    message: str | None = Field(
+        default=None,
+        min_length=1,
+        max_length=4096,
+        description="User message for this turn",
+        examples=["And what about tomorrow?"],
+    )
+    function_response: str | dict[str, Any] | list[Any] | None = Field(
+        default=None,
+        description=(
+            "Result of the function the assistant called, added as a "
+            "`function` turn before `message`"
+        ),
+    )
+    temperature: float = Field(
+        default=0.7,
+        ge=0.0,
+        le=2.0,
+        description="Sampling temperature for response generation",
+    )
+    max_tokens: int = Field(
+        default=512,
+        ge=1,
+        le=8192,
+        description="Maximum tokens in the response (reserved in the token budget)",
+    )
+    priority: int = Field(
+        default=0,
+        ge=-10,
+        le=10,
+        description="Queue priority when Ollama is busy; higher is served first",
+    )
+
+    @model_validator(mode="after")
+    def require_content(self) -> "SessionChatRequest":
+        if self.message is None and self.function_response is None:
+            raise ValueError("message or function_response is required")
+        return self
+
+
+class SessionTurn(BaseModel):
+    """One stored turn of a session."""
+
+    role: str = Field(..., description="user, assistant or function")
+    content: str = Field(..., description="Turn text")
+    tokens: int = Field(..., description="Tokens the turn occupies (estimated for input turns)")
+
+
+class SessionInfo(BaseModel):
+    """State of a session."""
+
+    session_id: str = Field(..., description="Session identifier")
+    turns: list[SessionTurn] = Field(..., description="Turn history, oldest first")
+    tokens: int = Field(..., description="Tokens the transcript occupies")
+    max_tokens: int = Field(..., description="Token budget of the transcript")
+    context_cached: bool = Field(
+        ...,
+        description="Whether Ollama's KV cache can serve the transcript on the next turn",
+    )
+
+
+class SessionChatResponse(ChatResponse):
+    """Response model for a session turn."""
+
+    session_id: str = Field(..., description="Session identifier")
+    context_reused: bool = Field(
+        ...,
+        description=(
+            "The prompt extended the previous prompt and reply, so Ollama only "
+            "had to evaluate the new turns"
+        ),
+    )
+    session_tokens: int = Field(..., description="Tokens the transcript occupies now")
+    evicted_turns: int = Field(..., description="Oldest turns dropped to fit the budget")
+
+
+class ToolInfo(BaseModel):
+    """A registered tool."""
+
+    name: str = Field(..., description="Function name the model uses")
+    description: str = Field(..., description="What the tool does")
+    parameters: dict[str, Any] = Field(..., description="JSON Schema of the arguments")
+    timeout: float = Field(..., description="Seconds a call may take")
+    pure: bool = Field(..., description="Results are cached per argument set")
+
+
+class ToolExecuteRequest(BaseModel):
+    """Request model for executing function calls directly."""
+
+    calls: dict[str, Any] | list[Any] = Field(
+        ...,
+        description="One call object or a list, in the same shape as the model output",
+        examples=[{"action": "get_weather", "parameters": {"location": "Tokyo"}}],
+    )
+
+
+class JobError(BaseModel):
+    """Why a job did not succeed."""
+
+    status_code: int = Field(..., description="HTTP status the request would have had")
+    detail: str = Field(..., description="Error details")
+
+
+class JobResponse(BaseModel):
+    """State of an asynchronous job."""
+
+    job_id: str = Field(..., description="Job identifier")
+    status: Literal["queued", "running", "succeeded", "failed", "cancelled"] = Field(
+        ...,
+        description="Job status; succeeded, failed and cancelled are final",
+    )
+    created_at: float = Field(..., description="Submission time (Unix seconds)")
+    started_at: float | None = Field(None, description="When a worker picked the job up")
+    finished_at: float | None = Field(None, description="When the job reached its final status")
+    expires_at: float | None = Field(None, description="When the finished job will be deleted")
+    result: ChatResponse | None = Field(None, description="Chat response, once succeeded")
+    error: JobError | None = Field(None, description="Error, once failed or cancelled")
+
+
 # ============================================================================
 # Application Setup
 # ============================================================================
 
+_ollama_client: httpx.AsyncClient | None = None
+
+CIRCUIT_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def record_circuit_change(node: OllamaNode, state: str) -> None:
+    metrics.CIRCUIT_TRANSITIONS.labels(node=node.url, state=state).inc()
+
+
+ollama_pool = OllamaPool(
+    OLLAMA_BASE_URLS,
+    base_backoff=OLLAMA_EJECT_BASE_BACKOFF,
+    max_backoff=OLLAMA_EJECT_MAX_BACKOFF,
+    failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+    on_circuit_change=record_circuit_change,
+)
+for _node in ollama_pool.nodes:
+    metrics.CIRCUIT_STATE.labels(node=_node.url).set_function(
+        lambda node=_node: CIRCUIT_STATE_VALUES[node.breaker.state]
+    )
+
+
+def create_ollama_client() -> httpx.AsyncClient:
+    """
+    Build the process-wide HTTP client used for every Ollama call.
+
+    Connections are pooled and kept alive between requests so `/chat` and
+    `/health` do not pay a TCP handshake each time.
+
+    Returns:
+        Configured httpx.AsyncClient
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            connect=OLLAMA_CONNECT_TIMEOUT,
+            read=OLLAMA_READ_TIMEOUT,
+            write=OLLAMA_WRITE_TIMEOUT,
+            pool=OLLAMA_POOL_TIMEOUT,
+        ),
+    )
+
+
+def get_ollama_client() -> httpx.AsyncClient:
+    """
+    Return the shared Ollama client, creating it lazily if the lifespan
+    handler has not run (e.g. when helpers are used outside the server).
+    """
+    global _ollama_client
+    if _ollama_client is None or _ollama_client.is_closed:
+        _ollama_client = create_ollama_client()
+    return _ollama_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Open the shared Ollama client and the job store, and start the node
+    prober, model warmer, job workers, job garbage collector, trace exporter
+    and traffic capture on startup; stop and close them on shutdown.
+    """
+    global _ollama_client
+    _ollama_client = create_ollama_client()
+    job_runner = open_job_runner()
+    if span_exporter is not None:
+        span_exporter.start()
+    tasks = [
+        asyncio.create_task(run_ollama_prober()),
+        asyncio.create_task(job_runner.run()),
+        asyncio.create_task(run_job_gc(job_runner)),
+    ]
+    if MODEL_WARMUP_ENABLED:
+        tasks.append(asyncio.create_task(model_warmer.run(_ollama_client)))
+    if traffic_recorder is not None:
+        tasks.append(asyncio.create_task(traffic_recorder.run()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        close_job_runner()
+        await _ollama_client.aclose()
+        _ollama_client = None
+        tool_registry.shutdown()
+        if span_exporter is not None:
+            span_exporter.stop()
+
+
 app = FastAPI(
     title="Llama 3 Function Agent API",
     description="API for interacting with fine-tuned Llama 3 model via Ollama",
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -110,12 +764,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+span_exporter = (
+    SpanExporter(TRACE_EXPORT_PATH, TRACE_EXPORT_MAX_BYTES, TRACE_EXPORT_BACKUPS)
+    if TRACING_ENABLED and TRACE_EXPORT_PATH
+    else None
+)
+if TRACING_ENABLED:
+    app.add_middleware(
+        TracingMiddleware, exporter=span_exporter, sample_rate=TRACE_SAMPLE_RATE
+    )
+
 
 # ============================================================================
 # Helper Functions
 # ============================================================================
 
 
+SYSTEM_PROMPT = """You are a helpful AI assistant that can perform function calls.
+When asked to perform actions, respond with a JSON object containing:
+- "action": the action to perform
+- "parameters": an object with relevant parameters
+- "reasoning": brief explanation of your approach
+
+Always respond with valid JSON when performing function calls."""
+
+# Rendered once: everything up to the user message is identical for every
+# request, which is what lets Ollama skip re-evaluating it
+PROMPT_PREFIX = f"""<|begin_of_text|><|start_header_id|>system<|end_header_id|>
+
+{SYSTEM_PROMPT}<|eot_id|><|start_header_id|>user<|end_header_id|>
+
+"""
+PROMPT_SUFFIX = """<|eot_id|><|start_header_id|>assistant<|end_header_id|>
+
+"""
+
+
 def format_llama3_prompt(user_message: str) -> str:
     """
     Format user message into Llama 3 ChatML template.
@@ -126,23 +810,36 @@ def format_llama3_prompt(user_message: str) -> str:
     <|start_header_id|>user<|end_header_id|>
     {user_message}<|eot_id|>
     <|start_header_id|>assistant<|end_header_id|>
+
+    The system part is the constant PROMPT_PREFIX, so prompts for different
+    messages share a byte-identical prefix.
     """
-    system_prompt = """You are a helpful AI assistant that can perform function calls.
-When asked to perform actions, respond with a JSON object containing:
-- "action": the action to perform
-- "parameters": an object with relevant parameters
-- "reasoning": brief explanation of your approach
+    return PROMPT_PREFIX + user_message + PROMPT_SUFFIX
 
-Always respond with valid JSON when performing function calls."""
 
-    formatted = f"""<|begin_of_text|><|start_header_id|>system<|end_header_id|>
+def render_turn(role: str, content: str) -> str:
+    """Render one complete turn in the Llama 3 template."""
+    return f"<|start_header_id|>{role}<|end_header_id|>\n\n{content}<|eot_id|>"
 
-{system_prompt}<|eot_id|><|start_header_id|>user<|end_header_id|>
 
-{user_message}<|eot_id|><|start_header_id|>assistant<|end_header_id|>
+SYSTEM_TURN = "<|begin_of_text|>" + render_turn("system", SYSTEM_PROMPT)
+ASSISTANT_HEADER = "<|start_header_id|>assistant<|end_header_id|>\n\n"
 
-"""
-    return formatted
+
+def format_session_prompt(session: Session, new_turns: list[Turn]) -> str:
+    """
+    Render the prompt for the next turn of a session.
+
+    The whole transcript is rendered, starting with the same system turn as
+    single-shot prompts. A reply renders as the assistant header the last
+    prompt ended with, the generated text and its end-of-turn token, so the
+    previous prompt and reply are a byte-identical prefix of this prompt
+    and Ollama's KV cache only leaves the new turns to evaluate.
+    (`context` cannot be used instead: Ollama ignores it for raw prompts.)
+    """
+    turns = [*session.turns, *new_turns]
+    history = "".join(render_turn(turn.role, turn.content) for turn in turns)
+    return SYSTEM_TURN + history + ASSISTANT_HEADER
 
 
 def sanitize_input(message: str) -> str:
@@ -175,136 +872,1716 @@ def sanitize_input(message: str) -> str:
     return sanitized.strip()
 
 
-def extract_json_from_response(text: str) -> ParsedOutput:
+def prepare_prompt(message: str) -> tuple[str, str]:
     """
-    Attempt to extract and parse JSON from model response.
+    Sanitize a user message and wrap it in the Llama 3 template.
 
     Args:
-        text: Raw model response text
+        message: Raw user input
 
     Returns:
-        ParsedOutput with parsed JSON or error details
-    """
-    # Try to find JSON in code blocks first
-    json_patterns = [
-        r"```json\s*([\s\S]*?)\s*```",
-        r"```\s*([\s\S]*?)\s*```",
-        r"\{[\s\S]*\}",
-        r"\[[\s\S]*\]",
-    ]
+        Tuple of (sanitized_message, formatted_prompt)
 
-    for pattern in json_patterns:
-        matches = re.findall(pattern, text)
-        for match in matches:
-            try:
-                parsed = json.loads(match)
-                return ParsedOutput(
-                    raw_text=text,
-                    parsed_json=parsed,
-                    parse_error=None,
-                )
-            except json.JSONDecodeError:
-                continue
+    Raises:
+        HTTPException: If nothing is left after sanitization
+    """
+    with span("sanitize"):
+        sanitized_message = sanitize_input(message)
 
-    # If no valid JSON found, try parsing the entire response
-    try:
-        parsed = json.loads(text.strip())
-        return ParsedOutput(
-            raw_text=text,
-            parsed_json=parsed,
-            parse_error=None,
-        )
-    except json.JSONDecodeError as e:
-        return ParsedOutput(
-            raw_text=text,
-            parsed_json=None,
-            parse_error=f"Could not parse JSON: {str(e)}",
+    if not sanitized_message:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Message is empty after sanitization",
         )
 
+    with span("format"):
+        formatted_prompt = format_llama3_prompt(sanitized_message)
+    return sanitized_message, formatted_prompt
 
-async def call_ollama_api(
-    prompt: str,
-    temperature: float = 0.7,
-    max_tokens: int = 2048,
-) -> tuple[str, int | None]:
-    """
-    Call the Ollama API with the formatted prompt.
 
-    Args:
-        prompt: Formatted prompt string
-        temperature: Sampling temperature
-        max_tokens: Maximum response tokens
+def format_sse(event: str, data: dict[str, Any]) -> str:
+    """Encode one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-    Returns:
-        Tuple of (response_text, tokens_used)
 
-    Raises:
-        HTTPException: If Ollama API call fails
-    """
-    payload = {
-        "model": OLLAMA_MODEL,
-        "prompt": prompt,
-        "stream": False,
-        "options": {
-            "temperature": temperature,
-            "num_predict": max_tokens,
-        },
-    }
+@dataclass(frozen=True)
+class OutputFormat:
+    """How a request constrains the model output, and how it is checked."""
 
-    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
-        try:
-            response = await client.post(
-                f"{OLLAMA_BASE_URL}/api/generate",
-                json=payload,
-            )
-            response.raise_for_status()
-            data = response.json()
+    mode: str  # none, json or functions
+    ollama_format: str | dict[str, Any] | None = None  # Ollama's `format` value
+    validate: Validator | None = None
 
-            return (
-                data.get("response", ""),
-                data.get("eval_count"),
-            )
 
-        except httpx.ConnectError as e:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail=f"Cannot connect to Ollama at {OLLAMA_BASE_URL}: {str(e)}",
-            )
-        except httpx.TimeoutException:
-            raise HTTPException(
-                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                detail="Ollama request timed out",
-            )
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Ollama API error: {e.response.text}",
-            )
+NO_OUTPUT_FORMAT = OutputFormat("none")
 
 
-async def check_ollama_connection() -> tuple[bool, bool]:
+def extract_json_from_response(
+    text: str,
+    output_format: OutputFormat = NO_OUTPUT_FORMAT,
+) -> ParsedOutput:
     """
-    Check if Ollama is reachable and model is available.
+    Attempt to extract and parse JSON from model response.
 
-    Returns:
-        Tuple of (ollama_connected, model_available)
+    Uses a single-pass scanner that prefers values inside ```json fences,
+    then any fence, then the first bare object or array.
+
+    Args:
+        text: Raw model response text
+        output_format: Format the generation was constrained to; a
+            function schema is also validated
+
+    Returns:
+        ParsedOutput with parsed JSON or error details
+    """
+    with span("parse"):
+        match = find_json(text)
+        schema_errors = None
+        if match is not None and output_format.validate:
+            schema_errors = output_format.validate(match.value)
+    if match is not None:
+        metrics.JSON_PARSE.labels(
+            format=output_format.mode,
+            result="schema_invalid" if schema_errors else "success",
+        ).inc()
+        return ParsedOutput(
+            raw_text=text,
+            parsed_json=match.value,
+            parse_error=None,
+            schema_errors=schema_errors or None,
+        )
+
+    # No object or array found; report why the whole response isn't JSON
+    try:
+        json.loads(text.strip())
+        error = "expected a JSON object or array"
+    except json.JSONDecodeError as e:
+        error = str(e)
+    metrics.JSON_PARSE.labels(format=output_format.mode, result="failure").inc()
+    return ParsedOutput(
+        raw_text=text,
+        parsed_json=None,
+        parse_error=f"Could not parse JSON: {error}",
+    )
+
+
+@dataclass
+class Generation:
+    """Result of one Ollama generation."""
+
+    response: str
+    tokens_used: int | None
+    tokens_saved: int | None = None
+    timings: GenerationTimings | None = None
+
+
+def elapsed_ms(started: float) -> float:
+    """Milliseconds since a `time.perf_counter()` value."""
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+def record_generation_metrics(timings: GenerationTimings) -> None:
+    """Feed one generation's timings and token counts to Prometheus."""
+    observations = (
+        (metrics.UPSTREAM_QUEUE_SECONDS, timings.upstream_queue_ms),
+        (metrics.MODEL_LOAD_SECONDS, timings.load_duration_ms),
+        (metrics.PROMPT_EVAL_SECONDS, timings.prompt_eval_duration_ms),
+        (metrics.DECODE_SECONDS, timings.eval_duration_ms),
+        (metrics.TIME_TO_FIRST_TOKEN_SECONDS, timings.time_to_first_token_ms),
+    )
+    for histogram, value_ms in observations:
+        if value_ms is not None:
+            histogram.observe(value_ms / 1000)
+    if timings.tokens_per_second is not None:
+        metrics.DECODE_TOKENS_PER_SECOND.observe(timings.tokens_per_second)
+    if timings.prompt_eval_count:
+        metrics.PROMPT_TOKENS.inc(timings.prompt_eval_count)
+    if timings.eval_count:
+        metrics.COMPLETION_TOKENS.inc(timings.eval_count)
+    if timings.upstream_ms is not None:
+        upstream_latency.observe(timings.upstream_ms / 1000)
+
+    # Ollama's own stages, as spans of the request that waited for them
+    for stage, value_ms in (
+        ("ollama", timings.upstream_ms),
+        ("model_load", timings.load_duration_ms),
+        ("prompt_eval", timings.prompt_eval_duration_ms),
+        ("decode", timings.eval_duration_ms),
+    ):
+        if value_ms is not None:
+            record(stage, value_ms / 1000)
+
+
+def parse_keep_alive(value: str) -> str | int:
+    """Pass durations like "30m" through; send plain numbers as seconds."""
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def build_generate_payload(
+    prompt: str,
+    temperature: float,
+    max_tokens: int,
+    stream: bool,
+    raw: bool = OLLAMA_RAW_PROMPT,
+    response_format: str | dict[str, Any] | None = None,
+    seed: int | None = None,
+) -> dict[str, Any]:
+    """
+    Build the JSON body for Ollama's `/api/generate` endpoint.
+
+    In raw mode the prompt from `format_llama3_prompt` is sent as-is instead
+    of being wrapped in the model's template a second time.
+    `response_format` ("json" or a JSON schema) becomes Ollama's `format`,
+    which constrains sampling to output matching it. `seed` fixes Ollama's
+    sampler seed.
+    """
+    payload: dict[str, Any] = {
+        "model": OLLAMA_MODEL,
+        "prompt": prompt,
+        "stream": stream,
+        "keep_alive": parse_keep_alive(OLLAMA_KEEP_ALIVE),
+        "options": {
+            "temperature": temperature,
+            "num_predict": max_tokens,
+        },
+    }
+    if raw:
+        payload["raw"] = True
+    if response_format is not None:
+        payload["format"] = response_format
+    if seed is not None:
+        payload["options"]["seed"] = seed
+    return payload
+
+
+def ollama_error_to_http(error: httpx.HTTPError, url: str | None = None) -> HTTPException:
+    """
+    Translate an httpx failure talking to Ollama into an HTTPException.
+
+    Args:
+        error: Exception raised by the shared Ollama client
+        url: Base URL of the node that failed
+
+    Returns:
+        HTTPException with a matching status code and detail
+    """
+    if isinstance(error, httpx.ConnectError):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Cannot connect to Ollama at {url or OLLAMA_BASE_URL}: {str(error)}",
+        )
+    if isinstance(error, httpx.PoolTimeout):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Ollama connection pool exhausted, try again later",
+        )
+    if isinstance(error, httpx.TimeoutException):
+        return HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Ollama request timed out",
+        )
+    if isinstance(error, httpx.HTTPStatusError):
+        return HTTPException(
+            status_code=error.response.status_code,
+            detail=f"Ollama API error: {error.response.text}",
+        )
+    return HTTPException(
+        status_code=status.HTTP_502_BAD_GATEWAY,
+        detail=f"Ollama request failed: {str(error)}",
+    )
+
+
+def choose_ollama_node() -> OllamaNode:
+    """
+    Pick the Ollama node for the next generation.
+
+    Raises:
+        HTTPException: 503 with Retry-After if no node is routable
+    """
+    try:
+        return ollama_pool.choose()
+    except NoHealthyNode as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="No healthy Ollama node available",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+
+
+def record_node_error(node: OllamaNode, error: httpx.HTTPError) -> None:
+    """Count a connect failure, timeout or server error against the node's circuit."""
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+        ollama_pool.record_connect_failure(node)
+    elif isinstance(error, httpx.PoolTimeout):
+        pass  # our own connection pool is exhausted, not the node's fault
+    elif isinstance(error, httpx.TimeoutException) or (
+        isinstance(error, httpx.HTTPStatusError) and error.response.status_code >= 500
+    ):
+        ollama_pool.record_failure(node)
+
+
+def retry_reason(error: httpx.HTTPError) -> str | None:
+    """
+    Why a failed Ollama request may be sent again, or None if it may not.
+
+    Only failures where Ollama cannot have started generating are retried:
+    the connection was never established, or Ollama answered 502/503
+    (e.g. while restarting or loading the model).
+    """
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+        return "connect"
+    if isinstance(error, httpx.HTTPStatusError) and error.response.status_code in (502, 503):
+        return f"http_{error.response.status_code}"
+    return None
+
+
+async def backoff_before_retry(
+    error: httpx.HTTPError,
+    attempt: int,
+    deadline: float | None,
+) -> bool:
+    """
+    Sleep before retrying a failed Ollama request, if a retry is allowed.
+
+    Uses exponential backoff with full jitter, and gives up rather than
+    sleep past the request deadline.
+
+    Args:
+        error: Failure of the previous attempt
+        attempt: Number of attempts made so far
+        deadline: Optional `time.monotonic()` deadline for the request
+
+    Returns:
+        True if the caller should try again
+    """
+    reason = retry_reason(error)
+    if reason is None or attempt > OLLAMA_RETRY_ATTEMPTS:
+        return False
+    delay = random.uniform(
+        0, min(OLLAMA_RETRY_MAX_DELAY, OLLAMA_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    )
+    if deadline is not None and time.monotonic() + delay >= deadline:
+        return False
+    metrics.OLLAMA_RETRIES.labels(reason=reason).inc()
+    await asyncio.sleep(delay)
+    return True
+
+
+async def call_ollama_api(
+    prompt: str,
+    temperature: float = 0.7,
+    max_tokens: int = 2048,
+    raw: bool = OLLAMA_RAW_PROMPT,
+    deadline: float | None = None,
+    response_format: str | dict[str, Any] | None = None,
+) -> Generation:
+    """
+    Call the Ollama API with the formatted prompt.
+
+    Connect errors and 502/503 answers are retried on a freshly chosen node
+    (see `backoff_before_retry`); when every node's circuit is open the
+    call fails at once.
+
+    Args:
+        prompt: Formatted prompt string
+        temperature: Sampling temperature
+        max_tokens: Maximum response tokens
+        raw: Send the prompt without applying the model's template
+        deadline: Optional `time.monotonic()` deadline that bounds retries
+        response_format: Optional Ollama `format` ("json" or a JSON schema)
+
+    Returns:
+        Generation with the response text, token count and timings
+
+    Raises:
+        HTTPException: If Ollama API call fails
+    """
+    payload = build_generate_payload(
+        prompt,
+        temperature,
+        max_tokens,
+        stream=False,
+        raw=raw,
+        response_format=response_format,
+    )
+
+    client = get_ollama_client()
+    attempt = 0
+    while True:
+        attempt += 1
+        node = choose_ollama_node()
+        ticket = ollama_pool.begin(node)
+        started = time.perf_counter()
+        try:
+            response = await client.post(f"{node.url}/api/generate", json=payload)
+            response.raise_for_status()
+            data = response.json()
+            break
+
+        except httpx.HTTPError as e:
+            record_node_error(node, e)
+            error = e
+        finally:
+            ollama_pool.end(node, ticket)
+        if not await backoff_before_retry(error, attempt, deadline):
+            raise ollama_error_to_http(error, node.url)
+
+    ollama_pool.record_success(node, data)
+    timings = GenerationTimings.from_ollama(data, upstream_ms=elapsed_ms(started))
+    record_generation_metrics(timings)
+    return Generation(
+        response=data.get("response", ""),
+        tokens_used=data.get("eval_count"),
+        timings=timings,
+    )
+
+
+class OllamaStream:
+    """A streaming generation running on one pool node."""
+
+    def __init__(
+        self, response: httpx.Response, node: OllamaNode, ticket: int, started: float
+    ) -> None:
+        self.response = response
+        self.node = node
+        self.ticket = ticket  # breaker ticket from `ollama_pool.begin`
+        self.started = started  # time.perf_counter() when the request was sent
+        self.first_token_ms: float | None = None
+        self.tokens = 0  # generated tokens received so far
+        self.final_chunk: dict[str, Any] | None = None  # Ollama's last chunk, once done
+        self.error: HTTPException | None = None  # failure reported to the client mid-stream
+        self.closed = False
+
+    def timings(self, final_chunk: dict[str, Any] | None = None) -> GenerationTimings:
+        """Timings of the generation so far; pass Ollama's last chunk if it arrived."""
+        return GenerationTimings.from_ollama(
+            final_chunk or {},
+            upstream_ms=elapsed_ms(self.started),
+            time_to_first_token_ms=self.first_token_ms,
+        )
+
+    async def aclose(self) -> None:
+        """Abort or finish the upstream request; safe to call repeatedly."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            # Shielded: httpcore's own shielding does not cover asyncio task
+            # cancellation, and a close interrupted halfway leaves the
+            # connection checked out of the pool for good
+            await asyncio.shield(self.response.aclose())
+        finally:
+            ollama_pool.end(self.node, self.ticket)
+
+
+async def open_ollama_stream(
+    prompt: str,
+    temperature: float = 0.7,
+    max_tokens: int = 2048,
+    deadline: float | None = None,
+    response_format: str | dict[str, Any] | None = None,
+    seed: int | None = None,
+) -> OllamaStream:
+    """
+    Start a streaming generation and return once Ollama has sent headers.
+
+    Connection and status errors surface here, before any bytes reach the
+    client, so they can still be retried or reported with a proper HTTP
+    status. The caller owns the returned stream and must close it.
+
+    Args:
+        prompt: Formatted prompt string
+        temperature: Sampling temperature
+        max_tokens: Maximum response tokens
+        deadline: Optional `time.monotonic()` deadline that bounds retries
+        response_format: Optional Ollama `format` ("json" or a JSON schema)
+        seed: Optional sampler seed
+
+    Returns:
+        Open OllamaStream whose body is Ollama's NDJSON chunk stream
+
+    Raises:
+        HTTPException: If the request cannot be started
+    """
+    payload = build_generate_payload(
+        prompt, temperature, max_tokens, stream=True, response_format=response_format, seed=seed
+    )
+
+    client = get_ollama_client()
+    attempt = 0
+    while True:
+        attempt += 1
+        node = choose_ollama_node()
+        request = client.build_request("POST", f"{node.url}/api/generate", json=payload)
+        ticket = ollama_pool.begin(node)
+        started = time.perf_counter()
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            ollama_pool.end(node, ticket)
+            record_node_error(node, e)
+            error = e
+        except BaseException:  # cancelled while waiting for headers
+            ollama_pool.end(node, ticket)
+            raise
+        else:
+            stream = OllamaStream(response, node, ticket, started)
+            if not response.is_error:
+                return stream
+            await response.aread()
+            await stream.aclose()
+            error = httpx.HTTPStatusError(
+                "Ollama returned an error status",
+                request=request,
+                response=response,
+            )
+            record_node_error(node, error)
+        if not await backoff_before_retry(error, attempt, deadline):
+            raise ollama_error_to_http(error, node.url)
+
+
+async def iter_ollama_chunks(stream: OllamaStream) -> AsyncIterator[dict[str, Any]]:
+    """
+    Decode Ollama's NDJSON stream into chunk dictionaries.
+
+    Args:
+        stream: Open stream from `open_ollama_stream`
+
+    Yields:
+        One dict per generated chunk; the last one has `done` set to True
+    """
+    async for line in stream.response.aiter_lines():
+        if not line.strip():
+            continue
+        chunk = json.loads(line)
+        if "error" in chunk:
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"Ollama API error: {chunk['error']}",
+            )
+        if chunk.get("response"):
+            stream.tokens += 1  # Ollama streams one token per chunk
+            if stream.first_token_ms is None:
+                stream.first_token_ms = elapsed_ms(stream.started)
+        if chunk.get("done"):
+            stream.final_chunk = chunk
+            ollama_pool.record_success(stream.node, chunk)
+        yield chunk
+        if chunk.get("done"):
+            break
+
+
+async def call_ollama_until_json(
+    prompt: str,
+    temperature: float = 0.7,
+    max_tokens: int = 2048,
+    deadline: float | None = None,
+    response_format: str | dict[str, Any] | None = None,
+    seed: int | None = None,
+    on_token: Callable[[], None] | None = None,
+) -> Generation:
+    """
+    Stream a generation and cancel it once the first JSON value closes.
+
+    Closing the upstream response aborts the request, which makes Ollama
+    stop decoding and frees its slot for the next request.
+
+    Args:
+        prompt: Formatted prompt string
+        temperature: Sampling temperature
+        max_tokens: Maximum response tokens
+        deadline: Optional `time.monotonic()` deadline that bounds retries
+        response_format: Optional Ollama `format` ("json" or a JSON schema)
+        seed: Optional sampler seed
+        on_token: Optional callback for every streamed token, so a caller
+            can count the tokens of a generation it cancels
+
+    Returns:
+        Generation; tokens_saved is None when the model finished on its own.
+        Ollama reports no durations for a cancelled generation, so its
+        timings only carry the measured upstream time and time to first token.
+
+    Raises:
+        HTTPException: If Ollama API call fails
+    """
+    upstream = await open_ollama_stream(
+        prompt, temperature, max_tokens, deadline, response_format, seed
+    )
+    scanner = JSONScanner()
+    pieces: list[str] = []
+    final_chunk: dict[str, Any] | None = None
+
+    try:
+        async for chunk in iter_ollama_chunks(upstream):
+            if chunk.get("done"):
+                final_chunk = chunk
+                break
+            delta = chunk.get("response", "")
+            pieces.append(delta)
+            if on_token is not None:
+                on_token()
+            if delta and scanner.feed(delta):
+                break
+    except httpx.HTTPError as e:
+        record_node_error(upstream.node, e)
+        raise ollama_error_to_http(e, upstream.node.url)
+    finally:
+        await upstream.aclose()
+
+    response_text = "".join(pieces)
+    timings = upstream.timings(final_chunk)
+    record_generation_metrics(timings)
+    if final_chunk is not None:
+        return Generation(response_text, final_chunk.get("eval_count"), timings=timings)
+
+    # Ollama streams one token per chunk
+    tokens_used = len(pieces)
+    tokens_saved = max(max_tokens - tokens_used, 0)
+    metrics.EARLY_STOPS.inc()
+    metrics.TOKENS_SAVED.inc(tokens_saved)
+    metrics.COMPLETION_TOKENS.inc(tokens_used)
+    return Generation(response_text, tokens_used, tokens_saved, timings)
+
+
+scheduler = AdmissionController(
+    max_in_flight=ADMISSION_MAX_IN_FLIGHT,
+    queue_size=ADMISSION_QUEUE_SIZE,
+    adaptive=ADMISSION_ADAPTIVE,
+    min_limit=ADMISSION_MIN_IN_FLIGHT,
+    max_limit=ADMISSION_MAX_LIMIT,
+    target_latency=ADMISSION_TARGET_LATENCY,
+)
+metrics.ADMISSION_IN_FLIGHT.set_function(lambda: scheduler.in_flight)
+metrics.ADMISSION_LIMIT.set_function(lambda: scheduler.capacity)
+metrics.ADMISSION_QUEUE_DEPTH.set_function(lambda: scheduler.waiting)
+
+
+def request_deadline(timeout: float | None) -> float | None:
+    """Convert a client timeout in seconds into a `time.monotonic()` deadline."""
+    return time.monotonic() + timeout if timeout is not None else None
+
+
+T = TypeVar("T")
+
+
+class CancellableWork:
+    """Work run by `run_cancellable`; leases taken while running it mark it admitted."""
+
+    def __init__(self) -> None:
+        self.admitted = False  # a generation slot was acquired, so Ollama was working
+
+
+_cancellable_work: ContextVar[CancellableWork | None] = ContextVar(
+    "cancellable_work", default=None
+)
+
+
+async def wait_for_disconnect(http_request: Request) -> None:
+    """Return once the client has closed the connection (body already read)."""
+    while True:
+        message = await http_request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def run_cancellable(
+    work: Awaitable[T],
+    endpoint: str,
+    deadline: float | None = None,
+    http_request: Request | None = None,
+) -> T:
+    """
+    Await `work`, cancelling it if the client disconnects or the deadline passes.
+
+    Cancellation propagates down to the Ollama call, which closes the
+    upstream connection: Ollama stops generating and the admission slot is
+    released right away instead of when the generation would have ended.
+    Work cancelled before it was admitted aborted no generation, so it is
+    counted with reason "queued".
+
+    Args:
+        work: Coroutine producing the response
+        endpoint: Label for the cancellation metric
+        deadline: Optional `time.monotonic()` deadline for the request
+        http_request: Request to watch for a client disconnect
+
+    Returns:
+        Result of `work`
+
+    Raises:
+        HTTPException: 504 if the deadline passed, 499 if the client left
+    """
+    state = CancellableWork()
+    token = _cancellable_work.set(state)
+    try:
+        task = asyncio.ensure_future(work)  # runs in a copy of this context
+    finally:
+        _cancellable_work.reset(token)
+    watchers = {task}
+    disconnect = None
+    if http_request is not None:
+        disconnect = asyncio.ensure_future(wait_for_disconnect(http_request))
+        watchers.add(disconnect)
+    timeout = max(deadline - time.monotonic(), 0) if deadline is not None else None
+
+    try:
+        done, _ = await asyncio.wait(
+            watchers, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+        )
+    finally:
+        if disconnect is not None:
+            disconnect.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    if task in done:
+        return task.result()
+    client_left = disconnect is not None and disconnect in done
+    reason = "client_disconnect" if client_left else "deadline"
+    metrics.CANCELLATIONS.labels(
+        endpoint=endpoint, reason=reason if state.admitted else "queued"
+    ).inc()
+    if client_left:
+        raise HTTPException(status_code=499, detail="Client closed request")
+    raise HTTPException(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        detail="Request deadline exceeded",
+    )
+
+
+class GenerationLease:
+    """An admitted generation slot that is released exactly once."""
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        work = _cancellable_work.get()
+        if work is not None:
+            work.admitted = True
+        self.released = False
+
+    def release(self, error: BaseException | None = None) -> None:
+        """
+        Return the slot, feeding its outcome to the adaptive limit.
+
+        Cancellations and client errors say nothing about Ollama's load, so
+        they are not used as latency samples.
+        """
+        if self.released:
+            return
+        self.released = True
+        if isinstance(error, asyncio.CancelledError):
+            scheduler.release()
+            return
+        overloaded = error is not None and not (
+            isinstance(error, HTTPException) and error.status_code < 500
+        )
+        scheduler.release(time.monotonic() - self.started, ok=not overloaded)
+
+
+async def acquire_generation_slot(priority: int, deadline: float | None) -> GenerationLease:
+    """
+    Wait for the scheduler to admit a generation.
+
+    Queue wait is capped by ADMISSION_MAX_QUEUE_WAIT and by the request's
+    own deadline.
+
+    Returns:
+        Lease that must be released when the generation ends
+
+    Raises:
+        HTTPException: 429 with Retry-After if the request is rejected
+    """
+    queue_deadline = time.monotonic() + ADMISSION_MAX_QUEUE_WAIT
+    if deadline is not None:
+        queue_deadline = min(queue_deadline, deadline)
+
+    try:
+        with span("queue"):
+            wait = await scheduler.acquire(priority, queue_deadline)
+    except AdmissionRejected as e:
+        metrics.ADMISSION_REJECTIONS.labels(reason=e.reason).inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Server busy ({e.reason.replace('_', ' ')}), retry later",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    metrics.ADMISSION_WAIT_SECONDS.observe(wait)
+    return GenerationLease()
+
+
+def try_acquire_generation_slot() -> GenerationLease | None:
+    """Take a free admission slot without queueing; None if there is none."""
+    return GenerationLease() if scheduler.try_acquire() else None
+
+
+@asynccontextmanager
+async def generation_slot(priority: int, deadline: float | None) -> AsyncIterator[None]:
+    """Hold an admission slot for the duration of the block."""
+    lease = await acquire_generation_slot(priority, deadline)
+    try:
+        yield
+    except BaseException as e:
+        lease.release(e)
+        raise
+    lease.release()
+
+
+rate_limiter = TokenRateLimiter(
+    rate=RATE_LIMIT_TOKENS_PER_MINUTE / 60,
+    capacity=RATE_LIMIT_BURST,
+    max_clients=RATE_LIMIT_MAX_CLIENTS,
+)
+metrics.RATE_LIMIT_CLIENTS.set_function(lambda: len(rate_limiter))
+
+
+def client_key(http_request: Request) -> str:
+    """
+    Identify the client a request is charged to: its API key (`X-API-Key`
+    or a bearer token, hashed so no secret is kept in memory), otherwise
+    its IP address.
+    """
+    api_key = http_request.headers.get("x-api-key")
+    authorization = http_request.headers.get("authorization", "")
+    if not api_key and authorization.lower().startswith("bearer "):
+        api_key = authorization[len("bearer "):].strip()
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:32]
+
+    forwarded = http_request.headers.get("x-forwarded-for")
+    if RATE_LIMIT_TRUST_FORWARDED and forwarded:
+        return "ip:" + forwarded.split(",")[0].strip()
+    return "ip:" + (http_request.client.host if http_request.client else "unknown")
+
+
+def reserve_tokens(http_request: Request, amount: int, endpoint: str) -> Reservation | None:
+    """
+    Reserve a request's worst-case token cost from its client's bucket.
+
+    Returns:
+        The reservation to settle when the request ends, or None if rate
+        limiting is disabled
+
+    Raises:
+        HTTPException: 429 with Retry-After and RateLimit-* headers if the
+            bucket cannot cover the cost yet
+    """
+    if not RATE_LIMIT_ENABLED:
+        return None
+    try:
+        reservation = rate_limiter.reserve(client_key(http_request), amount)
+    except RateLimited as e:
+        metrics.RATE_LIMITED.labels(endpoint=endpoint).inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Token rate limit exceeded, retry later",
+            headers={
+                "Retry-After": str(max(1, math.ceil(e.retry_after))),
+                **rate_limit_headers(rate_limiter.capacity, e.remaining, e.reset),
+            },
+        )
+    metrics.RATE_LIMIT_TOKENS.labels(kind="reserved").inc(amount)
+    return reservation
+
+
+def settle_tokens(reservation: Reservation | None, used: int) -> None:
+    """Charge the tokens a request really used and refund the rest of its reservation."""
+    if reservation is None or reservation.settled:
+        return
+    rate_limiter.settle(reservation, used)
+    metrics.RATE_LIMIT_TOKENS.labels(kind="charged").inc(used)
+
+
+def reservation_headers(reservation: Reservation | None) -> dict[str, str]:
+    """RateLimit-* headers reporting the client's bucket after a request."""
+    if reservation is None:
+        return {}
+    return rate_limit_headers(rate_limiter.capacity, reservation.remaining, reservation.reset)
+
+
+def chat_prompt_tokens(request: ChatRequest) -> int:
+    """Estimated prompt tokens of a chat request."""
+    return estimate_tokens(format_llama3_prompt(request.message))
+
+
+def failed_request_tokens(error: BaseException, prompt_tokens: int) -> int:
+    """
+    Tokens charged for a failed request: nothing if it was rejected before
+    reaching Ollama (4xx, 503), else its prompt.
+    """
+    if isinstance(error, HTTPException) and (
+        error.status_code < 500 or error.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    ):
+        return 0
+    return prompt_tokens
+
+
+def chat_cost(request: ChatRequest) -> int:
+    """Worst-case tokens of a chat request: prompt plus max_tokens per candidate."""
+    return (chat_prompt_tokens(request) + request.max_tokens) * request.candidates
+
+
+def chat_tokens_used(
+    request: ChatRequest,
+    chat_response: ChatResponse,
+    cache_outcome: CacheOutcome,
+) -> int:
+    """
+    Tokens Ollama spent on a chat response: evaluated prompt tokens plus
+    generated ones, losing hedge candidates included. Responses served
+    from the cache cost nothing.
+    """
+    if cache_outcome in ("hit", "coalesced"):
+        return 0
+    timings = chat_response.timings
+    prompt_tokens = timings.prompt_eval_count if timings else None
+    if prompt_tokens is None:  # cancelled early (stop_on_json) before Ollama reported it
+        prompt_tokens = chat_prompt_tokens(request)
+    tokens = prompt_tokens + (chat_response.tokens_used or 0)
+    if chat_response.hedge is not None:  # every candidate evaluated the prompt
+        tokens += chat_response.hedge.extra_tokens
+        tokens += prompt_tokens * (chat_response.hedge.launched - 1)
+    return tokens
+
+
+traffic_recorder = (
+    TrafficRecorder(CAPTURE_PATH, CAPTURE_MAX_BUFFERED, CAPTURE_FLUSH_INTERVAL)
+    if CAPTURE_PATH
+    else None
+)
+
+
+def error_status(error: BaseException) -> int:
+    """HTTP status a failed request ended with; 499 if the client went away."""
+    if isinstance(error, HTTPException):
+        return error.status_code
+    if isinstance(error, asyncio.CancelledError):
+        return 499
+    return status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+def capture_request(
+    endpoint: str,
+    request: ChatRequest,
+    arrived: float,
+    started: float,
+    status_code: int,
+    cache_outcome: CacheOutcome | None = None,
+    timings: GenerationTimings | None = None,
+) -> None:
+    """
+    Add a served chat request to the traffic capture, if it is enabled.
+
+    The message is stored sanitized, or only as its estimated token count
+    with CAPTURE_MESSAGES=false; other fields only if not left at their
+    defaults.
+
+    Args:
+        endpoint: "chat" or "chat_stream"
+        request: The validated request
+        arrived: `time.time()` when the request arrived
+        started: `time.perf_counter()` at the same moment
+        status_code: HTTP status the request ended with
+        cache_outcome: Response cache outcome, if it got that far
+        timings: Timings of the request's own generation
+    """
+    if traffic_recorder is None:
+        return
+    params = request.model_dump(mode="json", exclude_defaults=True)
+    message = sanitize_input(request.message)
+    if CAPTURE_MESSAGES:
+        params["message"] = message
+    else:
+        del params["message"]
+        params["message_tokens"] = estimate_tokens(message)
+    entry: dict[str, Any] = {
+        "ts": round(arrived, 3),
+        "endpoint": endpoint,
+        "request": params,
+        "status": status_code,
+        "latency_ms": round(elapsed_ms(started), 1),
+    }
+    if cache_outcome is not None:
+        entry["cache"] = cache_outcome
+    if timings is not None:
+        entry["timings"] = timings.model_dump(exclude_none=True)
+    captured = traffic_recorder.record(entry)
+    metrics.CAPTURE_ENTRIES.labels(result="captured" if captured else "dropped").inc()
+
+
+async def generate_response(
+    request: ChatRequest,
+    formatted_prompt: str,
+    deadline: float | None = None,
+    output_format: OutputFormat = NO_OUTPUT_FORMAT,
+) -> Generation:
+    """
+    Run one admitted generation for a chat request.
+
+    Args:
+        request: Validated chat request
+        formatted_prompt: Prompt from `prepare_prompt`
+        deadline: Optional `time.monotonic()` deadline for the request
+        output_format: Output constraint from `resolve_output_format`
+
+    Returns:
+        Generation result
+    """
+    async with generation_slot(request.priority, deadline):
+        if request.stop_on_json:
+            return await call_ollama_until_json(
+                prompt=formatted_prompt,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens,
+                deadline=deadline,
+                response_format=output_format.ollama_format,
+            )
+
+        return await call_ollama_api(
+            prompt=formatted_prompt,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens,
+            deadline=deadline,
+            response_format=output_format.ollama_format,
+        )
+
+
+def response_cache_key(
+    request: ChatRequest,
+    sanitized_message: str,
+    formatted_prompt: str,
+) -> tuple[Any, ...]:
+    """Build the exact-match cache key for a chat request."""
+    prompt_hash = hashlib.sha256(formatted_prompt.encode()).hexdigest()
+    return (
+        sanitized_message,
+        prompt_hash,
+        OLLAMA_MODEL,
+        request.temperature,
+        request.max_tokens,
+        request.stop_on_json,
+        request.format,
+        tuple(sorted(request.functions or ())),
+    )
+
+
+def response_cache_sizeof(key: tuple[Any, ...], value: Generation) -> int:
+    """Rough memory footprint of a cached response, in bytes."""
+    return len(key[0].encode()) + len(value.response.encode()) + 512
+
+
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=RESPONSE_CACHE_MAX_BYTES,
+    ttl=RESPONSE_CACHE_TTL,
+    sizeof=response_cache_sizeof,
+)
+metrics.RESPONSE_CACHE_ENTRIES.set_function(lambda: len(response_cache))
+metrics.RESPONSE_CACHE_BYTES.set_function(lambda: response_cache.total_bytes)
+
+
+async def cached_generate(
+    request: ChatRequest,
+    sanitized_message: str,
+    formatted_prompt: str,
+    cache_control: str | None = None,
+    deadline: float | None = None,
+    output_format: OutputFormat = NO_OUTPUT_FORMAT,
+) -> tuple[Generation, CacheOutcome]:
+    """
+    Generate a response through the exact-match response cache.
+
+    Identical requests that arrive while one is already in flight share its
+    upstream call.
+
+    Args:
+        request: Validated chat request
+        sanitized_message: Output of `sanitize_input`
+        formatted_prompt: Prompt built from the sanitized message
+        cache_control: Value of the request's Cache-Control header
+        deadline: Optional `time.monotonic()` deadline for the request
+        output_format: Output constraint from `resolve_output_format`
+
+    Returns:
+        Tuple of (generation result, cache outcome)
+    """
+    directives = {d.strip().lower() for d in (cache_control or "").split(",")}
+    cacheable = RESPONSE_CACHE_ENABLED and (
+        request.temperature == 0 or RESPONSE_CACHE_ALL_TEMPERATURES
+    )
+    lookup = cacheable and not directives & {"no-cache", "no-store"}
+    store = cacheable and "no-store" not in directives
+
+    if not lookup and not store:
+        outcome: CacheOutcome = "bypass"
+        result = await generate_response(request, formatted_prompt, deadline, output_format)
+    else:
+        result, outcome = await response_cache.get_or_compute(
+            response_cache_key(request, sanitized_message, formatted_prompt),
+            lambda: generate_response(request, formatted_prompt, deadline, output_format),
+            lookup=lookup,
+            store=store,
+        )
+
+    metrics.RESPONSE_CACHE_REQUESTS.labels(result=outcome).inc()
+    return result, outcome
+
+
+upstream_latency = LatencyWindow(size=HEDGE_LATENCY_WINDOW)
+
+
+def hedge_delay(request: ChatRequest) -> float:
+    """Seconds to give the primary candidate before hedging."""
+    if request.hedge_delay_ms is not None:
+        return request.hedge_delay_ms / 1000
+    delay = upstream_latency.quantile(HEDGE_DELAY_QUANTILE)
+    return delay if delay is not None else HEDGE_INITIAL_DELAY
+
+
+metrics.HEDGE_DELAY_SECONDS.set_function(
+    lambda: upstream_latency.quantile(HEDGE_DELAY_QUANTILE) or HEDGE_INITIAL_DELAY
+)
+
+
+async def hedged_generate(
+    request: ChatRequest,
+    formatted_prompt: str,
+    deadline: float | None = None,
+    output_format: OutputFormat = NO_OUTPUT_FORMAT,
+) -> tuple[Generation, ParsedOutput, HedgeInfo]:
+    """
+    Race up to `request.candidates` generations; the first valid JSON wins.
+
+    The primary candidate is admitted like any request. The others start
+    once it has taken longer than `hedge_delay` (or returned no valid JSON),
+    each with a higher temperature and its own seed, and usually on another
+    node since the pool routes to the least busy one. They only run in a
+    free admission slot and are skipped rather than queued, so hedging
+    never delays other requests. Every candidate stops at its first
+    complete JSON value, as with `stop_on_json`; the losers are cancelled.
+
+    Args:
+        request: Validated chat request with candidates > 1
+        formatted_prompt: Prompt from `prepare_prompt`
+        deadline: Optional `time.monotonic()` deadline for the request
+        output_format: Output constraint from `resolve_output_format`
+
+    Returns:
+        Tuple of (winning generation, its parsed output, hedge report)
+    """
+    tokens = [0] * request.candidates
+    delay = hedge_delay(request)
+
+    async def candidate(index: int) -> tuple[Generation, ParsedOutput]:
+        if index == 0:
+            lease = await acquire_generation_slot(request.priority, deadline)
+        else:
+            lease = try_acquire_generation_slot()
+            if lease is None:
+                metrics.HEDGE_CANDIDATES.labels(outcome="skipped").inc()
+                raise HedgeSkipped()
+            metrics.HEDGE_CANDIDATES.labels(outcome="launched").inc()
+
+        def count_token() -> None:
+            tokens[index] += 1
+
+        try:
+            generation = await call_ollama_until_json(
+                prompt=formatted_prompt,
+                temperature=min(request.temperature + index * HEDGE_TEMPERATURE_STEP, 2.0),
+                max_tokens=request.max_tokens,
+                deadline=deadline,
+                response_format=output_format.ollama_format,
+                seed=random.randrange(2**31) if index else None,
+                on_token=count_token,
+            )
+        except BaseException as e:
+            lease.release(e)
+            raise
+        lease.release()
+        return generation, extract_json_from_response(generation.response, output_format)
+
+    def valid(result: tuple[Generation, ParsedOutput]) -> bool:
+        parsed = result[1]
+        return parsed.parsed_json is not None and not parsed.schema_errors
+
+    outcome = await hedge(candidate, valid, request.candidates, delay)
+    generation, parsed_output = outcome.value
+    extra_tokens = sum(tokens) - tokens[outcome.winner]
+
+    if not outcome.accepted:
+        result = "none_valid"
+    else:
+        result = "primary" if outcome.winner == 0 else "hedge"
+    metrics.HEDGE_REQUESTS.labels(winner=result).inc()
+    metrics.HEDGE_EXTRA_TOKENS.inc(extra_tokens)
+    return (
+        generation,
+        parsed_output,
+        HedgeInfo(
+            candidates=request.candidates,
+            launched=outcome.launched,
+            winner=outcome.winner,
+            valid=outcome.accepted,
+            delay_ms=round(delay * 1000, 3),
+            extra_tokens=extra_tokens,
+        ),
+    )
+
+
+_probe_task: asyncio.Task | None = None
+
+
+async def check_ollama_connection() -> tuple[bool, bool]:
+    """
+    Probe every Ollama node and update the pool's view of them.
+
+    Concurrent callers share one probe instead of each hitting Ollama.
+
+    Returns:
+        Tuple of (ollama_connected, model_available) across all nodes
+    """
+    global _probe_task
+    if _probe_task is None or _probe_task.done():
+        _probe_task = asyncio.create_task(
+            ollama_pool.probe(get_ollama_client(), OLLAMA_MODEL, HEALTH_CHECK_TIMEOUT)
+        )
+    await asyncio.shield(_probe_task)
+    return ollama_status()
+
+
+def ollama_status() -> tuple[bool, bool]:
+    """
+    Connectivity as of the last probe, without touching the network.
+
+    Returns:
+        Tuple of (ollama_connected, model_available): True if any node is
+    """
+    return (
+        any(node.connected for node in ollama_pool.nodes),
+        any(node.model_available for node in ollama_pool.nodes),
+    )
+
+
+model_warmer = ModelWarmer(
+    ollama_pool,
+    model=OLLAMA_MODEL,
+    keep_alive=parse_keep_alive(OLLAMA_KEEP_ALIVE),
+    ping_interval=MODEL_KEEPALIVE_INTERVAL,
+    idle_timeout=MODEL_IDLE_TIMEOUT,
+    on_loaded=lambda load_ns: metrics.MODEL_LOAD_SECONDS.observe(load_ns / 1e9),
+)
+
+
+def model_state() -> str:
+    """Model state for health reporting; "ready" when warm-up is disabled."""
+    if not MODEL_WARMUP_ENABLED:
+        connected, available = ollama_status()
+        return "ready" if connected and available else "cold"
+    return model_warmer.state()
+
+
+async def run_ollama_prober() -> None:
+    """Background task: probe all nodes every OLLAMA_PROBE_INTERVAL seconds."""
+    while True:
+        await check_ollama_connection()
+        await asyncio.sleep(OLLAMA_PROBE_INTERVAL)
+
+
+async def run_chat_pipeline(
+    request: ChatRequest,
+    cache_control: str | None = None,
+    deadline: float | None = None,
+) -> tuple[ChatResponse, CacheOutcome]:
+    """
+    Sanitize, format, generate and parse one chat request.
+
+    Args:
+        request: Validated chat request
+        cache_control: Value of the request's Cache-Control header
+        deadline: Optional `time.monotonic()` deadline for the request
+
+    Returns:
+        Tuple of (chat response, cache outcome); timings are omitted when
+        the response did not come from this request's own generation
+
+    Raises:
+        HTTPException: If the message is empty, a requested function is not
+            registered, or generation fails
+    """
+    # Sanitize input and format prompt
+    sanitized_message, formatted_prompt = prepare_prompt(request.message)
+    output_format = resolve_output_format(request)
+
+    hedge_info = None
+    if request.candidates > 1:
+        # Which candidate wins varies between runs, so hedged requests skip the cache
+        generation, parsed_output, hedge_info = await hedged_generate(
+            request, formatted_prompt, deadline, output_format
+        )
+        cache_outcome: CacheOutcome = "bypass"
+        metrics.RESPONSE_CACHE_REQUESTS.labels(result=cache_outcome).inc()
+    else:
+        # Call Ollama (or serve an identical earlier request from cache)
+        generation, cache_outcome = await cached_generate(
+            request, sanitized_message, formatted_prompt, cache_control, deadline, output_format
+        )
+
+        # Parse response
+        parsed_output = extract_json_from_response(generation.response, output_format)
+
+    tool_results = None
+    if request.execute_tools:
+        tool_results = await execute_parsed_output(parsed_output, deadline)
+
+    chat_response = ChatResponse(
+        success=True,
+        response=generation.response,
+        parsed_output=parsed_output,
+        model=OLLAMA_MODEL,
+        tokens_used=generation.tokens_used,
+        tokens_saved=generation.tokens_saved,
+        timings=generation.timings if cache_outcome in ("miss", "bypass") else None,
+        tool_results=tool_results,
+        hedge=hedge_info,
+    )
+    return chat_response, cache_outcome
+
+
+async def run_batch(
+    batch: BatchChatRequest,
+    cache_control: str | None,
+    deadline: float | None,
+    on_tokens: Callable[[int], None] | None = None,
+) -> AsyncIterator[str]:
+    """
+    Run batch items through the chat pipeline with bounded concurrency.
+
+    Results are yielded as NDJSON lines in completion order. Each item's
+    failure is reported in its own line and does not stop the batch.
+    Closing the generator cancels the remaining items.
+
+    Args:
+        batch: Validated batch request
+        cache_control: Value of the request's Cache-Control header
+        deadline: Optional `time.monotonic()` deadline for the whole batch
+        on_tokens: Optional callback with the tokens each item consumed
+
+    Yields:
+        One JSON-encoded BatchItemResult per line
+    """
+    pending = iter(enumerate(batch.items))
+    results: asyncio.Queue[BatchItemResult] = asyncio.Queue()
+
+    async def worker() -> None:
+        for index, item in pending:
+            started = time.perf_counter()
+            tokens = chat_prompt_tokens(item)  # unless the item completes
+            try:
+                chat_response, cache_outcome = await run_cancellable(
+                    run_chat_pipeline(item, cache_control, deadline), "batch", deadline
+                )
+                tokens = chat_tokens_used(item, chat_response, cache_outcome)
+                result = BatchItemResult(index=index, success=True, result=chat_response)
+                metrics.REQUEST_DURATION_SECONDS.labels(endpoint="batch").observe(
+                    time.perf_counter() - started
+                )
+            except HTTPException as e:
+                tokens = failed_request_tokens(e, tokens)
+                result = BatchItemResult(
+                    index=index,
+                    success=False,
+                    error=BatchItemError(status_code=e.status_code, detail=str(e.detail)),
+                )
+            except Exception as e:
+                result = BatchItemResult(
+                    index=index,
+                    success=False,
+                    error=BatchItemError(status_code=500, detail=str(e)),
+                )
+            finally:
+                if on_tokens is not None:
+                    on_tokens(tokens)
+            await results.put(result)
+
+    workers = [
+        asyncio.create_task(worker())
+        for _ in range(min(batch.concurrency, len(batch.items)))
+    ]
+    delivered = 0
+    try:
+        for _ in batch.items:
+            result = await results.get()
+            yield result.model_dump_json() + "\n"
+            delivered += 1
+    finally:
+        if delivered < len(batch.items):  # the client went away mid-batch
+            metrics.CANCELLATIONS.labels(endpoint="batch", reason="client_disconnect").inc()
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+def record_tool_result(result: ToolResult) -> None:
+    tool = result.tool if result.tool in tool_registry else "unknown"
+    metrics.TOOL_CALLS.labels(tool=tool, status=result.status).inc()
+    if result.cached:
+        metrics.TOOL_CACHE_HITS.labels(tool=tool).inc()
+    else:
+        metrics.TOOL_DURATION_SECONDS.labels(tool=tool).observe(result.latency_ms / 1000)
+
+
+tool_cache = ResponseCache(
+    max_entries=TOOL_CACHE_MAX_ENTRIES,
+    max_bytes=RESPONSE_CACHE_MAX_BYTES,
+    ttl=TOOL_CACHE_TTL,
+    sizeof=lambda key, value: len(key[1]) + len(json.dumps(value, default=str)) + 256,
+)
+tool_registry = ToolRegistry(
+    max_workers=TOOL_MAX_WORKERS,
+    cache=tool_cache,
+    on_result=record_tool_result,
+)
+for _module in TOOL_MODULES:
+    importlib.import_module(_module).register(tool_registry)
+
+
+def resolve_output_format(request: ChatRequest) -> OutputFormat:
+    """
+    Ollama `format` and output validator for a chat request.
+
+    The function schema and its validator are compiled once per distinct
+    function set and reused afterwards.
+
+    Raises:
+        HTTPException: 400 if a requested function is not registered
+    """
+    if request.format is None:
+        return NO_OUTPUT_FORMAT
+    if request.format == "json":
+        return OutputFormat("json", "json")
+    try:
+        function_schema = tool_registry.function_schema(request.functions)
+    except KeyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown function: {e.args[0]}",
+        )
+    return OutputFormat("functions", function_schema.schema, function_schema.validate)
+
+
+async def execute_tool_calls(
+    calls: list[ToolCall],
+    deadline: float | None = None,
+) -> list[ToolExecution]:
+    """
+    Run function calls concurrently with the registered tools.
+
+    Args:
+        calls: Calls extracted from the model output
+        deadline: Optional `time.monotonic()` deadline capping tool timeouts
+
+    Returns:
+        One result per call; failures are reported per call, not raised
+    """
+    results = await tool_registry.execute_all(calls, deadline)
+    return [ToolExecution(**vars(result)) for result in results]
+
+
+async def execute_parsed_output(
+    parsed_output: ParsedOutput,
+    deadline: float | None = None,
+) -> list[ToolExecution]:
+    """Execute the function calls in a model response (none if it had no JSON)."""
+    if parsed_output.parsed_json is None:
+        return []
+    with span("tools"):
+        return await execute_tool_calls(extract_tool_calls(parsed_output.parsed_json), deadline)
+
+
+session_store = SessionStore(
+    max_sessions=SESSION_MAX_SESSIONS,
+    max_bytes=SESSION_MAX_BYTES,
+    ttl=SESSION_TTL,
+    prefix_tokens=estimate_tokens(SYSTEM_TURN),
+)
+metrics.SESSIONS_ACTIVE.set_function(lambda: len(session_store))
+metrics.SESSIONS_BYTES.set_function(lambda: session_store.total_bytes)
+
+
+def get_session(session_id: str) -> Session:
+    """Look up a session or raise 404."""
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found or expired",
+        )
+    return session
+
+
+def session_info(session: Session) -> SessionInfo:
+    return SessionInfo(
+        session_id=session.id,
+        turns=[SessionTurn(role=t.role, content=t.content, tokens=t.tokens) for t in session.turns],
+        tokens=session.tokens,
+        max_tokens=MAX_SEQ_LENGTH,
+        context_cached=session.cached,
+    )
+
+
+def new_session_turns(request: SessionChatRequest) -> list[Turn]:
+    """Sanitize the function response and message of a turn request."""
+    turns: list[Turn] = []
+    inputs = []
+    if request.function_response is not None:
+        content = request.function_response
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False)
+        inputs.append(("function", content))
+    if request.message is not None:
+        inputs.append(("user", request.message))
+
+    for role, content in inputs:
+        sanitized = sanitize_input(content)
+        if not sanitized:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{role.capitalize()} turn is empty after sanitization",
+            )
+        turns.append(Turn(role, sanitized, estimate_tokens(sanitized)))
+    return turns
+
+
+async def run_session_turn(
+    session: Session,
+    request: SessionChatRequest,
+    deadline: float | None = None,
+) -> SessionChatResponse:
+    """
+    Add a turn to a session and generate the assistant's reply.
+
+    Turns of one session run one at a time and send the whole transcript
+    (see `format_session_prompt`). When the transcript plus the new turns
+    and `max_tokens` would exceed MAX_SEQ_LENGTH, the oldest turns are
+    evicted, and Ollama evaluates the rest in full once. A failed
+    generation leaves the session unchanged.
+
+    Raises:
+        HTTPException: 400 if the turn cannot fit the budget at all, or
+            any generation error
     """
-    async with httpx.AsyncClient(timeout=5.0) as client:
+    new_turns = new_session_turns(request)
+    new_tokens = sum(turn.tokens for turn in new_turns) + request.max_tokens
+
+    async with session.lock:
+        if session.prefix_tokens + new_tokens > MAX_SEQ_LENGTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=(
+                    f"Turn needs about {new_tokens} tokens, more than the "
+                    f"{MAX_SEQ_LENGTH}-token session budget allows; "
+                    "lower max_tokens or shorten the input"
+                ),
+            )
+        history = (list(session.turns), session.cached)
+        evicted = session.fit(new_tokens, MAX_SEQ_LENGTH)
+        context_reused = session.cached
+
         try:
-            # Check if Ollama is running
-            response = await client.get(f"{OLLAMA_BASE_URL}/api/tags")
-            if response.status_code != 200:
-                return False, False
+            async with generation_slot(request.priority, deadline):
+                generation = await call_ollama_api(
+                    prompt=format_session_prompt(session, new_turns),
+                    temperature=request.temperature,
+                    max_tokens=request.max_tokens,
+                    raw=True,
+                    deadline=deadline,
+                )
+        except BaseException:
+            session.turns, session.cached = history
+            raise
+
+        reply_tokens = (
+            generation.tokens_used + TURN_OVERHEAD_TOKENS
+            if generation.tokens_used
+            else estimate_tokens(generation.response)
+        )
+        session.turns.extend(new_turns)
+        session.turns.append(Turn("assistant", generation.response, reply_tokens))
+        session.cached = True
+        session_store.save(session)
+
+    metrics.SESSION_TURNS.labels(mode="prefix" if context_reused else "full").inc()
+    metrics.SESSION_EVICTED_TURNS.inc(evicted)
+    return SessionChatResponse(
+        success=True,
+        response=generation.response,
+        parsed_output=extract_json_from_response(generation.response),
+        model=OLLAMA_MODEL,
+        tokens_used=generation.tokens_used,
+        timings=generation.timings,
+        session_id=session.id,
+        context_reused=context_reused,
+        session_tokens=session.tokens,
+        evicted_turns=evicted,
+    )
+
+
+async def run_job(payload: dict[str, Any]) -> dict[str, Any]:
+    """Execute a stored job's chat request, bounded by JOBS_TIMEOUT."""
+    request = ChatRequest.model_validate(payload)
+    deadline = request_deadline(JOBS_TIMEOUT)
+    chat_response, _ = await run_cancellable(
+        run_chat_pipeline(request, deadline=deadline), "jobs", deadline
+    )
+    return chat_response.model_dump(mode="json")
+
+
+def describe_job_error(error: BaseException) -> dict[str, Any]:
+    if isinstance(error, HTTPException):
+        return {"status_code": error.status_code, "detail": str(error.detail)}
+    return {"status_code": 500, "detail": str(error)}
+
+
+def job_tokens_used(job: Job) -> int:
+    """Tokens a finished job consumed, for settling its rate-limit reservation."""
+    if job.started_at is None:  # cancelled while queued
+        return 0
+    request = ChatRequest.model_validate(job.request)
+    if job.status == SUCCEEDED:
+        chat_response = ChatResponse.model_validate(job.result)
+        cache_outcome: CacheOutcome = "miss" if chat_response.timings is not None else "hit"
+        return chat_tokens_used(request, chat_response, cache_outcome)
+    error = HTTPException(status_code=(job.error or {}).get("status_code", 500))
+    return failed_request_tokens(error, chat_prompt_tokens(request))
+
+
+# Reservations of jobs submitted since the last restart, settled when they finish
+job_reservations: dict[str, Reservation] = {}
+
+
+def record_job_finished(job: Job) -> None:
+    metrics.JOBS_FINISHED.labels(status=job.status).inc()
+    if job.started_at is not None:
+        metrics.JOB_QUEUE_WAIT_SECONDS.observe(job.started_at - job.created_at)
+    reservation = job_reservations.pop(job.id, None)
+    if reservation is not None:
+        settle_tokens(reservation, job_tokens_used(job))
+
+
+# Opened by `lifespan`, so that importing this module creates no files
+_job_store: JobStore | None = None
+_job_runner: JobRunner | None = None
 
-            # Check if our model is available
-            data = response.json()
-            models = [m.get("name", "").split(":")[0] for m in data.get("models", [])]
-            model_available = OLLAMA_MODEL in models
 
-            return True, model_available
+def open_job_runner() -> JobRunner:
+    """Open the job store and the runner working through it."""
+    global _job_store, _job_runner
+    _job_store = JobStore(JOBS_DB_PATH)
+    _job_runner = JobRunner(
+        _job_store,
+        run_job,
+        concurrency=JOBS_CONCURRENCY,
+        ttl=JOBS_TTL,
+        describe_error=describe_job_error,
+        on_finish=record_job_finished,
+    )
+    metrics.JOBS_QUEUE_DEPTH.set_function(lambda: _job_runner.queue_depth)
+    metrics.JOBS_RUNNING.set_function(lambda: _job_runner.running)
+    metrics.JOBS_OLDEST_QUEUED_AGE_SECONDS.set_function(_job_runner.oldest_queued_age)
+    metrics.JOBS_STORED.set_function(_job_store.count)
+    return _job_runner
+
+
+def close_job_runner() -> None:
+    """Close the job store; the runner's workers must be stopped already."""
+    global _job_store, _job_runner
+    if _job_store is not None:
+        _job_store.close()
+    _job_store = _job_runner = None
+    for gauge in (
+        metrics.JOBS_QUEUE_DEPTH,
+        metrics.JOBS_RUNNING,
+        metrics.JOBS_OLDEST_QUEUED_AGE_SECONDS,
+        metrics.JOBS_STORED,
+    ):
+        gauge.set_function(lambda: 0)
+
+
+def get_job_runner() -> JobRunner:
+    """The job runner, or 503 if the app has not started (or has shut down)."""
+    if _job_runner is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Job queue is not running",
+        )
+    return _job_runner
+
+
+async def run_job_gc(runner: JobRunner) -> None:
+    """Background task: delete expired jobs every JOBS_GC_INTERVAL seconds."""
+    while True:
+        metrics.JOBS_EXPIRED.inc(runner.collect_garbage())
+        await asyncio.sleep(JOBS_GC_INTERVAL)
+
+
+def get_job(job_id: str) -> Job:
+    """Look up a job or raise 404."""
+    job = get_job_runner().get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found or expired",
+        )
+    return job
+
+
+def job_response(job: Job) -> JobResponse:
+    return JobResponse(
+        job_id=job.id,
+        status=job.status,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        expires_at=job.expires_at,
+        result=job.result,
+        error=job.error,
+    )
+
+
+async def wait_for_job(job_id: str, timeout: float) -> Job:
+    """Wait until a job is finished or `timeout` seconds pass; return its state."""
+    deadline = time.monotonic() + timeout
+    job = get_job(job_id)
+    while not job.finished and (remaining := deadline - time.monotonic()) > 0:
+        job = await get_job_runner().wait(job_id, remaining)
+        if job is None:  # deleted while waiting
+            job = get_job(job_id)
+    return job
 
-        except (httpx.ConnectError, httpx.TimeoutException):
-            return False, False
+
+async def build_health(max_staleness: float | None) -> HealthResponse:
+    """Assemble the health report, refreshing the probe if it is too old."""
+    if max_staleness is not None and ollama_pool.staleness() > max_staleness:
+        await check_ollama_connection()
+
+    ollama_connected, model_available = ollama_status()
+    staleness = ollama_pool.staleness()
+    state = model_state()
+
+    return HealthResponse(
+        status="healthy",
+        ready=state in ("ready", "idle"),
+        model_state=state,
+        ollama_connected=ollama_connected,
+        model_available=model_available,
+        staleness_s=round(staleness, 3) if math.isfinite(staleness) else None,
+        nodes=[NodeStatus(**node) for node in ollama_pool.snapshot()],
+        scheduler=SchedulerStatus(**scheduler.snapshot()),
+    )
 
 
 # ============================================================================
@@ -318,30 +2595,72 @@ async def check_ollama_connection() -> tuple[bool, bool]:
     tags=["Health"],
     summary="Health check endpoint",
 )
-async def health_check() -> HealthResponse:
+async def health_check(
+    max_staleness: float | None = Query(
+        default=None,
+        ge=0,
+        description="Probe Ollama now if the cached status is older than this (seconds)",
+    ),
+) -> HealthResponse:
     """
     Check API health and Ollama connection status.
+
+    This is the liveness check: it answers 200 whenever the process is up
+    and reports `model_state` (warming until the model has been loaded);
+    use `/health/ready` to gate traffic. Node status comes from the
+    background prober, so this endpoint answers from memory. Pass
+    `max_staleness` to force a fresh probe when the cached status is older
+    than that many seconds.
     """
-    ollama_connected, model_available = await check_ollama_connection()
+    return await build_health(max_staleness)
 
-    return HealthResponse(
-        status="healthy",
-        ollama_connected=ollama_connected,
-        model_available=model_available,
-    )
+
+@app.get(
+    "/health/ready",
+    response_model=HealthResponse,
+    responses={503: {"model": HealthResponse, "description": "Model not loaded yet"}},
+    tags=["Health"],
+    summary="Readiness check endpoint",
+)
+async def readiness_check(
+    response: Response,
+    max_staleness: float | None = Query(
+        default=None,
+        ge=0,
+        description="Probe Ollama now if the cached status is older than this (seconds)",
+    ),
+) -> HealthResponse:
+    """
+    Report whether the backend should receive traffic.
+
+    Same body as `/health`, but answers 503 until the model has been loaded
+    on at least one node. `/health` only says the process is alive, so use
+    this endpoint for container healthchecks and load balancers.
+    """
+    health = await build_health(max_staleness)
+    if not health.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return health
 
 
 @app.post(
     "/chat",
     response_model=ChatResponse,
     responses={
+        429: {"model": ErrorResponse, "description": "Server busy or rate limited"},
         503: {"model": ErrorResponse, "description": "Ollama unavailable"},
         504: {"model": ErrorResponse, "description": "Request timeout"},
     },
     tags=["Chat"],
     summary="Send a message to Llama 3",
 )
-async def chat(request: ChatRequest) -> ChatResponse:
+async def chat(
+    request: ChatRequest,
+    response: Response,
+    http_request: Request,
+    cache_control: str | None = Header(default=None),
+    x_request_timeout: float | None = Header(default=None, gt=0),
+) -> ChatResponse:
     """
     Send a user message to the Llama 3 model and receive a response.
 
@@ -351,38 +2670,620 @@ async def chat(request: ChatRequest) -> ChatResponse:
     3. Sends it to Ollama for inference
     4. Attempts to parse JSON from the response
     5. Returns structured output
-    """
-    # Sanitize input
-    sanitized_message = sanitize_input(request.message)
 
-    if not sanitized_message:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Message is empty after sanitization",
+    With `stop_on_json`, generation is cancelled as soon as the first JSON
+    value is complete and `tokens_saved` reports the unused token budget.
+
+    With `candidates` > 1, requests slower than the p95 of recent
+    generations (or whose output does not parse) are hedged with extra
+    generations; the first valid JSON wins and `hedge` reports the winner
+    and the tokens spent by the others.
+
+    Deterministic requests (temperature 0) are served from an exact-match
+    cache. Send `Cache-Control: no-cache` to force a fresh generation, or
+    `no-store` to also keep the result out of the cache. The `X-Cache`
+    response header reports HIT, MISS, COALESCED or BYPASS.
+
+    When Ollama is busy, requests wait in a priority queue (`priority`).
+    A full queue, or an `X-Request-Timeout` (seconds) that cannot be met,
+    is answered with 429 and `Retry-After`. If the timeout passes while the
+    model is generating, or the client disconnects, the Ollama request is
+    aborted (504 on timeout).
+
+    Each client (API key, else IP) has a token bucket. The request reserves
+    its prompt plus `max_tokens` up front and is answered with 429 if the
+    bucket cannot cover it; afterwards it is charged the tokens Ollama
+    really evaluated and generated, and the rest is refunded. `RateLimit-*`
+    headers report the bucket.
+    """
+    arrived, started = time.time(), time.perf_counter()
+    deadline = request_deadline(x_request_timeout)
+    reservation = None
+    try:
+        reservation = reserve_tokens(http_request, chat_cost(request), "chat")
+        chat_response, cache_outcome = await run_cancellable(
+            run_chat_pipeline(request, cache_control, deadline), "chat", deadline, http_request
         )
+    except BaseException as e:
+        settle_tokens(reservation, failed_request_tokens(e, chat_prompt_tokens(request)))
+        capture_request("chat", request, arrived, started, error_status(e))
+        raise
+    settle_tokens(reservation, chat_tokens_used(request, chat_response, cache_outcome))
+    capture_request(
+        "chat", request, arrived, started, 200, cache_outcome, chat_response.timings
+    )
+    response.headers.update(reservation_headers(reservation))
+    response.headers["X-Cache"] = cache_outcome.upper()
+    metrics.REQUEST_DURATION_SECONDS.labels(endpoint="chat").observe(
+        time.perf_counter() - started
+    )
+    return chat_response
 
-    # Format prompt
-    formatted_prompt = format_llama3_prompt(sanitized_message)
 
-    # Call Ollama
-    response_text, tokens_used = await call_ollama_api(
-        prompt=formatted_prompt,
-        temperature=request.temperature,
-        max_tokens=request.max_tokens,
-    )
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that always runs a cleanup callback.
+
+    Starlette never starts the body iterator if the client disconnects
+    first, so cleanup placed only in the generator's `finally` could leak
+    the upstream connection and the generation slot. `completed` tells the
+    callback whether the whole body was sent.
+    """
+
+    def __init__(
+        self,
+        content: AsyncIterator[str],
+        on_close: Callable[[], Awaitable[None]],
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(self._track(content), **kwargs)
+        self.on_close = on_close
+        self.completed = False
+
+    async def _track(self, content: AsyncIterator[str]) -> AsyncIterator[str]:
+        async for chunk in content:
+            yield chunk
+        self.completed = True
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.on_close()
+
+
+async def stream_chat_events(
+    upstream: OllamaStream,
+    lease: GenerationLease,
+    started: float,
+    deadline: float | None = None,
+    execute_tools: bool = False,
+    output_format: OutputFormat = NO_OUTPUT_FORMAT,
+) -> AsyncIterator[str]:
+    """
+    Relay Ollama's chunk stream to the client as Server-Sent Events.
 
-    # Parse response
-    parsed_output = extract_json_from_response(response_text)
+    Emits a `token` event per generated delta and a final `done` event
+    carrying the parsed output and timings. As soon as the first JSON
+    object or array in the output is complete, a `json` event carries it,
+    so clients can show the call before generation ends. Failures after
+    the stream has started, including a passed deadline, are reported as
+    an `error` event.
 
-    return ChatResponse(
+    Args:
+        upstream: Open stream from `open_ollama_stream`
+        lease: Admission slot held for the generation
+        started: `time.perf_counter()` value when the request arrived
+        deadline: Optional `time.monotonic()` deadline for the request
+        execute_tools: Run the parsed function calls before the `done` event
+        output_format: Output constraint, used to validate the parsed output
+
+    Yields:
+        Encoded SSE frames; after an `error` event, the error is also left
+        in `upstream.error`
+    """
+    pieces: list[str] = []
+    final_chunk: dict[str, Any] | None = None
+    failure: BaseException | None = None
+    chunks = iter_ollama_chunks(upstream)
+    scanner = JSONScanner(stop_when=lambda match: True)  # only the first value is sent early
+
+    try:
+        while True:
+            timeout = max(deadline - time.monotonic(), 0) if deadline is not None else None
+            try:
+                chunk = await asyncio.wait_for(anext(chunks), timeout)
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                metrics.CANCELLATIONS.labels(endpoint="chat_stream", reason="deadline").inc()
+                raise HTTPException(
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                    detail="Request deadline exceeded",
+                )
+            delta = chunk.get("response", "")
+            if delta:
+                pieces.append(delta)
+                yield format_sse("token", {"delta": delta})
+                if not scanner.stopped:
+                    for match in scanner.feed(delta):
+                        yield format_sse("json", {"value": match.value})
+            if chunk.get("done"):
+                final_chunk = chunk
+    except (httpx.HTTPError, HTTPException) as e:
+        if isinstance(e, httpx.HTTPError):
+            record_node_error(upstream.node, e)
+            error = ollama_error_to_http(e, upstream.node.url)
+        else:
+            error = e
+        failure = upstream.error = error
+        yield format_sse(
+            "error",
+            {"status_code": error.status_code, "detail": error.detail},
+        )
+        return
+    except BaseException as e:
+        failure = e
+        raise
+    finally:
+        await chunks.aclose()
+        await upstream.aclose()
+        lease.release(failure)
+
+    response_text = "".join(pieces)
+    timings = upstream.timings(final_chunk)
+    record_generation_metrics(timings)
+    parsed_output = extract_json_from_response(response_text, output_format)
+    done = ChatResponse(
         success=True,
         response=response_text,
         parsed_output=parsed_output,
         model=OLLAMA_MODEL,
-        tokens_used=tokens_used,
+        tokens_used=timings.eval_count,
+        timings=timings,
+        tool_results=(
+            await execute_parsed_output(parsed_output, deadline) if execute_tools else None
+        ),
+    )
+    metrics.REQUEST_DURATION_SECONDS.labels(endpoint="chat_stream").observe(
+        time.perf_counter() - started
+    )
+    yield format_sse("done", done.model_dump())
+
+
+@app.post(
+    "/chat/stream",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"text/event-stream": {}}},
+        429: {"model": ErrorResponse, "description": "Server busy or rate limited"},
+        503: {"model": ErrorResponse, "description": "Ollama unavailable"},
+        504: {"model": ErrorResponse, "description": "Request timeout"},
+    },
+    tags=["Chat"],
+    summary="Stream a Llama 3 response as Server-Sent Events",
+)
+async def chat_stream(
+    request: ChatRequest,
+    http_request: Request,
+    x_request_timeout: float | None = Header(default=None, gt=0),
+) -> StreamingResponse:
+    """
+    Send a user message to the Llama 3 model and stream tokens back.
+
+    The response is a `text/event-stream` with:
+    - `token` events: `{"delta": "..."}` for each generated chunk
+    - one `done` event: the full `ChatResponse` plus `timings`
+      (including `time_to_first_token_ms`)
+    - an `error` event instead of `done` if generation fails mid-stream
+
+    Admission control and rate limiting apply as for `/chat`; the slot is
+    held until the stream ends, and the tokens are settled then, so the
+    `RateLimit-*` headers report the bucket right after the reservation. A
+    client disconnect aborts the Ollama request at once; an
+    `X-Request-Timeout` that passes mid-stream ends it with an `error`
+    event (status 504).
+    """
+    arrived, started = time.time(), time.perf_counter()
+    deadline = request_deadline(x_request_timeout)
+    if request.candidates > 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="candidates > 1 is not supported when streaming",
+        )
+    _, formatted_prompt = prepare_prompt(request.message)
+    output_format = resolve_output_format(request)
+    prompt_tokens = chat_prompt_tokens(request)
+
+    reservation = lease = None
+    try:
+        reservation = reserve_tokens(http_request, chat_cost(request), "chat_stream")
+        lease = await acquire_generation_slot(request.priority, deadline)
+        with span("connect"):
+            upstream = await open_ollama_stream(
+                prompt=formatted_prompt,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens,
+                deadline=deadline,
+                response_format=output_format.ollama_format,
+            )
+    except BaseException as e:
+        if lease is not None:
+            lease.release(e)
+        settle_tokens(reservation, failed_request_tokens(e, prompt_tokens))
+        capture_request("chat_stream", request, arrived, started, error_status(e))
+        raise
+
+    async def close() -> None:
+        if not response.completed:
+            metrics.CANCELLATIONS.labels(endpoint="chat_stream", reason="client_disconnect").inc()
+        await upstream.aclose()
+        # If the client went away, the generator may never have run its own
+        # cleanup; an aborted generation is no latency sample
+        lease.release(None if response.completed else asyncio.CancelledError())
+        final_chunk = upstream.final_chunk or {}
+        evaluated = final_chunk.get("prompt_eval_count", prompt_tokens)
+        settle_tokens(reservation, evaluated + upstream.tokens)
+        if upstream.error is not None:
+            status_code = upstream.error.status_code
+        else:
+            status_code = 200 if response.completed else 499
+        capture_request(
+            "chat_stream",
+            request,
+            arrived,
+            started,
+            status_code,
+            timings=upstream.timings(upstream.final_chunk),
+        )
+
+    response = ClosingStreamingResponse(
+        stream_chat_events(
+            upstream, lease, started, deadline, request.execute_tools, output_format
+        ),
+        on_close=close,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            **reservation_headers(reservation),
+        },
+    )
+    return response
+
+
+@app.post(
+    "/chat/batch",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"application/x-ndjson": {}}},
+        429: {"model": ErrorResponse, "description": "Rate limited"},
+    },
+    tags=["Chat"],
+    summary="Run many chat requests and stream results as NDJSON",
+)
+async def chat_batch(
+    batch: BatchChatRequest,
+    http_request: Request,
+    cache_control: str | None = Header(default=None),
+    x_request_timeout: float | None = Header(default=None, gt=0),
+) -> StreamingResponse:
+    """
+    Turn a list of chat requests into function calls in one HTTP call.
+
+    Each item runs through the same pipeline as `/chat` (sanitize, format,
+    generate, parse), at most `concurrency` at a time. The response is
+    `application/x-ndjson` with one `BatchItemResult` per line, in
+    completion order; use `index` to match results to items. A failed item
+    yields `success: false` with its error and does not fail the batch.
+    `X-Request-Timeout` applies to the batch as a whole.
+
+    The whole batch is reserved from the client's token bucket up front and
+    charged per item as items finish; items that never ran are refunded.
+    """
+    deadline = request_deadline(x_request_timeout)
+    reservation = reserve_tokens(
+        http_request, sum(chat_cost(item) for item in batch.items), "batch"
+    )
+    used = 0
+
+    def count_tokens(tokens: int) -> None:
+        nonlocal used
+        used += tokens
+
+    results = run_batch(batch, cache_control, deadline, on_tokens=count_tokens)
+
+    async def close() -> None:
+        await results.aclose()
+        settle_tokens(reservation, used)
+
+    return ClosingStreamingResponse(
+        results,
+        on_close=close,
+        media_type="application/x-ndjson",
+        headers=reservation_headers(reservation),
+    )
+
+
+@app.post(
+    "/sessions",
+    response_model=SessionInfo,
+    status_code=status.HTTP_201_CREATED,
+    tags=["Sessions"],
+    summary="Start a multi-turn conversation",
+)
+async def create_session() -> SessionInfo:
+    """
+    Create a server-side conversation session.
+
+    Sessions expire after SESSION_TTL seconds without a new turn, and the
+    least recently used ones are evicted when SESSION_MAX_SESSIONS or
+    SESSION_MAX_BYTES is exceeded.
+    """
+    return session_info(session_store.create())
+
+
+@app.get(
+    "/sessions/{session_id}",
+    response_model=SessionInfo,
+    responses={404: {"model": ErrorResponse, "description": "Unknown session"}},
+    tags=["Sessions"],
+    summary="Get a session's turn history",
+)
+async def read_session(session_id: str) -> SessionInfo:
+    """Return the stored turns and token usage of a session."""
+    return session_info(get_session(session_id))
+
+
+@app.delete(
+    "/sessions/{session_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={404: {"model": ErrorResponse, "description": "Unknown session"}},
+    tags=["Sessions"],
+    summary="End a session",
+)
+async def delete_session(session_id: str) -> Response:
+    """Delete a session and free its memory."""
+    if not session_store.delete(session_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found or expired",
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@app.post(
+    "/sessions/{session_id}/chat",
+    response_model=SessionChatResponse,
+    responses={
+        400: {"model": ErrorResponse, "description": "Turn does not fit the budget"},
+        404: {"model": ErrorResponse, "description": "Unknown session"},
+        429: {"model": ErrorResponse, "description": "Server busy or rate limited"},
+        503: {"model": ErrorResponse, "description": "Ollama unavailable"},
+        504: {"model": ErrorResponse, "description": "Request timeout"},
+    },
+    tags=["Sessions"],
+    summary="Send the next turn of a conversation",
+)
+async def session_chat(
+    session_id: str,
+    request: SessionChatRequest,
+    response: Response,
+    http_request: Request,
+    x_request_timeout: float | None = Header(default=None, gt=0),
+) -> SessionChatResponse:
+    """
+    Add a user message and/or function response to a session and reply.
+
+    Send the output of a function the assistant called as
+    `function_response` (a `function` turn, as in the fine-tuning data),
+    optionally with a follow-up `message`. The transcript is re-sent each
+    turn, but the earlier turns are a prefix Ollama has cached, so only the
+    new turns are evaluated (`context_reused`). When the
+    transcript would exceed MAX_SEQ_LENGTH tokens, the oldest turns are
+    dropped (`evicted_turns`). Turns are not cached. Rate limiting applies
+    as for `/chat`, charged for the tokens Ollama evaluated, so turns that
+    reuse the cache cost less.
+    """
+    session = get_session(session_id)
+    deadline = request_deadline(x_request_timeout)
+    prompt_tokens = sum(turn.tokens for turn in new_session_turns(request))
+    reservation = reserve_tokens(
+        http_request, prompt_tokens + request.max_tokens, "session_chat"
+    )
+    try:
+        session_response = await run_cancellable(
+            run_session_turn(session, request, deadline), "session_chat", deadline, http_request
+        )
+    except BaseException as e:
+        settle_tokens(reservation, failed_request_tokens(e, prompt_tokens))
+        raise
+    timings = session_response.timings
+    if timings is not None and timings.prompt_eval_count is not None:
+        prompt_tokens = timings.prompt_eval_count
+    settle_tokens(reservation, prompt_tokens + (session_response.tokens_used or 0))
+    response.headers.update(reservation_headers(reservation))
+    return session_response
+
+
+@app.get(
+    "/tools",
+    response_model=list[ToolInfo],
+    tags=["Tools"],
+    summary="List registered tools",
+)
+async def list_tools() -> list[ToolInfo]:
+    """List the tools function calls can be executed with, and their parameter schemas."""
+    return [
+        ToolInfo(
+            name=tool.name,
+            description=tool.description,
+            parameters=tool.parameters,
+            timeout=tool.timeout,
+            pure=tool.pure,
+        )
+        for tool in tool_registry.tools()
+    ]
+
+
+@app.post(
+    "/tools/execute",
+    response_model=list[ToolExecution],
+    tags=["Tools"],
+    summary="Execute function calls",
+)
+async def execute_tools(
+    request: ToolExecuteRequest,
+    x_request_timeout: float | None = Header(default=None, gt=0),
+) -> list[ToolExecution]:
+    """
+    Execute function calls without generating them first.
+
+    `calls` takes the same shapes as the model output (`action`/`parameters`,
+    `function`/`arguments` or `name`/`arguments`, alone or in a list).
+    Independent calls run concurrently, each with its tool's timeout, capped
+    by `X-Request-Timeout`. Failures are reported per call with a `status`.
+    """
+    deadline = request_deadline(x_request_timeout)
+    return await execute_tool_calls(extract_tool_calls(request.calls), deadline)
+
+
+@app.post(
+    "/jobs",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={
+        400: {"model": ErrorResponse, "description": "Invalid request"},
+        429: {"model": ErrorResponse, "description": "Rate limited"},
+    },
+    tags=["Jobs"],
+    summary="Submit a chat request to run in the background",
+)
+async def create_job(
+    request: ChatRequest,
+    response: Response,
+    http_request: Request,
+) -> JobResponse:
+    """
+    Queue a chat request and return its job id at once.
+
+    The request runs through the same pipeline as `/chat` on one of
+    JOBS_CONCURRENCY background workers, bounded by JOBS_TIMEOUT once it
+    starts. Poll `GET /jobs/{job_id}` (optionally long-polling with `wait`)
+    or follow `GET /jobs/{job_id}/events`. Jobs are stored in SQLite, so
+    results survive a restart and interrupted jobs run again; finished jobs
+    are deleted JOBS_TTL seconds after they finish.
+
+    The job's tokens are reserved from the client's bucket at submission,
+    so a client cannot queue more work than its rate limit allows, and
+    settled when the job finishes.
+    """
+    prepare_prompt(request.message)  # reject what would fail anyway before queuing
+    resolve_output_format(request)
+    reservation = reserve_tokens(http_request, chat_cost(request), "jobs")
+    job = get_job_runner().submit(request.model_dump(mode="json"))
+    if reservation is not None:
+        job_reservations[job.id] = reservation
+    response.headers["Location"] = f"/jobs/{job.id}"
+    response.headers.update(reservation_headers(reservation))
+    return job_response(job)
+
+
+@app.get(
+    "/jobs/{job_id}",
+    response_model=JobResponse,
+    responses={404: {"model": ErrorResponse, "description": "Unknown job"}},
+    tags=["Jobs"],
+    summary="Get a job's status and result",
+)
+async def read_job(
+    job_id: str,
+    wait: float = Query(
+        default=0.0,
+        ge=0.0,
+        le=JOBS_MAX_WAIT,
+        description="Seconds to wait for the job to finish before answering",
+    ),
+) -> JobResponse:
+    """
+    Return a job's status, and its result or error once finished.
+
+    With `wait`, the response is held until the job finishes or `wait`
+    seconds pass (long-polling), whichever comes first.
+    """
+    return job_response(await wait_for_job(job_id, wait))
+
+
+@app.get(
+    "/jobs/{job_id}/events",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"text/event-stream": {}}},
+        404: {"model": ErrorResponse, "description": "Unknown job"},
+    },
+    tags=["Jobs"],
+    summary="Follow a job as Server-Sent Events",
+)
+async def job_events(job_id: str) -> StreamingResponse:
+    """
+    Stream a job's progress as a `text/event-stream`.
+
+    A `status` event with the `JobResponse` is sent at once and on every
+    status change, and a final `done` event when the job has finished.
+    Comments are sent every 15 seconds while nothing changes, to keep
+    proxies from closing the connection.
+    """
+    job = get_job(job_id)
+
+    async def events() -> AsyncIterator[str]:
+        current: Job | None = job
+        while current is not None and not current.finished:
+            yield format_sse("status", job_response(current).model_dump())
+            previous = current.status
+            while current is not None and current.status == previous:
+                current = await get_job_runner().wait(job_id, JOBS_EVENTS_KEEPALIVE)
+                if current is not None and current.status == previous:
+                    yield ": keepalive\n\n"
+        if current is None:
+            yield format_sse("error", {"status_code": 404, "detail": "Job deleted"})
+            return
+        yield format_sse("done", job_response(current).model_dump())
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+@app.delete(
+    "/jobs/{job_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={404: {"model": ErrorResponse, "description": "Unknown job"}},
+    tags=["Jobs"],
+    summary="Cancel and delete a job",
+)
+async def delete_job(job_id: str) -> Response:
+    """Cancel a job if it is still queued or running, then delete it."""
+    if not get_job_runner().delete(job_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found or expired",
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@app.get(
+    "/metrics",
+    response_class=Response,
+    tags=["Health"],
+    summary="Prometheus metrics",
+)
+async def metrics_endpoint() -> Response:
+    """Expose backend metrics in the Prometheus text format."""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/", tags=["Root"])
 async def root() -> dict[str, str]:
     """Root endpoint with API information."""
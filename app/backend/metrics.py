@@ -0,0 +1,233 @@
+"""
+Prometheus metrics for the Llama 3 Function Agent backend.
+
+All collectors live in this module so they are registered exactly once and
+can be imported by any part of the backend. They are exposed at `/metrics`.
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+EARLY_STOPS = Counter(
+    "llm_early_stops_total",
+    "Generations cancelled once the function-call JSON was complete",
+)
+TOKENS_SAVED = Counter(
+    "llm_early_stop_tokens_saved_total",
+    "Unused num_predict budget of generations stopped early",
+)
+
+RESPONSE_CACHE_REQUESTS = Counter(
+    "llm_response_cache_requests_total",
+    "Chat requests by response cache outcome",
+    ["result"],
+)
+RESPONSE_CACHE_ENTRIES = Gauge(
+    "llm_response_cache_entries",
+    "Responses currently held in the cache",
+)
+RESPONSE_CACHE_BYTES = Gauge(
+    "llm_response_cache_bytes",
+    "Estimated memory used by cached responses",
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "llm_admission_in_flight",
+    "Generations currently admitted to Ollama",
+)
+ADMISSION_LIMIT = Gauge(
+    "llm_admission_concurrency_limit",
+    "Current (possibly adaptive) generation concurrency limit",
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "llm_admission_queue_depth",
+    "Requests waiting for a generation slot",
+)
+ADMISSION_WAIT_SECONDS = Histogram(
+    "llm_admission_wait_seconds",
+    "Time requests spent waiting for a generation slot",
+    buckets=(0.005, 0.05, 0.25, 1, 2.5, 5, 10, 30, 60, 120),
+)
+ADMISSION_REJECTIONS = Counter(
+    "llm_admission_rejections_total",
+    "Requests rejected with 429 by admission control",
+    ["reason"],
+)
+
+_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+REQUEST_DURATION_SECONDS = Histogram(
+    "llm_request_duration_seconds",
+    "End-to-end latency of chat requests, including queueing and parsing",
+    ["endpoint"],
+    buckets=_LATENCY_BUCKETS,
+)
+UPSTREAM_QUEUE_SECONDS = Histogram(
+    "llm_upstream_queue_seconds",
+    "Ollama request time not spent loading, evaluating the prompt or decoding",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+MODEL_LOAD_SECONDS = Histogram(
+    "llm_model_load_seconds",
+    "Time Ollama spent loading the model for a generation",
+    buckets=(0.001, 0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 120),
+)
+PROMPT_EVAL_SECONDS = Histogram(
+    "llm_prompt_eval_seconds",
+    "Time Ollama spent evaluating the prompt (prefill)",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DECODE_SECONDS = Histogram(
+    "llm_decode_seconds",
+    "Time Ollama spent generating tokens",
+    buckets=_LATENCY_BUCKETS,
+)
+TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from sending a generation to Ollama to its first token",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60),
+)
+DECODE_TOKENS_PER_SECOND = Histogram(
+    "llm_decode_tokens_per_second",
+    "Decode throughput of individual generations",
+    buckets=(1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200, 500),
+)
+PROMPT_TOKENS = Counter(
+    "llm_prompt_tokens_total",
+    "Prompt tokens evaluated by Ollama",
+)
+COMPLETION_TOKENS = Counter(
+    "llm_completion_tokens_total",
+    "Tokens generated by Ollama",
+)
+
+JSON_PARSE = Counter(
+    "llm_json_parse_total",
+    "Model responses by requested output format and JSON extraction result",
+    ["format", "result"],
+)
+
+SESSIONS_ACTIVE = Gauge(
+    "llm_sessions_active",
+    "Conversation sessions currently stored",
+)
+SESSIONS_BYTES = Gauge(
+    "llm_sessions_bytes",
+    "Estimated memory used by conversation sessions",
+)
+SESSION_TURNS = Counter(
+    "llm_session_turns_total",
+    "Session turns by how the transcript was evaluated (cached prefix or in full)",
+    ["mode"],
+)
+SESSION_EVICTED_TURNS = Counter(
+    "llm_session_evicted_turns_total",
+    "Oldest session turns dropped to stay within the token budget",
+)
+
+CANCELLATIONS = Counter(
+    "llm_cancellations_total",
+    "Requests cancelled before they finished; reason=queued if no generation had started",
+    ["endpoint", "reason"],
+)
+
+CIRCUIT_STATE = Gauge(
+    "llm_circuit_state",
+    "Circuit breaker state per Ollama node (0 closed, 1 half-open, 2 open)",
+    ["node"],
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "llm_circuit_transitions_total",
+    "Circuit breaker state changes per Ollama node",
+    ["node", "state"],
+)
+OLLAMA_RETRIES = Counter(
+    "llm_ollama_retries_total",
+    "Ollama requests retried after a transient failure",
+    ["reason"],
+)
+
+TOOL_CALLS = Counter(
+    "llm_tool_calls_total",
+    "Executed function calls by tool and outcome",
+    ["tool", "status"],
+)
+TOOL_DURATION_SECONDS = Histogram(
+    "llm_tool_duration_seconds",
+    "Execution time of function calls not served from cache",
+    ["tool"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+TOOL_CACHE_HITS = Counter(
+    "llm_tool_cache_hits_total",
+    "Calls to pure tools served from the result cache",
+    ["tool"],
+)
+
+HEDGE_REQUESTS = Counter(
+    "llm_hedge_requests_total",
+    "Hedged requests by winning candidate (primary, hedge, or none_valid)",
+    ["winner"],
+)
+HEDGE_CANDIDATES = Counter(
+    "llm_hedge_candidates_total",
+    "Extra hedge candidates started, or skipped for lack of a free slot",
+    ["outcome"],
+)
+HEDGE_EXTRA_TOKENS = Counter(
+    "llm_hedge_extra_tokens_total",
+    "Tokens generated by hedge candidates that lost the race",
+)
+HEDGE_DELAY_SECONDS = Gauge(
+    "llm_hedge_delay_seconds",
+    "Current delay before hedging (percentile of recent upstream time)",
+)
+
+JOBS_QUEUE_DEPTH = Gauge(
+    "llm_jobs_queue_depth",
+    "Asynchronous jobs waiting for a worker",
+)
+JOBS_RUNNING = Gauge(
+    "llm_jobs_running",
+    "Asynchronous jobs currently executing",
+)
+JOBS_OLDEST_QUEUED_AGE_SECONDS = Gauge(
+    "llm_jobs_oldest_queued_age_seconds",
+    "How long the longest-waiting queued job has been waiting",
+)
+JOBS_STORED = Gauge(
+    "llm_jobs_stored",
+    "Jobs in the job store, finished ones included until they expire",
+)
+JOB_QUEUE_WAIT_SECONDS = Histogram(
+    "llm_job_queue_wait_seconds",
+    "Time from job submission until a worker picked it up",
+    buckets=_LATENCY_BUCKETS,
+)
+JOBS_FINISHED = Counter(
+    "llm_jobs_finished_total",
+    "Asynchronous jobs by final status",
+    ["status"],
+)
+JOBS_EXPIRED = Counter(
+    "llm_jobs_expired_total",
+    "Finished jobs deleted by garbage collection after their TTL",
+)
+RATE_LIMITED = Counter(
+    "llm_rate_limited_total",
+    "Requests rejected with 429 because the client's token bucket was empty",
+    ["endpoint"],
+)
+RATE_LIMIT_TOKENS = Counter(
+    "llm_rate_limit_tokens_total",
+    "Tokens reserved at admission and charged after completion",
+    ["kind"],
+)
+RATE_LIMIT_CLIENTS = Gauge(
+    "llm_rate_limit_clients",
+    "Clients with a token bucket in memory",
+)
+CAPTURE_ENTRIES = Counter(
+    "llm_capture_entries_total",
+    "Requests added to the traffic capture, or dropped because its buffer was full",
+    ["result"],
+)
@@ -0,0 +1,221 @@
+"""
+Pool of Ollama inference nodes.
+
+Each generation is routed to the routable node with the fewest outstanding
+requests, weighted by the node's recent decode speed (tokens/sec), so a
+faster box takes proportionally more traffic. Each node sits behind a
+circuit breaker: repeated connect failures, timeouts or server errors open
+it and the node is skipped until the breaker lets a trial request through
+again. A background prober refreshes connectivity and model availability
+for every node.
+"""
+
+import asyncio
+import random
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+import httpx
+
+from breaker import OPEN, CircuitBreaker
+
+
+class NoHealthyNode(Exception):
+    """Raised when no Ollama node can take a request."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__("No healthy Ollama node available")
+        self.retry_after = retry_after
+
+
+@dataclass
+class OllamaNode:
+    """Routing state of one Ollama endpoint."""
+
+    url: str
+    connected: bool | None = None  # None until the first probe
+    model_available: bool | None = None
+    outstanding: int = 0
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    tokens_per_second: float | None = None  # EWMA of decode speed
+    probe_latency_ms: float | None = None
+    last_probe: float | None = None  # time.monotonic() of the last probe
+    model_state: str = "cold"  # cold, warming, ready or idle (see warmup.py)
+    last_used: float = 0.0  # time.monotonic() of the last completed generation
+
+    def routable(self, now: float) -> bool:
+        return (
+            self.connected is not False
+            and self.model_available is not False
+            and self.breaker.available(now)
+        )
+
+    def snapshot(self, now: float) -> dict[str, Any]:
+        return {
+            "url": self.url,
+            "connected": bool(self.connected),
+            "model_available": bool(self.model_available),
+            "ejected": self.breaker.state == OPEN,
+            "circuit": self.breaker.state,
+            "outstanding": self.outstanding,
+            "tokens_per_second": (
+                round(self.tokens_per_second, 2) if self.tokens_per_second else None
+            ),
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "probe_latency_ms": self.probe_latency_ms,
+            "probe_age_s": (
+                round(now - self.last_probe, 3) if self.last_probe is not None else None
+            ),
+            "model_state": self.model_state,
+        }
+
+
+class OllamaPool:
+    """Least-outstanding-requests load balancer over Ollama nodes."""
+
+    def __init__(
+        self,
+        urls: list[str],
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        failure_threshold: int = 3,
+        on_circuit_change: Callable[[OllamaNode, str], None] | None = None,
+    ) -> None:
+        """
+        Args:
+            urls: Base URLs of the Ollama nodes
+            base_backoff: Time a node's circuit stays open the first time
+            max_backoff: Upper bound for the exponential open time
+            failure_threshold: Consecutive failures that open a node's circuit
+            on_circuit_change: Optional callback on every breaker transition
+        """
+        if not urls:
+            raise ValueError("OllamaPool needs at least one node URL")
+        self.nodes = [OllamaNode(url.rstrip("/")) for url in urls]
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        for node in self.nodes:
+            node.breaker = CircuitBreaker(
+                failure_threshold=failure_threshold,
+                recovery_timeout=base_backoff,
+                max_recovery_timeout=max_backoff,
+                on_change=(
+                    (lambda state, node=node: on_circuit_change(node, state))
+                    if on_circuit_change is not None
+                    else None
+                ),
+            )
+
+    def choose(self) -> OllamaNode:
+        """
+        Pick the node for the next generation.
+
+        Raises:
+            NoHealthyNode: If every node is down or its circuit is open
+        """
+        now = time.monotonic()
+        candidates = [node for node in self.nodes if node.routable(now)]
+        if not candidates:
+            waits = [n.breaker.retry_after(now) for n in self.nodes if n.breaker.state == OPEN]
+            raise NoHealthyNode(retry_after=min(waits, default=self.base_backoff))
+
+        speeds = [n.tokens_per_second for n in candidates if n.tokens_per_second]
+        fastest = max(speeds, default=None)
+
+        def load(node: OllamaNode) -> float:
+            weight = node.tokens_per_second / fastest if node.tokens_per_second else 1.0
+            return (node.outstanding + 1) / weight
+
+        best = min(load(node) for node in candidates)
+        return random.choice([node for node in candidates if load(node) == best])
+
+    def begin(self, node: OllamaNode) -> int:
+        """
+        Start a request on a node returned by `choose`, with no await in
+        between (so the node's breaker still admits it).
+
+        Returns:
+            The breaker ticket to pass to `end`
+        """
+        node.outstanding += 1
+        ticket = node.breaker.allow(time.monotonic())
+        return ticket or 0
+
+    def end(self, node: OllamaNode, ticket: int) -> None:
+        node.outstanding -= 1
+        node.breaker.finish(ticket)
+
+    def record_success(self, node: OllamaNode, data: dict[str, Any]) -> None:
+        """Update a node after a completed generation (Ollama's final chunk)."""
+        node.connected = True
+        node.breaker.record_success()
+        node.model_state = "ready"
+        node.last_used = time.monotonic()
+        eval_count = data.get("eval_count")
+        eval_duration = data.get("eval_duration")
+        if eval_count and eval_duration:
+            speed = eval_count / (eval_duration / 1e9)
+            if node.tokens_per_second is None:
+                node.tokens_per_second = speed
+            else:
+                node.tokens_per_second = 0.7 * node.tokens_per_second + 0.3 * speed
+
+    def record_connect_failure(self, node: OllamaNode) -> None:
+        """Count a failed connection towards opening the node's circuit."""
+        node.model_state = "cold"
+        node.breaker.record_failure()
+
+    def record_failure(self, node: OllamaNode) -> None:
+        """Count a timeout or server error towards opening the node's circuit."""
+        node.breaker.record_failure()
+
+    async def probe(
+        self,
+        client: httpx.AsyncClient,
+        model: str,
+        timeout: float,
+    ) -> None:
+        """Refresh connectivity and model availability of every node."""
+        await asyncio.gather(*(self._probe_node(client, node, model, timeout) for node in self.nodes))
+
+    def staleness(self) -> float:
+        """Seconds since the least recently probed node was probed (inf if never)."""
+        now = time.monotonic()
+        probes = [node.last_probe for node in self.nodes]
+        if any(probe is None for probe in probes):
+            return float("inf")
+        return now - min(probes)
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        now = time.monotonic()
+        return [node.snapshot(now) for node in self.nodes]
+
+    async def _probe_node(
+        self,
+        client: httpx.AsyncClient,
+        node: OllamaNode,
+        model: str,
+        timeout: float,
+    ) -> None:
+        started = time.perf_counter()
+        try:
+            response = await client.get(f"{node.url}/api/tags", timeout=timeout)
+            connected = response.status_code == 200
+            models = (
+                [m.get("name", "").split(":")[0] for m in response.json().get("models", [])]
+                if connected
+                else []
+            )
+        except (httpx.HTTPError, ValueError):
+            connected, models = False, []
+
+        node.probe_latency_ms = round((time.perf_counter() - started) * 1000, 3)
+        node.last_probe = time.monotonic()
+        was_connected, node.connected = node.connected, connected
+        node.model_available = model in models
+        if not node.model_available:
+            node.model_state = "cold"  # Ollama restarted or the model was removed
+        if connected and was_connected is False:
+            node.breaker.half_open()  # back online: let a real request confirm it
@@ -0,0 +1,142 @@
+"""
+Per-client token buckets charged in LLM tokens.
+
+Each client has a bucket of `capacity` tokens that refills at `rate` tokens
+per second. A request reserves its worst-case cost up front (prompt plus
+`max_tokens`) and `settle` corrects the charge to what the generation
+really used, refunding the rest. A reservation is admitted when the bucket
+holds `min(cost, capacity)` tokens, so a request larger than the bucket is
+still possible from a full bucket; the bucket then goes into debt, which
+later requests have to wait out.
+
+Buckets are kept in an LRU-ordered dict and refilled lazily on access, so
+every operation is O(1) regardless of how many clients there are. Idle
+buckets are evicted from the LRU end once they would have refilled
+completely, which loses nothing: a new bucket starts full as well. A hard
+`max_clients` bound evicts the least recently used buckets beyond it.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+class RateLimited(Exception):
+    """The client's bucket cannot cover the reservation yet."""
+
+    def __init__(self, retry_after: float, remaining: float, reset: float) -> None:
+        super().__init__(f"rate limited, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+        self.remaining = remaining
+        self.reset = reset
+
+
+@dataclass
+class Bucket:
+    tokens: float
+    updated: float  # time.monotonic() of the last refill
+    pending: int = 0  # unsettled reservations; such buckets are not evicted
+
+
+@dataclass
+class Reservation:
+    """Tokens taken from a client's bucket, to be settled when the request ends."""
+
+    key: str
+    amount: int
+    remaining: float  # bucket level afterwards, for rate-limit headers
+    reset: float  # seconds until the bucket is full again
+    settled: bool = False
+
+
+class TokenRateLimiter:
+    """Token buckets per client key with lazy refill and idle eviction."""
+
+    def __init__(self, rate: float, capacity: float, max_clients: int = 100_000) -> None:
+        """
+        Args:
+            rate: Tokens added to each bucket per second
+            capacity: Bucket size, i.e. the largest burst
+            max_clients: Buckets kept at most; the least recently used go first
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.max_clients = max_clients
+        self.evictions = 0
+        self._buckets: OrderedDict[str, Bucket] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def reserve(self, key: str, amount: int) -> Reservation:
+        """
+        Take `amount` tokens from the client's bucket.
+
+        Raises:
+            RateLimited: If the bucket holds less than min(amount, capacity)
+        """
+        now = time.monotonic()
+        self._evict(now)
+        bucket = self._bucket(key, now)
+        needed = min(amount, self.capacity)
+        if bucket.tokens < needed:
+            raise RateLimited(
+                retry_after=(needed - bucket.tokens) / self.rate,
+                remaining=max(bucket.tokens, 0.0),
+                reset=self._reset(bucket),
+            )
+        bucket.tokens -= amount
+        bucket.pending += 1
+        return Reservation(key, amount, max(bucket.tokens, 0.0), self._reset(bucket))
+
+    def settle(self, reservation: Reservation, used: int) -> None:
+        """
+        Charge what the request really used: refund the unused part of the
+        reservation, or take more if it used more. Safe to call repeatedly.
+        """
+        if reservation.settled:
+            return
+        reservation.settled = True
+        now = time.monotonic()
+        bucket = self._bucket(reservation.key, now)
+        bucket.pending = max(bucket.pending - 1, 0)
+        bucket.tokens = min(bucket.tokens + reservation.amount - used, self.capacity)
+        reservation.remaining = max(bucket.tokens, 0.0)
+        reservation.reset = self._reset(bucket)
+
+    def _bucket(self, key: str, now: float) -> Bucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = Bucket(self.capacity, now)
+        else:
+            bucket.tokens = min(bucket.tokens + (now - bucket.updated) * self.rate, self.capacity)
+            bucket.updated = now
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _reset(self, bucket: Bucket) -> float:
+        return max(self.capacity - bucket.tokens, 0.0) / self.rate
+
+    def _evict(self, now: float) -> None:
+        # Only the least recently used end is examined, so this is amortized O(1).
+        # A bucket in use stops the sweep until `settle` moves it to the other end.
+        # One slot is kept free for the bucket the caller may be about to add.
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if len(self._buckets) < self.max_clients and (
+                bucket.pending
+                or bucket.tokens + (now - bucket.updated) * self.rate < self.capacity
+            ):
+                return
+            del self._buckets[key]
+            self.evictions += 1
+
+
+def rate_limit_headers(limit: float, remaining: float, reset: float) -> dict[str, str]:
+    """RateLimit-* response headers (IETF draft: limit, remaining, seconds to reset)."""
+    return {
+        "RateLimit-Limit": str(int(limit)),
+        "RateLimit-Remaining": str(int(remaining)),
+        "RateLimit-Reset": str(math.ceil(reset)),
+    }
@@ -0,0 +1,84 @@
+"""
+Local stand-ins for the functions in sample_data.json.
+
+They return plausible, deterministic data without calling any external
+service, so the execution engine can be exercised end to end. Load them
+with TOOL_MODULES=sample_tools (the default) and replace them with real
+integrations by pointing TOOL_MODULES at your own modules, each exposing
+`register(registry)`.
+"""
+
+import hashlib
+import uuid
+from typing import Any
+
+from tools import ToolRegistry
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+CALENDAR_SCHEDULE_PARAMETERS = {
+    "type": "object",
+    "properties": {
+        "participants": {"type": "array", "items": {"type": "string"}, "minItems": 1},
+        "time": {"type": "string", "pattern": r"^([01]\d|2[0-3]):[0-5]\d$"},
+        "day": {"type": "string", "enum": DAYS},
+        "title": {"type": "string"},
+    },
+    "required": ["participants", "time", "day"],
+}
+
+GET_WEATHER_PARAMETERS = {
+    "type": "object",
+    "properties": {
+        "location": {"type": "string", "minLength": 1},
+        "units": {"type": "string", "enum": ["metric", "imperial"]},
+    },
+    "required": ["location"],
+}
+
+
+def calendar_schedule(
+    participants: list[str],
+    time: str,
+    day: str,
+    title: str = "Meeting",
+) -> dict[str, Any]:
+    """Pretend to book a meeting and return the created event."""
+    return {
+        "event_id": uuid.uuid4().hex[:12],
+        "title": title,
+        "participants": participants,
+        "day": day,
+        "time": time,
+        "status": "scheduled",
+    }
+
+
+def get_weather(location: str, units: str = "metric") -> dict[str, Any]:
+    """Made-up but stable weather for a location."""
+    seed = int(hashlib.sha256(location.lower().encode()).hexdigest(), 16)
+    celsius = seed % 35 - 5
+    return {
+        "location": location,
+        "temperature": celsius if units == "metric" else round(celsius * 9 / 5 + 32),
+        "units": units,
+        "conditions": ["sunny", "cloudy", "rain", "snow", "windy"][seed % 5],
+    }
+
+
+def register(registry: ToolRegistry) -> None:
+    registry.register(
+        "calendar_schedule",
+        calendar_schedule,
+        parameters=CALENDAR_SCHEDULE_PARAMETERS,
+        description="Schedule a meeting with the given participants",
+        timeout=5.0,
+    )
+    registry.register(
+        "get_weather",
+        get_weather,
+        parameters=GET_WEATHER_PARAMETERS,
+        description="Current weather for a location",
+        timeout=5.0,
+        pure=True,
+    )
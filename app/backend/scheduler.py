@@ -0,0 +1,204 @@
+"""
+Admission control for Ollama generations.
+
+Ollama only decodes a few requests in parallel; anything beyond that queues
+inside Ollama where it can neither be prioritised nor rejected early. The
+AdmissionController keeps that queue in the backend instead: at most `limit`
+generations run at once, the rest wait in a bounded priority queue, and
+requests that cannot be served before their deadline are rejected up front.
+
+With `adaptive=True` the limit follows an AIMD policy on observed service
+time: +1/limit per fast completion while the limit was saturated (every
+slot taken, or requests waiting), multiplied by `decrease_factor` (at most
+once per service time) when a generation is slower than `target_latency` or
+fails. Completions below the limit say nothing about whether more would
+fit, so light load does not grow the limit.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted."""
+
+    def __init__(self, reason: str, retry_after: float) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _Waiter:
+    sort_key: tuple[int, int]
+    future: asyncio.Future = field(compare=False)
+    priority: int = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+class AdmissionController:
+    """Concurrency limiter with a bounded priority queue and deadlines."""
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        queue_size: int,
+        adaptive: bool = False,
+        min_limit: int = 1,
+        max_limit: int | None = None,
+        target_latency: float | None = None,
+        decrease_factor: float = 0.75,
+    ) -> None:
+        """
+        Args:
+            max_in_flight: Initial (and, when not adaptive, fixed) concurrency
+            queue_size: Maximum number of waiting requests
+            adaptive: Adjust the concurrency limit with AIMD
+            min_limit: Lower bound for the adaptive limit
+            max_limit: Upper bound for the adaptive limit
+            target_latency: Service time above which the limit is decreased
+            decrease_factor: Multiplicative decrease applied on congestion
+        """
+        self.limit = float(max_in_flight)
+        self.queue_size = queue_size
+        self.adaptive = adaptive
+        self.min_limit = min_limit
+        self.max_limit = max_limit or max_in_flight
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.service_time: float | None = None  # EWMA, seconds
+        self.wait_time = 0.0  # EWMA, seconds
+        self._queue: list[_Waiter] = []
+        self._sequence = itertools.count()
+        self._last_decrease = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def estimated_wait(self, ahead: int) -> float:
+        """Seconds until a request with `ahead` waiters in front of it starts."""
+        if self.service_time is None:
+            return 0.0
+        return (ahead // self.capacity + 1) * self.service_time
+
+    async def acquire(self, priority: int = 0, deadline: float | None = None) -> float:
+        """
+        Wait for a generation slot.
+
+        Args:
+            priority: Higher values are served first; ties are FIFO
+            deadline: `time.monotonic()` value by which the slot must start
+
+        Returns:
+            Seconds spent waiting in the queue
+
+        Raises:
+            AdmissionRejected: If the queue is full or the deadline cannot be met
+        """
+        if self.in_flight < self.capacity and not self.waiting:
+            self.in_flight += 1
+            return 0.0
+
+        if self.waiting >= self.queue_size:
+            raise AdmissionRejected("queue_full", self.estimated_wait(self.waiting))
+
+        now = time.monotonic()
+        ahead = sum(
+            1 for w in self._queue if w.priority >= priority and not w.future.done()
+        )
+        estimate = self.estimated_wait(ahead)
+        if deadline is not None and now + estimate > deadline:
+            raise AdmissionRejected("deadline", estimate)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._queue,
+            _Waiter((-priority, next(self._sequence)), future, priority, now),
+        )
+        self.waiting += 1
+
+        try:
+            if deadline is None:
+                await future
+            else:
+                await asyncio.wait_for(future, max(deadline - now, 0))
+        except asyncio.TimeoutError:
+            self.waiting -= 1
+            raise AdmissionRejected("deadline", self.estimated_wait(self.waiting))
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # granted just as the waiter went away
+            else:
+                self.waiting -= 1
+            raise
+
+        wait = time.monotonic() - now
+        self.wait_time = 0.8 * self.wait_time + 0.2 * wait
+        return wait
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free and nobody is waiting; never queue."""
+        if self.in_flight < self.capacity and not self.waiting:
+            self.in_flight += 1
+            return True
+        return False
+
+    def release(self, latency: float | None = None, ok: bool = True) -> None:
+        """
+        Return a slot and hand it to the next waiter.
+
+        Args:
+            latency: Service time of the finished generation, if it counts
+                as a congestion signal
+            ok: False if the generation failed in a way that suggests overload
+        """
+        saturated = self.in_flight >= self.capacity or self.waiting > 0
+        self.in_flight -= 1
+        if latency is not None:
+            self._observe(latency, ok, saturated)
+        self._grant()
+
+    def snapshot(self) -> dict[str, float | int]:
+        """Current state for health reporting."""
+        return {
+            "in_flight": self.in_flight,
+            "concurrency_limit": self.capacity,
+            "queue_depth": self.waiting,
+            "queue_capacity": self.queue_size,
+            "avg_wait_ms": round(self.wait_time * 1000, 3),
+        }
+
+    def _grant(self) -> None:
+        while self._queue and self.in_flight < self.capacity:
+            waiter = heapq.heappop(self._queue)
+            if waiter.future.done():  # timed out or cancelled
+                continue
+            waiter.future.set_result(None)
+            self.in_flight += 1
+            self.waiting -= 1
+
+    def _observe(self, latency: float, ok: bool, saturated: bool) -> None:
+        if self.service_time is None:
+            self.service_time = latency
+        else:
+            self.service_time = 0.8 * self.service_time + 0.2 * latency
+
+        if not self.adaptive:
+            return
+        congested = not ok or (
+            self.target_latency is not None and latency > self.target_latency
+        )
+        if congested:
+            now = time.monotonic()
+            if now - self._last_decrease >= latency:
+                self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+                self._last_decrease = now
+        elif saturated:
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
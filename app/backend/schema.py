@@ -0,0 +1,290 @@
+"""
+Compiled validation for the JSON Schema subset used by tool definitions.
+
+`compile_schema` turns a schema into a validator closure once, so checking
+a value does not re-interpret the schema dictionary on every call.
+Supported keywords: type, enum, const, anyOf, oneOf, properties,
+required, additionalProperties, items, minItems, maxItems, minLength,
+maxLength, pattern, minimum, maximum. Unknown keywords (description,
+default, format, ...) are ignored, as JSON Schema allows.
+"""
+
+import re
+from collections.abc import Callable
+from typing import Any
+
+# Appends error messages for `value` at `path` to the list
+Check = Callable[[Any, str, list[str]], None]
+Validator = Callable[[Any], list[str]]
+
+
+class SchemaError(ValueError):
+    """The schema itself is malformed or uses an unsupported construct."""
+
+
+_TYPES: dict[str, Callable[[Any], bool]] = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    # bool is a subclass of int in Python, but not a number in JSON
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+}
+
+
+def compile_schema(schema: dict[str, Any]) -> Validator:
+    """
+    Compile a schema into a validator.
+
+    Args:
+        schema: JSON Schema (subset, see module docstring)
+
+    Returns:
+        Function returning the list of validation errors for a value
+        (empty if the value is valid)
+
+    Raises:
+        SchemaError: If the schema is malformed
+    """
+    check = _compile(schema)
+
+    def validate(value: Any) -> list[str]:
+        errors: list[str] = []
+        check(value, "$", errors)
+        return errors
+
+    return validate
+
+
+def _compile(schema: Any) -> Check:
+    if schema is True or schema == {}:
+        return lambda value, path, errors: None
+    if schema is False:
+        return lambda value, path, errors: errors.append(f"{path}: not allowed")
+    if not isinstance(schema, dict):
+        raise SchemaError(f"Schema must be an object, got {type(schema).__name__}")
+
+    checks: list[Check] = []
+
+    if "type" in schema:
+        types = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+        unknown = [t for t in types if t not in _TYPES]
+        if unknown:
+            raise SchemaError(f"Unsupported type {unknown[0]!r}")
+        predicates = [_TYPES[t] for t in types]
+        expected = " or ".join(types)
+        matches = (
+            predicates[0]
+            if len(predicates) == 1
+            else lambda value: any(predicate(value) for predicate in predicates)
+        )
+
+        def check_type(value: Any, path: str, errors: list[str]) -> None:
+            if not matches(value):
+                errors.append(f"{path}: expected {expected}, got {_json_type(value)}")
+
+        checks.append(check_type)
+
+    if "enum" in schema:
+        choices = list(schema["enum"])
+
+        def check_enum(value: Any, path: str, errors: list[str]) -> None:
+            if isinstance(value, str):
+                allowed = value in choices  # strings only ever equal strings
+            else:
+                allowed = any(_json_equal(value, choice) for choice in choices)
+            if not allowed:
+                errors.append(f"{path}: must be one of {choices}")
+
+        checks.append(check_enum)
+
+    if "const" in schema:
+        constant = schema["const"]
+
+        def check_const(value: Any, path: str, errors: list[str]) -> None:
+            if not _json_equal(value, constant):
+                errors.append(f"{path}: must be {constant!r}")
+
+        checks.append(check_const)
+
+    if "anyOf" in schema:
+        checks.append(_compile_alternatives(schema["anyOf"], "anyOf"))
+    if "oneOf" in schema:
+        checks.append(_compile_alternatives(schema["oneOf"], "oneOf"))
+
+    checks.extend(_compile_object(schema))
+    checks.extend(_compile_array(schema))
+    checks.extend(_compile_string(schema))
+    checks.extend(_compile_number(schema))
+
+    if len(checks) == 1:
+        return checks[0]
+
+    def check_all(value: Any, path: str, errors: list[str]) -> None:
+        for check in checks:
+            check(value, path, errors)
+
+    return check_all
+
+
+def _compile_alternatives(branches: Any, keyword: str) -> Check:
+    if not isinstance(branches, list) or not branches:
+        raise SchemaError(f"{keyword} must be a non-empty list")
+    compiled = [_compile(branch) for branch in branches]
+    exactly_one = keyword == "oneOf"
+    discriminator = _discriminator(branches)
+    # Tagged union: the tag's value selects the one branch to check; the
+    # others pin the tag to different values, so they cannot match as well
+    by_tag = (
+        {
+            branch["properties"][discriminator]["const"]: check
+            for branch, check in zip(branches, compiled)
+        }
+        if discriminator is not None
+        else {}
+    )
+
+    def check_alternatives(value: Any, path: str, errors: list[str]) -> None:
+        if by_tag and isinstance(value, dict) and isinstance(value.get(discriminator), str):
+            check = by_tag.get(value[discriminator])
+            if check is not None:
+                check(value, path, errors)
+                return
+        best: list[str] | None = None
+        matched = 0
+        for check in compiled:
+            branch_errors: list[str] = []
+            check(value, path, branch_errors)
+            if not branch_errors:
+                matched += 1
+                if not exactly_one:
+                    return
+            elif best is None or len(branch_errors) < len(best):
+                best = branch_errors
+        if matched > 1:
+            errors.append(f"{path}: matches {matched} of the oneOf alternatives, expected one")
+        elif not matched:
+            # Report the closest alternative; usually the one the value was meant for
+            errors.extend(best or [f"{path}: matches none of the alternatives"])
+
+    return check_alternatives
+
+
+def _discriminator(branches: list[Any]) -> str | None:
+    """A property every branch requires and pins to a distinct `const`, if any."""
+    if not all(isinstance(branch, dict) and branch.get("properties") for branch in branches):
+        return None
+    for name in branches[0]["properties"]:
+        tags = [branch["properties"].get(name, {}).get("const") for branch in branches]
+        if (
+            all(name in branch.get("required", ()) for branch in branches)
+            and all(isinstance(tag, str) for tag in tags)
+            and len(set(tags)) == len(tags)
+        ):
+            return name
+    return None
+
+
+def _compile_object(schema: dict[str, Any]) -> list[Check]:
+    properties = {
+        name: _compile(subschema) for name, subschema in schema.get("properties", {}).items()
+    }
+    required = list(schema.get("required", []))
+    additional = schema.get("additionalProperties", True)
+    check_additional = None if additional is True else _compile(additional)
+    if not properties and not required and check_additional is None:
+        return []
+
+    def check_object(value: Any, path: str, errors: list[str]) -> None:
+        if not isinstance(value, dict):
+            return
+        for name in required:
+            if name not in value:
+                errors.append(f"{path}: missing required property {name!r}")
+        for name, item in value.items():
+            check = properties.get(name, check_additional)
+            if check is not None:
+                check(item, f"{path}.{name}", errors)
+
+    return [check_object]
+
+
+def _compile_array(schema: dict[str, Any]) -> list[Check]:
+    check_item = _compile(schema["items"]) if "items" in schema else None
+    min_items = schema.get("minItems")
+    max_items = schema.get("maxItems")
+    if check_item is None and min_items is None and max_items is None:
+        return []
+
+    def check_array(value: Any, path: str, errors: list[str]) -> None:
+        if not isinstance(value, list):
+            return
+        if min_items is not None and len(value) < min_items:
+            errors.append(f"{path}: expected at least {min_items} items")
+        if max_items is not None and len(value) > max_items:
+            errors.append(f"{path}: expected at most {max_items} items")
+        if check_item is not None:
+            for index, item in enumerate(value):
+                check_item(item, f"{path}[{index}]", errors)
+
+    return [check_array]
+
+
+def _compile_string(schema: dict[str, Any]) -> list[Check]:
+    min_length = schema.get("minLength")
+    max_length = schema.get("maxLength")
+    try:
+        pattern = re.compile(schema["pattern"]) if "pattern" in schema else None
+    except re.error as e:
+        raise SchemaError(f"Invalid pattern {schema['pattern']!r}: {e}") from e
+    if min_length is None and max_length is None and pattern is None:
+        return []
+
+    def check_string(value: Any, path: str, errors: list[str]) -> None:
+        if not isinstance(value, str):
+            return
+        if min_length is not None and len(value) < min_length:
+            errors.append(f"{path}: shorter than {min_length} characters")
+        if max_length is not None and len(value) > max_length:
+            errors.append(f"{path}: longer than {max_length} characters")
+        if pattern is not None and not pattern.search(value):
+            errors.append(f"{path}: does not match {pattern.pattern!r}")
+
+    return [check_string]
+
+
+def _compile_number(schema: dict[str, Any]) -> list[Check]:
+    minimum = schema.get("minimum")
+    maximum = schema.get("maximum")
+    if minimum is None and maximum is None:
+        return []
+
+    def check_number(value: Any, path: str, errors: list[str]) -> None:
+        if not _TYPES["number"](value):
+            return
+        if minimum is not None and value < minimum:
+            errors.append(f"{path}: less than {minimum}")
+        if maximum is not None and value > maximum:
+            errors.append(f"{path}: greater than {maximum}")
+
+    return [check_number]
+
+
+def _json_type(value: Any) -> str:
+    for name in ("null", "boolean", "integer", "number", "string", "array", "object"):
+        if _TYPES[name](value):
+            return name
+    return type(value).__name__
+
+
+def _json_equal(a: Any, b: Any) -> bool:
+    """Equality without Python's True == 1, also inside arrays and objects."""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return a is b
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_json_equal(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_json_equal(v, b[k]) for k, v in a.items())
+    return a == b
@@ -0,0 +1,140 @@
+"""
+Server-side conversation sessions.
+
+A session keeps the turn history (user messages, assistant replies and
+function responses). Every turn sends the whole transcript as a raw
+prompt, rendered the same way each time, so the previous prompt and reply
+are a byte-identical prefix of the next one and Ollama's KV-cache reuse
+only evaluates the new turns. Once the transcript would overflow the token
+budget, the oldest turns are dropped; that changes the prefix, so the
+remaining history is evaluated in full for that one turn.
+
+Sessions are stored in a ResponseCache, so they are evicted least-recently
+used under an entry and byte cap and expire after a period of inactivity.
+"""
+
+import asyncio
+import math
+import uuid
+from dataclasses import dataclass, field
+
+from cache import ResponseCache
+
+# Role header and end-of-turn tokens around every turn
+TURN_OVERHEAD_TOKENS = 5
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Llama 3 token count of a turn (about 4 characters per token)."""
+    return math.ceil(len(text) / 4) + TURN_OVERHEAD_TOKENS
+
+
+@dataclass
+class Turn:
+    """One message in a conversation."""
+
+    role: str  # user, assistant or function
+    content: str
+    tokens: int
+
+
+@dataclass
+class Session:
+    """Turn history of one conversation."""
+
+    id: str
+    prefix_tokens: int = 0  # system prompt, in front of every transcript
+    turns: list[Turn] = field(default_factory=list)
+    # Whether the last prompt and reply are still a prefix of the transcript,
+    # so Ollama can reuse its KV cache for them on the next turn
+    cached: bool = False
+    closed: bool = False
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+    @property
+    def tokens(self) -> int:
+        """Tokens the transcript occupies in the model's context window."""
+        return self.prefix_tokens + sum(turn.tokens for turn in self.turns)
+
+    def fit(self, new_tokens: int, budget: int) -> int:
+        """
+        Drop the oldest turns until `new_tokens` more fit into `budget`.
+
+        The history always restarts at a user turn, so no reply or function
+        response is left without the message that prompted it. Dropping
+        turns changes the prompt prefix, so Ollama's cache no longer applies.
+
+        Args:
+            new_tokens: Tokens about to be added (new turns plus the reply)
+            budget: Maximum tokens of the whole transcript
+
+        Returns:
+            Number of turns dropped
+        """
+        dropped = 0
+        while self.turns and self.tokens + new_tokens > budget:
+            self.turns.pop(0)
+            self.cached = False
+            dropped += 1
+            while self.turns and self.turns[0].role != "user":
+                self.turns.pop(0)
+                dropped += 1
+        return dropped
+
+    def sizeof(self) -> int:
+        """Rough memory footprint in bytes."""
+        return 512 + sum(len(turn.content.encode()) + 64 for turn in self.turns)
+
+
+class SessionStore:
+    """Bounded, expiring collection of sessions."""
+
+    def __init__(
+        self,
+        max_sessions: int,
+        max_bytes: int,
+        ttl: float,
+        prefix_tokens: int = 0,
+    ) -> None:
+        """
+        Args:
+            max_sessions: Maximum number of live sessions
+            max_bytes: Maximum total estimated size of all sessions
+            ttl: Seconds a session survives without a new turn
+            prefix_tokens: Tokens of the system prompt every transcript starts with
+        """
+        self.prefix_tokens = prefix_tokens
+        self._sessions = ResponseCache(
+            max_entries=max_sessions,
+            max_bytes=max_bytes,
+            ttl=ttl,
+            sizeof=lambda key, session: session.sizeof(),
+        )
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._sessions.total_bytes
+
+    def create(self) -> Session:
+        session = Session(id=uuid.uuid4().hex, prefix_tokens=self.prefix_tokens)
+        self._sessions.put(session.id, session)
+        return session
+
+    def get(self, session_id: str) -> Session | None:
+        return self._sessions.get(session_id)
+
+    def save(self, session: Session) -> None:
+        """Re-account the session's size and restart its TTL."""
+        if not session.closed:
+            self._sessions.put(session.id, session)
+
+    def delete(self, session_id: str) -> bool:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return False
+        session.closed = True
+        self._sessions.delete(session_id)
+        return True
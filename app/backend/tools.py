@@ -0,0 +1,339 @@
+"""
+Tool registry and execution engine.
+
+Tools are plain Python functions, sync or async, registered under the name
+the model uses in its function-call JSON together with a JSON Schema for
+their parameters. The engine turns the model's parsed output into calls,
+validates the arguments, and runs independent calls concurrently: async
+handlers on the event loop, sync handlers on a bounded thread pool. Every
+call has its own timeout. Results of tools declared `pure` (same arguments,
+same result, no side effects) are cached.
+
+A timed-out sync handler cannot be interrupted; its thread finishes in the
+background and the result is discarded.
+"""
+
+import asyncio
+import functools
+import inspect
+import json
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from cache import ResponseCache
+from schema import Validator, compile_schema
+
+# Keys the model may use for the function name and its arguments
+NAME_KEYS = ("action", "function", "name")
+ARGUMENT_KEYS = ("parameters", "arguments")
+
+
+@dataclass
+class Tool:
+    """A registered tool handler."""
+
+    name: str
+    handler: Callable[..., Any]
+    parameters: dict[str, Any]
+    validate: Validator
+    description: str = ""
+    timeout: float = 10.0
+    pure: bool = False
+
+    @property
+    def is_async(self) -> bool:
+        return inspect.iscoroutinefunction(self.handler)
+
+
+@dataclass
+class ToolCall:
+    """One function call requested by the model."""
+
+    name: str
+    arguments: Any
+
+
+@dataclass
+class ToolResult:
+    """Outcome of executing one tool call."""
+
+    tool: str
+    arguments: Any
+    # ok, invalid_arguments, unknown_tool, timeout or error
+    status: str
+    result: Any = None
+    error: str | None = None
+    latency_ms: float = 0.0
+    cached: bool = False
+
+
+@dataclass(frozen=True)
+class FunctionSchema:
+    """JSON Schema of a function call to one of a set of tools, and its validator."""
+
+    names: tuple[str, ...]
+    schema: dict[str, Any]
+    validate: Validator
+
+
+def function_call_schema(tools: list[Tool]) -> dict[str, Any]:
+    """
+    JSON Schema of the system prompt's call object for any of `tools`.
+
+    Each tool contributes one alternative that pins `action` to its name
+    and `parameters` to its parameter schema, so a schema-constrained
+    generation can only name a registered function with valid arguments.
+    """
+    alternatives = [
+        {
+            "type": "object",
+            "properties": {
+                "action": {"const": tool.name},
+                "parameters": tool.parameters,
+                "reasoning": {"type": "string"},
+            },
+            "required": ["action", "parameters"],
+            "additionalProperties": False,
+        }
+        for tool in tools
+    ]
+    return alternatives[0] if len(alternatives) == 1 else {"anyOf": alternatives}
+
+
+def extract_tool_calls(parsed: Any) -> list[ToolCall]:
+    """
+    Find the function calls in the model's parsed JSON output.
+
+    Accepts a single call object or a list of them. A call names the
+    function under `action`, `function` or `name` and its arguments under
+    `parameters` or `arguments`; arguments given as a JSON string (as some
+    function-calling fine-tunes emit) are decoded.
+
+    Args:
+        parsed: Parsed JSON from the model response
+
+    Returns:
+        The calls in order; entries that are not calls are skipped
+    """
+    items = parsed if isinstance(parsed, list) else [parsed]
+    calls = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        name = next((item[key] for key in NAME_KEYS if isinstance(item.get(key), str)), None)
+        if name is None:
+            continue
+        arguments = next((item[key] for key in ARGUMENT_KEYS if key in item), {})
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments) if arguments.strip() else {}
+            except ValueError:
+                pass  # reported by schema validation
+        calls.append(ToolCall(name, arguments))
+    return calls
+
+
+class ToolRegistry:
+    """Named tools plus the machinery to execute calls to them."""
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        cache: ResponseCache | None = None,
+        on_result: Callable[[ToolResult], None] | None = None,
+    ) -> None:
+        """
+        Args:
+            max_workers: Threads available to sync handlers
+            cache: Optional cache for results of pure tools
+            on_result: Optional callback after every executed call
+        """
+        self._tools: dict[str, Tool] = {}
+        self._schemas: dict[tuple[str, ...], FunctionSchema] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self.cache = cache
+        self.on_result = on_result
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    def get(self, name: str) -> Tool | None:
+        return self._tools.get(name)
+
+    def tools(self) -> list[Tool]:
+        return sorted(self._tools.values(), key=lambda tool: tool.name)
+
+    def register(
+        self,
+        name: str,
+        handler: Callable[..., Any],
+        parameters: dict[str, Any] | None = None,
+        description: str = "",
+        timeout: float = 10.0,
+        pure: bool = False,
+    ) -> Tool:
+        """
+        Register a handler; it is called with the arguments as keywords.
+
+        Args:
+            name: Function name the model uses
+            handler: Sync or async callable returning a JSON-serializable value
+            parameters: JSON Schema of the arguments object
+            description: Human-readable description
+            timeout: Seconds a call may take
+            pure: The result depends only on the arguments, so it can be cached
+
+        Returns:
+            The registered tool
+
+        Raises:
+            ValueError: If the name is taken
+            SchemaError: If the parameter schema is malformed
+        """
+        if name in self._tools:
+            raise ValueError(f"Tool {name!r} is already registered")
+        parameters = parameters or {"type": "object"}
+        tool = Tool(
+            name=name,
+            handler=handler,
+            parameters=parameters,
+            validate=compile_schema(parameters),
+            description=description,
+            timeout=timeout,
+            pure=pure,
+        )
+        self._tools[name] = tool
+        self._schemas.clear()
+        return tool
+
+    def function_schema(self, names: Iterable[str] | None = None) -> FunctionSchema:
+        """
+        Call schema for a set of tools, compiled once per distinct set.
+
+        Args:
+            names: Tools the call may name; None for every registered tool
+
+        Returns:
+            The schema and its compiled validator
+
+        Raises:
+            KeyError: If a name is not registered, or no tool is
+        """
+        key = tuple(sorted(set(names))) if names is not None else tuple(sorted(self._tools))
+        cached = self._schemas.get(key)
+        if cached is not None:
+            return cached
+        unknown = [name for name in key if name not in self._tools]
+        if unknown or not key:
+            raise KeyError(unknown[0] if unknown else "no tools registered")
+        schema = function_call_schema([self._tools[name] for name in key])
+        cached = self._schemas[key] = FunctionSchema(key, schema, compile_schema(schema))
+        return cached
+
+    def tool(self, name: str | None = None, **options: Any) -> Callable:
+        """Decorator form of `register`; the function name is the default tool name."""
+
+        def decorator(handler: Callable[..., Any]) -> Callable[..., Any]:
+            self.register(name or handler.__name__, handler, **options)
+            return handler
+
+        return decorator
+
+    async def execute_all(
+        self,
+        calls: list[ToolCall],
+        deadline: float | None = None,
+    ) -> list[ToolResult]:
+        """
+        Execute independent calls concurrently.
+
+        Args:
+            calls: Calls to run
+            deadline: Optional `time.monotonic()` deadline capping every timeout
+
+        Returns:
+            One result per call, in the order of `calls`
+        """
+        return list(await asyncio.gather(*(self.execute(call, deadline) for call in calls)))
+
+    async def execute(self, call: ToolCall, deadline: float | None = None) -> ToolResult:
+        """
+        Validate and run one call; failures are reported in the result.
+
+        Args:
+            call: Call to run
+            deadline: Optional `time.monotonic()` deadline capping the timeout
+
+        Returns:
+            Result with status, value or error, and latency
+        """
+        started = time.perf_counter()
+        result = await self._execute(call, deadline)
+        result.latency_ms = round((time.perf_counter() - started) * 1000, 3)
+        if self.on_result is not None:
+            self.on_result(result)
+        return result
+
+    async def _execute(self, call: ToolCall, deadline: float | None) -> ToolResult:
+        tool = self._tools.get(call.name)
+        if tool is None:
+            return ToolResult(
+                call.name, call.arguments, "unknown_tool", error=f"Unknown tool {call.name!r}"
+            )
+        if not isinstance(call.arguments, dict):
+            return ToolResult(
+                call.name, call.arguments, "invalid_arguments", error="$: expected object"
+            )
+        errors = tool.validate(call.arguments)
+        if errors:
+            return ToolResult(
+                call.name, call.arguments, "invalid_arguments", error="; ".join(errors)
+            )
+
+        timeout = tool.timeout
+        if deadline is not None:
+            timeout = min(timeout, max(deadline - time.monotonic(), 0.0))
+
+        try:
+            if tool.pure and self.cache is not None:
+                (value,), outcome = await asyncio.wait_for(
+                    self.cache.get_or_compute(
+                        (tool.name, canonical_arguments(call.arguments)),
+                        lambda: self._run(tool, call.arguments),
+                    ),
+                    timeout,
+                )
+                cached = outcome in ("hit", "coalesced")
+            else:
+                (value,) = await asyncio.wait_for(self._run(tool, call.arguments), timeout)
+                cached = False
+        except asyncio.TimeoutError:
+            return ToolResult(
+                call.name, call.arguments, "timeout", error=f"Timed out after {timeout:.3g}s"
+            )
+        except Exception as e:
+            return ToolResult(call.name, call.arguments, "error", error=f"{type(e).__name__}: {e}")
+        return ToolResult(call.name, call.arguments, "ok", result=value, cached=cached)
+
+    async def _run(self, tool: Tool, arguments: dict[str, Any]) -> tuple[Any]:
+        # Wrapped in a tuple so a None result is still cacheable
+        if tool.is_async:
+            return (await tool.handler(**arguments),)
+        loop = asyncio.get_running_loop()
+        handler = functools.partial(tool.handler, **arguments)
+        return (await loop.run_in_executor(self._executor, handler),)
+
+    def shutdown(self) -> None:
+        """Stop accepting sync calls; running handler threads are not waited for."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def canonical_arguments(arguments: Any) -> str:
+    """Order-independent cache key for an arguments object."""
+    return json.dumps(arguments, sort_keys=True, separators=(",", ":"), default=str)
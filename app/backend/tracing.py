@@ -0,0 +1,231 @@
+"""
+Lightweight per-request tracing.
+
+`TracingMiddleware` starts a `Trace` for every HTTP request and keeps it
+in a context variable. Code anywhere below the handler can then time a
+stage with `with span("name"):` without passing the trace around; tasks
+started by the request inherit it. `record` adds a stage that was measured
+elsewhere, such as the durations Ollama reports. Without an active trace,
+`span` returns a shared no-op and `record` returns at once, so
+instrumented code costs one context-variable lookup when tracing is off.
+
+The middleware adds a `Server-Timing` header to every response, with the
+time per stage (summed when a stage ran more than once) and the total.
+Sampled traces are handed to a `SpanExporter`, which appends one JSON line
+per request to a size-rotated file from a background thread.
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+_current: ContextVar["Trace | None"] = ContextVar("trace", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    start: float  # seconds after the trace started
+    duration: float  # seconds
+
+
+@dataclass
+class Trace:
+    """Stages of one request, in the order they finished."""
+
+    request_id: str
+    sampled: bool  # whether the trace is exported
+    started: float = field(default_factory=time.perf_counter)
+    spans: list[Span] = field(default_factory=list)
+    last_end: float | None = None  # time.perf_counter() when the latest stage ended
+
+    def add(self, name: str, start: float, end: float) -> None:
+        self.spans.append(Span(name, start - self.started, end - start))
+        if self.last_end is None or end > self.last_end:
+            self.last_end = end
+
+    def totals(self) -> dict[str, float]:
+        """Seconds per stage name, in order of first appearance."""
+        totals: dict[str, float] = {}
+        for item in self.spans:
+            totals[item.name] = totals.get(item.name, 0.0) + item.duration
+        return totals
+
+
+class _Timer:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace: Trace, name: str) -> None:
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.trace.add(self.name, self.start, time.perf_counter())
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoTimer":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+
+_NO_TIMER = _NoTimer()
+
+
+def span(name: str) -> _Timer | _NoTimer:
+    """Context manager timing a stage of the current request, if it is traced."""
+    trace = _current.get()
+    return _NO_TIMER if trace is None else _Timer(trace, name)
+
+
+def record(name: str, seconds: float | None) -> None:
+    """Add a stage of the current request that ended now and took `seconds`."""
+    trace = _current.get()
+    if trace is None or seconds is None:
+        return
+    end = time.perf_counter()
+    trace.add(name, end - seconds, end)
+
+
+def server_timing(trace: Trace, end: float) -> str:
+    """`Server-Timing` header value: each stage's total and the request's."""
+    metrics = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in trace.totals().items()]
+    metrics.append(f"total;dur={(end - trace.started) * 1000:.1f}")
+    return ", ".join(metrics)
+
+
+class SpanExporter:
+    """Appends traces as JSON lines to a size-rotated file, off the event loop."""
+
+    def __init__(self, path: str, max_bytes: int, backups: int) -> None:
+        """
+        Args:
+            path: JSONL file, created with its directory if missing
+            max_bytes: Size at which the file is rotated
+            backups: Rotated files kept (`path.1` ... `path.N`)
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"
+        )
+        self._queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(self._queue, self._handler)
+
+    def start(self) -> None:
+        self._listener.start()
+
+    def stop(self) -> None:
+        """Write what is queued and close the file."""
+        self._listener.stop()
+        self._handler.close()
+
+    def export(self, record: dict[str, Any]) -> None:
+        message = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        self._queue.put(logging.makeLogRecord({"msg": message}))
+
+
+def trace_record(trace: Trace, method: str, path: str, status: int, end: float) -> dict[str, Any]:
+    """The exported form of a finished trace."""
+    return {
+        "request_id": trace.request_id,
+        "timestamp": time.time() - (end - trace.started),
+        "method": method,
+        "path": path,
+        "status": status,
+        "duration_ms": round((end - trace.started) * 1000, 3),
+        "spans": [
+            {
+                "name": item.name,
+                "start_ms": round(item.start * 1000, 3),
+                "duration_ms": round(item.duration * 1000, 3),
+            }
+            for item in trace.spans
+        ],
+    }
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware that traces each HTTP request.
+
+    Adds `Server-Timing` and `X-Request-ID` headers. The request id is
+    taken from the request's `X-Request-ID` header if it sends a
+    reasonable one. The time between the last stage and the response
+    headers, which for JSON responses is mostly serialization, is
+    recorded as a `respond` stage. The trace is exported when the last
+    body chunk has been sent, so streamed responses include their
+    streaming stages.
+    """
+
+    def __init__(
+        self,
+        app: Callable[..., Awaitable[None]],
+        exporter: SpanExporter | None = None,
+        sample_rate: float = 1.0,
+    ) -> None:
+        self.app = app
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                value = value.decode("latin-1")
+                if 0 < len(value) <= 128 and value.isprintable():
+                    request_id = value
+                break
+        trace = Trace(
+            request_id=request_id or uuid.uuid4().hex,
+            sampled=self.exporter is not None and random.random() < self.sample_rate,
+        )
+        status = 500
+
+        async def send_traced(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                now = time.perf_counter()
+                if trace.last_end is not None:
+                    trace.add("respond", trace.last_end, now)
+                message = {
+                    **message,
+                    "headers": [
+                        *message.get("headers", ()),
+                        (b"server-timing", server_timing(trace, now).encode()),
+                        (b"x-request-id", trace.request_id.encode()),
+                    ],
+                }
+            await send(message)
+
+        token = _current.set(trace)
+        try:
+            await self.app(scope, receive, send_traced)
+        finally:
+            _current.reset(token)
+            if trace.sampled:
+                end = time.perf_counter()
+                self.exporter.export(
+                    trace_record(trace, scope["method"], scope["path"], status, end)
+                )
@@ -0,0 +1,142 @@
+"""
+Model warm-up and keep-alive for Ollama nodes.
+
+Ollama loads a model on the first request that needs it, and unloads it
+after `keep_alive` without traffic; either way the next user request pays
+the full load. The ModelWarmer loads the model on every node as soon as
+the node is reachable, with a zero-token generation (an empty prompt), and
+re-sends that request to nodes that have seen no traffic for
+`ping_interval` seconds so their keep_alive never runs out.
+
+With `idle_timeout` set, pings stop once a node has been without real
+traffic for that long and Ollama is allowed to unload the model; the node
+is then reported as `idle` until the next generation or warm-up.
+
+Node states: `cold` (not loaded as far as we know), `warming`, `ready`
+and `idle`.
+"""
+
+import asyncio
+import time
+from collections.abc import Callable
+
+import httpx
+
+from ollama_pool import OllamaNode, OllamaPool
+
+
+class ModelWarmer:
+    """Loads the model on every node and keeps it resident."""
+
+    def __init__(
+        self,
+        pool: OllamaPool,
+        model: str,
+        keep_alive: str | int,
+        ping_interval: float,
+        idle_timeout: float = 0.0,
+        poll_interval: float = 1.0,
+        on_loaded: Callable[[int], None] | None = None,
+    ) -> None:
+        """
+        Args:
+            pool: Nodes to keep warm
+            model: Model to load
+            keep_alive: keep_alive sent with warm-up and ping requests
+            ping_interval: Seconds without traffic after which a node is
+                pinged; 0 disables pings
+            idle_timeout: Seconds without real traffic after which pings
+                stop; 0 keeps the model resident indefinitely
+            poll_interval: Seconds between checks of the node states
+            on_loaded: Optional callback with Ollama's load_duration (ns)
+                after each successful warm-up
+        """
+        self.pool = pool
+        self.model = model
+        self.keep_alive = keep_alive
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.poll_interval = poll_interval
+        self.on_loaded = on_loaded
+        self._warmed_at: dict[str, float] = {}  # node url -> last cold -> ready
+        self._pinged_at: dict[str, float] = {}  # node url -> last warm-up or ping
+
+    def state(self) -> str:
+        """Best state across nodes: ready, idle, warming or cold."""
+        now = time.monotonic()
+        states = {node.model_state for node in self.pool.nodes}
+        for state in ("ready", "idle", "warming"):
+            if state in states:
+                return state
+        if any(node.routable(now) for node in self.pool.nodes):
+            return "warming"  # reachable, warm-up will start on the next poll
+        return "cold"
+
+    @property
+    def ready(self) -> bool:
+        """True once at least one node has the model loaded."""
+        return self.state() in ("ready", "idle")
+
+    async def run(self, client: httpx.AsyncClient) -> None:
+        """Background task: warm cold nodes and ping idle ones, forever."""
+        while True:
+            await self.tick(client)
+            await asyncio.sleep(self.poll_interval)
+
+    async def tick(self, client: httpx.AsyncClient) -> None:
+        """Warm up or ping every node that needs it, concurrently."""
+        now = time.monotonic()
+        due = [node for node in self.pool.nodes if self._due(node, now)]
+        await asyncio.gather(*(self.warm(client, node) for node in due))
+
+    async def warm(self, client: httpx.AsyncClient, node: OllamaNode) -> bool:
+        """
+        Load the model on one node without generating any tokens.
+
+        Returns:
+            True if Ollama confirmed the model is loaded
+        """
+        loading = node.model_state != "ready"
+        if loading:
+            node.model_state = "warming"
+        try:
+            response = await client.post(
+                f"{node.url}/api/generate",
+                json={
+                    "model": self.model,
+                    "prompt": "",
+                    "stream": False,
+                    "keep_alive": self.keep_alive,
+                },
+            )
+            response.raise_for_status()
+            data = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            node.model_state = "cold"
+            if isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)):
+                self.pool.record_connect_failure(node)
+            return False
+
+        now = time.monotonic()
+        node.model_state = "ready"
+        self._pinged_at[node.url] = now
+        if loading:
+            self._warmed_at[node.url] = now
+        if loading and self.on_loaded is not None and data.get("load_duration") is not None:
+            self.on_loaded(data["load_duration"])
+        return True
+
+    def _due(self, node: OllamaNode, now: float) -> bool:
+        if node.model_state == "warming" or not node.routable(now):
+            return False
+        if node.model_state == "cold":
+            return True
+        if node.model_state == "idle":
+            return False  # a real generation makes it ready again
+        # Pings do not count as traffic; the idle clock starts at warm-up
+        active_at = max(node.last_used, self._warmed_at.get(node.url, 0.0))
+        if self.idle_timeout and now - active_at > self.idle_timeout:
+            node.model_state = "idle"
+            return False
+        loaded_at = max(node.last_used, self._pinged_at.get(node.url, 0.0))
+        return bool(self.ping_interval) and now - loaded_at >= self.ping_interval
@@ -4,15 +4,19 @@ Clean UI with Chat and JSON Output panels
 """
 
 import json
+from collections.abc import Iterator
 
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
 
 # =============================================================================
 # Configuration
 # =============================================================================
 
 API_BASE_URL = "http://backend:8000"
+HEALTH_CACHE_TTL = 10  # seconds a health check result is reused across reruns
+HTTP_POOL_SIZE = 10  # keep-alive connections to the backend, shared by all browser sessions
 PAGE_TITLE = "Llama 3 Function Agent"
 PAGE_ICON = "🦙"
 
@@ -245,10 +249,21 @@ st.markdown(
 # =============================================================================
 
 
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """HTTP session shared across reruns, so requests reuse pooled connections."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_data(ttl=HEALTH_CACHE_TTL, show_spinner=False)
 def check_api_health() -> dict:
     """Check if the backend API and Ollama are available."""
     try:
-        response = requests.get(f"{API_BASE_URL}/health", timeout=5)
+        response = get_http_session().get(f"{API_BASE_URL}/health", timeout=5)
         if response.status_code == 200:
             return response.json()
         return {"status": "unhealthy", "ollama_connected": False, "model_available": False}
@@ -256,23 +271,42 @@ def check_api_health() -> dict:
         return {"status": "unreachable", "ollama_connected": False, "model_available": False}
 
 
-def send_chat_message(message: str, temperature: float = 0.7) -> dict:
-    """Send a chat message to the backend API."""
+def stream_chat_message(message: str, temperature: float = 0.7) -> Iterator[tuple[str, dict]]:
+    """
+    Send a chat message to the streaming endpoint and yield its events.
+
+    Yields (event, data) pairs as they arrive: `token` deltas, the `json`
+    value once the first object closes, then `done` with the full response
+    or `error` with its `detail`.
+    """
     try:
-        response = requests.post(
-            f"{API_BASE_URL}/chat",
+        with get_http_session().post(
+            f"{API_BASE_URL}/chat/stream",
             json={"message": message, "temperature": temperature},
-            timeout=120,
-        )
-        if response.status_code == 200:
-            return {"success": True, "data": response.json()}
-        return {"success": False, "error": response.json().get("detail", "Unknown error")}
+            stream=True,
+            timeout=(5, 120),  # the read timeout applies between tokens
+        ) as response:
+            if response.status_code != 200:
+                try:
+                    detail = response.json().get("detail", "Unknown error")
+                except ValueError:
+                    detail = f"Backend returned status {response.status_code}"
+                yield "error", {"detail": detail}
+                return
+            event = None
+            # chunk_size=None hands over each chunk as it arrives instead of filling a buffer
+            for line in response.iter_lines(chunk_size=None):
+                line = line.decode("utf-8")
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: ") and event:
+                    yield event, json.loads(line[len("data: "):])
     except requests.exceptions.Timeout:
-        return {"success": False, "error": "Request timed out. The model may be processing a complex query."}
+        yield "error", {"detail": "Request timed out. The model may be processing a complex query."}
     except requests.exceptions.ConnectionError:
-        return {"success": False, "error": "Cannot connect to the backend API."}
+        yield "error", {"detail": "Cannot connect to the backend API."}
     except Exception as e:
-        return {"success": False, "error": str(e)}
+        yield "error", {"detail": str(e)}
 
 
 def format_json_output(data: dict | list | None) -> str:
@@ -282,6 +316,54 @@ def format_json_output(data: dict | list | None) -> str:
     return json.dumps(data, indent=2, ensure_ascii=False)
 
 
+def render_chat_response(result: dict | None) -> None:
+    """Show the final chat response, or the error."""
+    if result:
+        if result["success"]:
+            data = result["data"]
+            response_text = data.get("response", "No response received.")
+
+            st.markdown('<div class="output-container">', unsafe_allow_html=True)
+            st.markdown(response_text)
+
+            if data.get("tokens_used"):
+                st.markdown(f"*Tokens used: {data['tokens_used']}*")
+            st.markdown("</div>", unsafe_allow_html=True)
+        else:
+            st.markdown(
+                f'<div class="error-box">❌ {result["error"]}</div>',
+                unsafe_allow_html=True,
+            )
+    else:
+        st.markdown('<div class="output-container">', unsafe_allow_html=True)
+        st.markdown("*Waiting for input...*")
+        st.markdown("</div>", unsafe_allow_html=True)
+
+
+def render_parsed_json(result: dict | None) -> None:
+    """Show the parsed JSON of the final response."""
+    if result and result["success"]:
+        parsed_output = result["data"].get("parsed_output", {})
+
+        if parsed_output.get("parsed_json") is not None:
+            json_str = format_json_output(parsed_output["parsed_json"])
+            st.code(json_str, language="json")
+        else:
+            st.markdown('<div class="output-container">', unsafe_allow_html=True)
+            st.markdown("*No valid JSON detected in response.*")
+
+            if parsed_output.get("parse_error"):
+                st.markdown(
+                    f'<div class="parse-warning">⚠️ {parsed_output["parse_error"]}</div>',
+                    unsafe_allow_html=True,
+                )
+            st.markdown("</div>", unsafe_allow_html=True)
+    else:
+        st.markdown('<div class="output-container">', unsafe_allow_html=True)
+        st.markdown("*JSON output will appear here...*")
+        st.markdown("</div>", unsafe_allow_html=True)
+
+
 # =============================================================================
 # Sidebar - Model Status
 # =============================================================================
@@ -294,7 +376,7 @@ with st.sidebar:
     st.markdown("### Model Status")
 
     if st.button("🔄 Refresh Status", use_container_width=True):
-        st.session_state.health_checked = True
+        check_api_health.clear()
 
     health = check_api_health()
 
@@ -416,8 +498,8 @@ st.markdown(
     <div class="disclaimer-banner">
         <span class="disclaimer-icon">⏱️</span>
         <div class="disclaimer-text">
-            <strong>Please note:</strong> Inference may take 30-120 seconds due to the hosting service's computational resources. 
-            Complex queries may take longer. Please be patient while the model processes your request.
+            <strong>Please note:</strong> The response streams in as the model generates it.
+            The first response after a deploy may take longer to start while the model loads.
         </div>
     </div>
     """,
@@ -446,61 +528,39 @@ col_chat, col_json = st.columns(2)
 if "last_response" not in st.session_state:
     st.session_state.last_response = None
 
-# Process input
-if send_button and user_input.strip():
-    with st.spinner("🔄 Processing with Llama 3..."):
-        result = send_chat_message(user_input.strip(), temperature)
-        st.session_state.last_response = result
-
-# Display results
 with col_chat:
     st.markdown('<div class="panel-header">📝 Chat Response</div>', unsafe_allow_html=True)
-
-    if st.session_state.last_response:
-        if st.session_state.last_response["success"]:
-            data = st.session_state.last_response["data"]
-            response_text = data.get("response", "No response received.")
-
-            st.markdown('<div class="output-container">', unsafe_allow_html=True)
-            st.markdown(response_text)
-
-            if data.get("tokens_used"):
-                st.markdown(f"*Tokens used: {data['tokens_used']}*")
-            st.markdown("</div>", unsafe_allow_html=True)
-        else:
-            st.markdown(
-                f'<div class="error-box">❌ {st.session_state.last_response["error"]}</div>',
-                unsafe_allow_html=True,
-            )
-    else:
-        st.markdown('<div class="output-container">', unsafe_allow_html=True)
-        st.markdown("*Waiting for input...*")
-        st.markdown("</div>", unsafe_allow_html=True)
+    chat_panel = st.empty()
 
 with col_json:
     st.markdown('<div class="panel-header">🔧 Parsed JSON</div>', unsafe_allow_html=True)
+    json_panel = st.empty()
 
-    if st.session_state.last_response and st.session_state.last_response["success"]:
-        data = st.session_state.last_response["data"]
-        parsed_output = data.get("parsed_output", {})
+# Process input: render tokens as they arrive, and the call as soon as it is complete
+if send_button and user_input.strip():
+    chat_panel.markdown("*🔄 Processing with Llama 3...*")
+    with json_panel.container():
+        render_parsed_json(None)
+    response_text = ""
+    result = {"success": False, "error": "The response ended before it was complete."}
+    for event, data in stream_chat_message(user_input.strip(), temperature):
+        if event == "token":
+            response_text += data["delta"]
+            chat_panel.markdown(response_text + "▌")
+        elif event == "json":
+            json_panel.code(format_json_output(data["value"]), language="json")
+        elif event == "done":
+            result = {"success": True, "data": data}
+        elif event == "error":
+            result = {"success": False, "error": data["detail"]}
+    st.session_state.last_response = result
 
-        if parsed_output.get("parsed_json") is not None:
-            json_str = format_json_output(parsed_output["parsed_json"])
-            st.code(json_str, language="json")
-        else:
-            st.markdown('<div class="output-container">', unsafe_allow_html=True)
-            st.markdown("*No valid JSON detected in response.*")
+# Display results
+with chat_panel.container():
+    render_chat_response(st.session_state.last_response)
 
-            if parsed_output.get("parse_error"):
-                st.markdown(
-                    f'<div class="parse-warning">⚠️ {parsed_output["parse_error"]}</div>',
-                    unsafe_allow_html=True,
-                )
-            st.markdown("</div>", unsafe_allow_html=True)
-    else:
-        st.markdown('<div class="output-container">', unsafe_allow_html=True)
-        st.markdown("*JSON output will appear here...*")
-        st.markdown("</div>", unsafe_allow_html=True)
+with json_panel.container():
+    render_parsed_json(st.session_state.last_response)
 
 
 # =============================================================================
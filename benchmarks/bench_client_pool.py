@@ -0,0 +1,93 @@
+"""
+Microbenchmark: per-request httpx client vs. the shared pooled client.
+
+Starts a fake Ollama on localhost and measures the latency of
+`call_ollama_api` against the old pattern of opening a fresh
+`httpx.AsyncClient` for every call. The fake answers instantly, so the
+numbers are pure client/connection overhead.
+
+Usage:
+    python benchmarks/bench_client_pool.py [--requests 500] [--concurrency 16]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+HOST, PORT = "127.0.0.1", 11501
+os.environ.setdefault("OLLAMA_BASE_URL", f"http://{HOST}:{PORT}")
+os.environ.setdefault("JOBS_DB_PATH", ":memory:")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app" / "backend"))
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from fake_ollama import serve_in_background  # noqa: E402
+
+PROMPT = main.format_llama3_prompt("Get weather in Tokyo")
+
+
+async def call_with_fresh_client() -> None:
+    """The pre-pooling behaviour: one AsyncClient per request."""
+    async with httpx.AsyncClient(timeout=main.REQUEST_TIMEOUT) as client:
+        response = await client.post(
+            f"{main.OLLAMA_BASE_URL}/api/generate",
+            json={"model": main.OLLAMA_MODEL, "prompt": PROMPT, "stream": False},
+        )
+        response.raise_for_status()
+        response.json()
+
+
+async def call_with_pooled_client() -> None:
+    await main.call_ollama_api(PROMPT)
+
+
+async def run(call, total: int, concurrency: int) -> list[float]:
+    """Issue `total` calls with at most `concurrency` in flight; return latencies in ms."""
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies
+
+
+def summarize(name: str, latencies: list[float], wall: float) -> str:
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    return (
+        f"{name:<14} mean={statistics.mean(latencies):7.3f}ms "
+        f"p50={statistics.median(latencies):7.3f}ms p95={p95:7.3f}ms "
+        f"rps={len(latencies) / wall:8.1f}"
+    )
+
+
+async def main_async(total: int, concurrency: int) -> None:
+    for label, call in (("fresh client", call_with_fresh_client), ("pooled client", call_with_pooled_client)):
+        await run(call, 20, concurrency)  # warm-up
+        start = time.perf_counter()
+        latencies = await run(call, total, concurrency)
+        print(summarize(label, latencies, time.perf_counter() - start))
+    await main.get_ollama_client().aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pooled vs per-request Ollama client")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    server = serve_in_background(host=HOST, port=PORT)
+    try:
+        asyncio.run(main_async(args.requests, args.concurrency))
+    finally:
+        server.should_exit = True
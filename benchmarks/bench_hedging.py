@@ -0,0 +1,129 @@
+"""
+Benchmark: tail latency and extra tokens of hedged n-best sampling.
+
+Starts a fake Ollama where a share of requests straggle (`--slow-rate`
+requests take `--slow-delay` seconds longer) and a share of unconstrained
+outputs are not valid JSON, then sends the same requests through
+`run_chat_pipeline` with:
+
+- candidates=1: no hedging
+- candidates=2 after the p95 delay: a second generation only for requests
+  slower than 95% of recent ones
+- candidates=N at once: every request pays for N generations
+
+Reports p50/p95/p99 latency, share of responses with valid JSON, and the
+extra tokens generated by losing candidates per request.
+
+Usage:
+    python benchmarks/bench_hedging.py [--requests 200] [--concurrency 4]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+HOST, PORT = "127.0.0.1", 11504
+os.environ.setdefault("OLLAMA_BASE_URL", f"http://{HOST}:{PORT}")
+os.environ.setdefault("JOBS_DB_PATH", ":memory:")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+os.environ.setdefault("ADMISSION_MAX_IN_FLIGHT", "16")
+os.environ.setdefault("ADMISSION_MAX_LIMIT", "16")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app" / "backend"))
+
+import main  # noqa: E402
+from fake_ollama import FakeOllamaConfig, serve_in_background  # noqa: E402
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+async def run_mode(
+    total: int,
+    concurrency: int,
+    candidates: int,
+    hedge_delay_ms: float | None,
+) -> dict:
+    """Send `total` requests, `concurrency` at a time; return latency and cost."""
+    latencies: list[float] = []
+    valid = extra_tokens = 0
+    pending = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal valid, extra_tokens
+        for _ in pending:
+            request = main.ChatRequest(
+                message="Get weather in Tokyo",
+                candidates=candidates,
+                hedge_delay_ms=hedge_delay_ms,
+                stop_on_json=True,
+            )
+            started = time.perf_counter()
+            response, _ = await main.run_chat_pipeline(request)
+            latencies.append(time.perf_counter() - started)
+            valid += response.parsed_output.parsed_json is not None
+            if response.hedge is not None:
+                extra_tokens += response.hedge.extra_tokens
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "valid": valid / total,
+        "extra_tokens": extra_tokens / total,
+    }
+
+
+async def main_async(total: int, concurrency: int, width: int) -> None:
+    # Fill the latency window the p95 delay is computed from
+    await run_mode(main.upstream_latency.min_samples * 5, concurrency, 1, None)
+
+    modes = (
+        ("candidates=1", 1, None),
+        ("candidates=2, p95 delay", 2, None),
+        (f"candidates={width}, no delay", width, 0.0),
+    )
+    for label, candidates, delay_ms in modes:
+        stats = await run_mode(total, concurrency, candidates, delay_ms)
+        print(
+            f"{label:<26} p50={stats['p50'] * 1000:7.1f}ms p95={stats['p95'] * 1000:7.1f}ms "
+            f"p99={stats['p99'] * 1000:7.1f}ms valid={stats['valid']:6.1%} "
+            f"extra_tokens/request={stats['extra_tokens']:5.1f}"
+        )
+    delay = main.hedge_delay(main.ChatRequest(message="x"))
+    print(f"hedge delay (p95 of upstream time): {delay * 1000:.1f}ms")
+    await main.get_ollama_client().aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hedged n-best sampling")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--candidates", type=int, default=3, help="Width of the no-delay mode")
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-delay", type=float, default=1.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.1)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    args = parser.parse_args()
+
+    server = serve_in_background(
+        FakeOllamaConfig(
+            token_delay=args.token_delay,
+            slow_rate=args.slow_rate,
+            slow_delay=args.slow_delay,
+            malformed_rate=args.malformed_rate,
+            seed=0,
+        ),
+        host=HOST,
+        port=PORT,
+    )
+    try:
+        asyncio.run(main_async(args.requests, args.concurrency, args.candidates))
+    finally:
+        server.should_exit = True
@@ -0,0 +1,107 @@
+"""
+Benchmark: single-pass JSON scanner vs. the legacy regex cascade.
+
+Runs both extractors over adversarial model outputs (deep nesting,
+unbalanced braces, ~100 KB of prose, long chatter after the JSON) and
+reports the median time per call, plus whether each extractor found a
+value at all. "stream ms" feeds the scanner 4-character chunks, as a token
+stream would; it should grow linearly with the input size. The legacy implementation is kept here
+verbatim for comparison.
+
+Usage:
+    python benchmarks/bench_json_extractor.py [--repeat 5]
+"""
+
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app" / "backend"))
+
+from json_scanner import JSONScanner, find_json  # noqa: E402
+
+CALL = (
+    '{"action": "get_weather", "parameters": {"location": "Tokyo", '
+    '"units": "metric"}, "reasoning": "User asked for the weather"}'
+)
+PROSE = "The quick brown fox jumps over the lazy dog. "
+
+
+def legacy_extract(text: str) -> dict | list | None:
+    """Pre-scanner `extract_json_from_response`, minus the ParsedOutput wrapper."""
+    json_patterns = [
+        r"```json\s*([\s\S]*?)\s*```",
+        r"```\s*([\s\S]*?)\s*```",
+        r"\{[\s\S]*\}",
+        r"\[[\s\S]*\]",
+    ]
+    for pattern in json_patterns:
+        for match in re.findall(pattern, text):
+            try:
+                return json.loads(match)
+            except (json.JSONDecodeError, RecursionError):
+                continue
+    try:
+        return json.loads(text.strip())
+    except (json.JSONDecodeError, RecursionError):
+        return None
+
+
+def scanner_extract(text: str) -> dict | list | None:
+    match = find_json(text)
+    return match.value if match else None
+
+
+def streamed_extract(text: str, chunk_size: int = 4) -> dict | list | None:
+    """Feed the scanner token-sized chunks and stop at the first value."""
+    scanner = JSONScanner()
+    for i in range(0, len(text), chunk_size):
+        if scanner.feed(text[i : i + chunk_size]):
+            return scanner.first.value
+    scanner.close()
+    match = scanner.best()
+    return match.value if match else None
+
+
+CASES = {
+    "fenced call": f"Sure, here you go:\n```json\n{CALL}\n```\nLet me know!",
+    "call + 100KB chatter": CALL + "\n" + PROSE * 2300,
+    "100KB prose, no JSON": PROSE * 2300,
+    "unbalanced braces 8KB": "{ " * 4000 + CALL,
+    "stray brackets 100KB": ("see [1] and {x} " * 6500) + CALL,
+    "unclosed braces 20KB": "{ " * 10000,
+    "unclosed brackets 20KB": "[ " * 10000,
+    "deep nesting 5k": "[" * 5000 + "1" + "]" * 5000,
+    "many small objects": '{"a": 1} ' * 10000,
+    "50KB string value": '{"text": "' + "y" * 50000 + '"}',
+    "200KB string value": '{"text": "' + "y" * 200000 + '"}',
+}
+
+
+def time_call(func, text: str, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON extractor benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'case':<24}{'size':>9}{'legacy ms':>12}{'scanner ms':>12}{'stream ms':>12}  found (legacy/scanner)")
+    for name, text in CASES.items():
+        legacy = time_call(legacy_extract, text, args.repeat)
+        scanner = time_call(scanner_extract, text, args.repeat)
+        streamed = time_call(streamed_extract, text, args.repeat)
+        found = "/".join(
+            "yes" if func(text) is not None else "no" for func in (legacy_extract, scanner_extract)
+        )
+        print(f"{name:<24}{len(text):>9}{legacy:>12.3f}{scanner:>12.3f}{streamed:>12.3f}  {found}")
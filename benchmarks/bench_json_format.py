@@ -0,0 +1,90 @@
+"""
+Benchmark: JSON parse failures and client retries with and without `format`.
+
+Starts a fake Ollama whose unconstrained responses are invalid JSON at a
+configurable rate (constrained ones never are, as with Ollama's grammar
+sampling) and sends the same requests through `run_chat_pipeline` in three
+modes: no `format`, `format: json` and `format: functions`. A simulated
+client re-submits a request whose output did not parse (or, with a function
+schema, did not validate) up to `--max-attempts` times.
+
+Reports per mode: share of responses that failed, generations needed per
+successful request (the retry cost), and the cost of schema validation
+with the cached, compiled validator.
+
+Usage:
+    python benchmarks/bench_json_format.py [--requests 500] [--malformed-rate 0.2]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+HOST, PORT = "127.0.0.1", 11503
+os.environ.setdefault("OLLAMA_BASE_URL", f"http://{HOST}:{PORT}")
+os.environ.setdefault("JOBS_DB_PATH", ":memory:")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app" / "backend"))
+
+import main  # noqa: E402
+from fake_ollama import FakeOllamaConfig, serve_in_background  # noqa: E402
+
+MODES = (("no format", None), ("format=json", "json"), ("format=functions", "functions"))
+
+
+async def run_mode(output_format: str | None, total: int, max_attempts: int) -> dict:
+    """Send `total` requests, re-submitting failed ones; return counters."""
+    generations = failures = gave_up = 0
+    for _ in range(total):
+        request = main.ChatRequest(message="Get weather in Tokyo", format=output_format)
+        for _attempt in range(max_attempts):
+            response, _ = await main.run_chat_pipeline(request)
+            generations += 1
+            parsed = response.parsed_output
+            if parsed.parsed_json is not None and not parsed.schema_errors:
+                break
+            failures += 1
+        else:
+            gave_up += 1
+    return {"generations": generations, "failures": failures, "gave_up": gave_up}
+
+
+def validation_cost_us(rounds: int = 20000) -> float:
+    """Mean time to resolve the cached function schema and validate one call."""
+    request = main.ChatRequest(message="x", format="functions")
+    value = {"action": "get_weather", "parameters": {"location": "Tokyo", "units": "metric"}}
+    start = time.perf_counter()
+    for _ in range(rounds):
+        main.resolve_output_format(request).validate(value)
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+async def main_async(total: int, max_attempts: int) -> None:
+    for label, output_format in MODES:
+        stats = await run_mode(output_format, total, max_attempts)
+        print(
+            f"{label:<18} failure_rate={stats['failures'] / stats['generations']:6.1%} "
+            f"generations/request={stats['generations'] / total:5.3f} "
+            f"gave_up={stats['gave_up']}"
+        )
+    await main.get_ollama_client().aclose()
+    print(f"schema validation (cached, compiled): {validation_cost_us():.1f} us/call")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse failures with and without format")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--malformed-rate", type=float, default=0.2)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    args = parser.parse_args()
+
+    server = serve_in_background(
+        FakeOllamaConfig(malformed_rate=args.malformed_rate, seed=0), host=HOST, port=PORT
+    )
+    try:
+        asyncio.run(main_async(args.requests, args.max_attempts))
+    finally:
+        server.should_exit = True
@@ -0,0 +1,119 @@
+"""
+Benchmark: legacy prompt submission vs. raw pre-rendered prefix + keep_alive.
+
+Starts a fake Ollama that charges for model loads and prompt evaluation and
+reuses the KV cache for the longest prefix shared with the previous prompt.
+Its default keep_alive is shortened so that an idle gap between requests
+unloads the model, as Ollama's 5 minute default does in production.
+
+Two modes send the same distinct messages with the same idle gap:
+
+- legacy: templated by Ollama, no `keep_alive` (the pre-change payload)
+- prefix reuse: `build_generate_payload` as configured (`raw` + `keep_alive`)
+
+For each mode the first (cold) and the following (warm) requests are
+reported separately: load time, prompt tokens actually evaluated, prefill
+time and end-to-end latency.
+
+Usage:
+    python benchmarks/bench_prompt_prefix.py [--requests 6] [--gap 1.5]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+HOST, PORT = "127.0.0.1", 11502
+os.environ.setdefault("JOBS_DB_PATH", ":memory:")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app" / "backend"))
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from fake_ollama import FakeOllamaConfig, serve_in_background  # noqa: E402
+
+MESSAGES = [
+    "Book a meeting with Sarah for next Tuesday at 2pm.",
+    "Get weather in Tokyo",
+    "Search for Python tutorials about asyncio",
+    "Send an email to the team saying the release is delayed",
+    "Convert 100 USD to EUR",
+    "Remind me to call the dentist tomorrow morning",
+]
+
+
+def legacy_payload(prompt: str) -> dict:
+    payload = main.build_generate_payload(prompt, 0.0, 64, stream=False)
+    payload.pop("raw", None)
+    payload.pop("keep_alive", None)
+    return payload
+
+
+def prefix_payload(prompt: str) -> dict:
+    return main.build_generate_payload(prompt, 0.0, 64, stream=False)
+
+
+async def run_mode(base_url: str, build_payload, total: int, gap: float) -> list[dict]:
+    """Send `total` sequential requests `gap` seconds apart; return Ollama's stats."""
+    samples = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        for i in range(total):
+            prompt = main.format_llama3_prompt(MESSAGES[i % len(MESSAGES)])
+            start = time.perf_counter()
+            response = await client.post("/api/generate", json=build_payload(prompt))
+            response.raise_for_status()
+            data = response.json()
+            data["latency_ms"] = (time.perf_counter() - start) * 1000
+            samples.append(data)
+            if i < total - 1:
+                await asyncio.sleep(gap)
+    return samples
+
+
+def summarize(name: str, samples: list[dict]) -> str:
+    def mean(key: str, scale: float = 1.0) -> float:
+        return statistics.mean(s[key] for s in samples) * scale
+
+    return (
+        f"{name:<24} load={mean('load_duration', 1e-6):8.1f}ms "
+        f"prompt_eval_count={mean('prompt_eval_count'):6.1f} "
+        f"prompt_eval={mean('prompt_eval_duration', 1e-6):8.1f}ms "
+        f"latency={mean('latency_ms'):8.1f}ms"
+    )
+
+
+def main_cli(total: int, gap: float, load_delay: float, prompt_eval_rate: float) -> None:
+    config = FakeOllamaConfig(
+        load_delay=load_delay,
+        prompt_eval_rate=prompt_eval_rate,
+        default_keep_alive=gap / 2,
+    )
+    print(
+        f"raw={main.OLLAMA_RAW_PROMPT} keep_alive={main.OLLAMA_KEEP_ALIVE} "
+        f"requests={total} gap={gap}s"
+    )
+    modes = (("legacy", legacy_payload), ("prefix reuse", prefix_payload))
+    for port, (label, build_payload) in enumerate(modes, start=PORT):
+        # A fresh server per mode, so both start with the model unloaded
+        server = serve_in_background(config, host=HOST, port=port)
+        try:
+            samples = asyncio.run(run_mode(f"http://{HOST}:{port}", build_payload, total, gap))
+        finally:
+            server.should_exit = True
+        print(summarize(f"{label} (first)", samples[:1]))
+        print(summarize(f"{label} (repeated)", samples[1:]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prompt prefix reuse vs legacy payload")
+    parser.add_argument("--requests", type=int, default=6)
+    parser.add_argument("--gap", type=float, default=1.5, help="Idle seconds between requests")
+    parser.add_argument("--load-delay", type=float, default=0.5)
+    parser.add_argument("--prompt-eval-rate", type=float, default=400.0)
+    args = parser.parse_args()
+
+    main_cli(args.requests, args.gap, args.load_delay, args.prompt_eval_rate)
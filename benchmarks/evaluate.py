@@ -0,0 +1,389 @@
+"""
+Evaluate function calling on a dataset and report accuracy against cost.
+
+The dataset is a JSON list (such as `sample_data.json`) or a JSONL file of
+records with an `input` message and the `expected_output` call, written as
+`{"function": ..., "arguments": {...}}` (or a list of them). Each input is
+sent with up to `--concurrency` in flight, either through the backend's
+`/chat` pipeline or, with `--ollama-url`, straight to Ollama with the
+backend's prompt template. Each result is scored on:
+
+- exact match: the same functions, in order, with identical arguments
+- function match: the same function names, in order
+- arguments: precision and recall of the expected argument values, with
+  strings compared ignoring case and surrounding whitespace
+
+The JSON report puts these next to latency percentiles and prompt and
+completion tokens per example, overall and per expected function, so runs
+with different models, quantizations or prompts can be compared on cost
+as well as quality.
+
+Every generation is appended to `--cache` as it finishes, keyed by the
+rendered prompt, the model and the generation parameters. A re-run, or a
+run resumed after an interruption, only generates for examples whose key
+is not in the cache; results are re-scored every time, so editing an
+expected output needs no generation. Failed requests are not cached.
+`--model` is part of the key: in backend mode it only labels the run, so
+pass the model the backend is configured with.
+
+Without `--url` or `--ollama-url`, a backend is started against the fake
+Ollama, which answers every prompt with the same call; that checks the
+harness rather than a model.
+
+Usage:
+    python benchmarks/evaluate.py sample_data.json --url http://localhost:8000
+    python benchmarks/evaluate.py evals.jsonl --ollama-url http://localhost:11434 \\
+        --model llama3:8b-instruct-q4_K_M --concurrency 2 --output q4.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, TextIO
+
+import httpx
+
+from load_test import BACKEND_DIR, add_fake_arguments, percentiles, target_backend, write_report
+
+os.environ.setdefault("JOBS_DB_PATH", ":memory:")
+sys.path.insert(0, str(BACKEND_DIR))
+
+import main  # noqa: E402
+from tools import extract_tool_calls  # noqa: E402
+
+
+@dataclass
+class Example:
+    input: str
+    expected: Any
+    prompt: str  # as rendered for Ollama
+    key: str = ""  # cache key
+
+
+def load_examples(path: Path) -> list[Example]:
+    """Read `input` / `expected_output` pairs from a JSON list or JSONL file."""
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".jsonl":
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        records = json.loads(text)
+    examples = []
+    for number, record in enumerate(records, 1):
+        if not isinstance(record, dict) or "input" not in record or "expected_output" not in record:
+            raise SystemExit(f"{path}: example {number} needs `input` and `expected_output`")
+        _, prompt = main.prepare_prompt(record["input"])
+        examples.append(Example(record["input"], record["expected_output"], prompt))
+    if not examples:
+        raise SystemExit(f"No examples in {path}")
+    return examples
+
+
+def cache_key(prompt: str, model: str, params: dict) -> str:
+    data = json.dumps({"prompt": prompt, "model": model, "params": params}, sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class GenerationCache:
+    """Generations of earlier runs, keyed by `cache_key`, appended to as they finish."""
+
+    def __init__(self, path: Path | None) -> None:
+        self.entries: dict[str, dict] = {}
+        self._file: TextIO | None = None
+        if path is None:
+            return
+        partial = False
+        if path.exists():
+            with path.open(encoding="utf-8") as f:
+                for line in f:
+                    # A run killed mid-write leaves a partial last line
+                    partial = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.entries[entry["key"]] = entry
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = path.open("a", encoding="utf-8")
+        if partial:
+            self._file.write("\n")
+
+    def get(self, key: str) -> dict | None:
+        return self.entries.get(key)
+
+    def add(self, entry: dict) -> None:
+        self.entries[entry["key"]] = entry
+        if self._file is not None:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+async def generate_backend(client: httpx.AsyncClient, example: Example, params: dict) -> dict:
+    started = time.perf_counter()
+    response = await client.post("/chat", json={"message": example.input, **params})
+    latency_ms = (time.perf_counter() - started) * 1000
+    if response.status_code != 200:
+        return {"error": str(response.status_code)}
+    data = response.json()
+    timings = data.get("timings") or {}
+    return {
+        "raw_text": data["response"],
+        "parsed_json": data["parsed_output"]["parsed_json"],
+        "latency_ms": round(latency_ms, 1),
+        "prompt_tokens": timings.get("prompt_eval_count"),
+        "completion_tokens": data.get("tokens_used"),
+    }
+
+
+async def generate_direct(
+    client: httpx.AsyncClient, example: Example, model: str, params: dict
+) -> dict:
+    payload = main.build_generate_payload(
+        example.prompt, params["temperature"], params["max_tokens"], stream=False
+    )
+    payload["model"] = model
+    started = time.perf_counter()
+    response = await client.post("/api/generate", json=payload)
+    latency_ms = (time.perf_counter() - started) * 1000
+    if response.status_code != 200:
+        return {"error": str(response.status_code)}
+    data = response.json()
+    text = data.get("response", "")
+    return {
+        "raw_text": text,
+        "parsed_json": main.extract_json_from_response(text).parsed_json,
+        "latency_ms": round(latency_ms, 1),
+        "prompt_tokens": data.get("prompt_eval_count"),
+        "completion_tokens": data.get("eval_count"),
+    }
+
+
+def normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.strip().casefold()
+    if isinstance(value, list):
+        return [normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    return value
+
+
+def score(expected: Any, parsed: Any) -> dict:
+    """Compare the calls in a parsed output with the expected ones."""
+    expected_calls = extract_tool_calls(expected)
+    predicted_calls = extract_tool_calls(parsed) if parsed is not None else []
+    function_match = [c.name for c in expected_calls] == [c.name for c in predicted_calls]
+    pairs = list(zip(expected_calls, predicted_calls))
+
+    def arguments(call: Any) -> dict:
+        return call.arguments if isinstance(call.arguments, dict) else {}
+
+    exact_match = function_match and all(want.arguments == got.arguments for want, got in pairs)
+    matched = 0
+    for want, got in pairs:
+        if want.name == got.name:
+            got_arguments = arguments(got)
+            matched += sum(
+                key in got_arguments and normalize(got_arguments[key]) == normalize(value)
+                for key, value in arguments(want).items()
+            )
+    return {
+        "exact_match": exact_match,
+        "function_match": function_match,
+        "arguments_matched": matched,
+        "arguments_expected": sum(len(arguments(call)) for call in expected_calls),
+        "arguments_predicted": sum(len(arguments(call)) for call in predicted_calls),
+    }
+
+
+async def evaluate(
+    url: str,
+    direct: bool,
+    examples: list[Example],
+    model: str,
+    params: dict,
+    concurrency: int,
+    cache: GenerationCache,
+) -> tuple[list[dict], float]:
+    """Generate (or look up) and score every example; return results and seconds taken."""
+    results: list[dict] = [{} for _ in examples]
+    pending = iter(range(len(examples)))
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    started = time.perf_counter()
+
+    async def worker() -> None:
+        for index in pending:
+            example = examples[index]
+            generation = cache.get(example.key)
+            cached = generation is not None
+            if generation is None:
+                try:
+                    if direct:
+                        generation = await generate_direct(client, example, model, params)
+                    else:
+                        generation = await generate_backend(client, example, params)
+                except httpx.HTTPError as e:
+                    generation = {"error": type(e).__name__}
+                if "error" not in generation:
+                    entry = {"key": example.key, "model": model, "input": example.input}
+                    cache.add({**entry, **generation})
+            result = {"input": example.input, "expected": example.expected, "cached": cached}
+            if "error" in generation:
+                result["error"] = generation["error"]
+            else:
+                result.update(
+                    parsed_json=generation["parsed_json"],
+                    latency_ms=generation["latency_ms"],
+                    prompt_tokens=generation["prompt_tokens"],
+                    completion_tokens=generation["completion_tokens"],
+                    **score(example.expected, generation["parsed_json"]),
+                )
+            results[index] = result
+
+    async with httpx.AsyncClient(base_url=url, timeout=None, limits=limits) as client:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, time.perf_counter() - started
+
+
+def summarize(results: list[dict]) -> dict:
+    """Accuracy over all results (failed requests count as wrong) and cost of the others."""
+    scored = [r for r in results if "error" not in r]
+    matched = sum(r["arguments_matched"] for r in scored)
+    expected = sum(r["arguments_expected"] for r in scored) + sum(
+        # Arguments of failed examples were all missed
+        len(call.arguments) if isinstance(call.arguments, dict) else 0
+        for r in results if "error" in r
+        for call in extract_tool_calls(r["expected"])
+    )
+    predicted = sum(r["arguments_predicted"] for r in scored)
+    precision = matched / predicted if predicted else 0.0
+    recall = matched / expected if expected else 0.0
+    exact = sum(r["exact_match"] for r in scored)
+    prompt_tokens = [r["prompt_tokens"] for r in scored if r["prompt_tokens"] is not None]
+    completion_tokens = [
+        r["completion_tokens"] for r in scored if r["completion_tokens"] is not None
+    ]
+    total_tokens = sum(prompt_tokens) + sum(completion_tokens)
+
+    def rate(count: int) -> float:
+        return round(count / len(results), 4) if results else 0.0
+
+    return {
+        "examples": len(results),
+        "exact_match": rate(exact),
+        "function_match": rate(sum(r["function_match"] for r in scored)),
+        "argument_precision": round(precision, 4),
+        "argument_recall": round(recall, 4),
+        "argument_f1": (
+            round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0
+        ),
+        "parsed_json_rate": rate(sum(r["parsed_json"] is not None for r in scored)),
+        "error_rate": rate(len(results) - len(scored)),
+        "latency_ms": percentiles([r["latency_ms"] for r in scored]),
+        "prompt_tokens_per_example": (
+            round(statistics.fmean(prompt_tokens), 1) if prompt_tokens else None
+        ),
+        "completion_tokens_per_example": (
+            round(statistics.fmean(completion_tokens), 1) if completion_tokens else None
+        ),
+        "tokens_per_exact_match": round(total_tokens / exact, 1) if exact else None,
+    }
+
+
+def build_report(results: list[dict], elapsed: float, config: dict, details: bool) -> dict:
+    by_function: dict[str, list[dict]] = defaultdict(list)
+    for result in results:
+        names = [call.name for call in extract_tool_calls(result["expected"])]
+        by_function["+".join(names) or "(none)"].append(result)
+    report = {
+        "config": config,
+        "duration_s": round(elapsed, 3),
+        "generated": sum(not r["cached"] for r in results),
+        "cached": sum(r["cached"] for r in results),
+        "errors": dict(Counter(r["error"] for r in results if "error" in r)),
+        "overall": summarize(results),
+        "by_function": {name: summarize(group) for name, group in sorted(by_function.items())},
+    }
+    if details:
+        report["results"] = results
+    return report
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description="Evaluate function calling accuracy and cost")
+    parser.add_argument("dataset", type=Path, help="JSON list or JSONL of input/expected_output")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Backend to evaluate; default starts one on a fake Ollama")
+    target.add_argument("--ollama-url", help="Send prompts straight to this Ollama")
+    parser.add_argument(
+        "--model", default=main.OLLAMA_MODEL, help="Model (sent only with --ollama-url)"
+    )
+    parser.add_argument("--concurrency", type=int, default=4, help="Examples in flight")
+    parser.add_argument("--temperature", type=float, default=0.0)
+    parser.add_argument("--max-tokens", type=int, default=512)
+    parser.add_argument(
+        "--extra", type=json.loads, default={}, help="Extra /chat fields as a JSON object"
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=Path("data/eval_cache.jsonl"),
+        help="Generation cache and checkpoint file",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Generate every example again")
+    parser.add_argument("--details", action="store_true", help="Include per-example results")
+    parser.add_argument("--output", type=Path, help="Write the report here instead of stdout")
+    parser.add_argument("--min-exact-match", type=float, help="Fail if exact match is lower")
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+    if args.ollama_url and args.extra:
+        parser.error("--extra applies to the backend, not --ollama-url")
+
+    params = {"temperature": args.temperature, "max_tokens": args.max_tokens, **args.extra}
+    examples = load_examples(args.dataset)
+    for example in examples:
+        example.key = cache_key(example.prompt, args.model, params)
+    cache = GenerationCache(None if args.no_cache else args.cache)
+    config = {
+        "url": args.ollama_url or args.url or "local",
+        "direct": bool(args.ollama_url),
+        "dataset": str(args.dataset),
+        "model": args.model,
+        "params": params,
+        "concurrency": args.concurrency,
+    }
+
+    def run(url: str, direct: bool) -> tuple[list[dict], float]:
+        return asyncio.run(
+            evaluate(url, direct, examples, args.model, params, args.concurrency, cache)
+        )
+
+    try:
+        if args.ollama_url:
+            results, elapsed = run(args.ollama_url, True)
+        else:
+            with target_backend(args, config) as url:
+                results, elapsed = run(url, False)
+    finally:
+        cache.close()
+
+    report = build_report(results, elapsed, config, args.details)
+    write_report(report, args.output)
+    if args.min_exact_match is not None and report["overall"]["exact_match"] < args.min_exact_match:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
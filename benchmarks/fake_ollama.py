@@ -0,0 +1,368 @@
+"""
+Fake Ollama server for local benchmarks.
+
+Implements just enough of the Ollama HTTP API (`/api/generate`, `/api/tags`)
+to exercise the backend without loading a model. Responses are canned
+function-call JSON, so benchmarks measure backend overhead only.
+
+Optionally simulates the costs that dominate a real server: loading the
+model after it was unloaded (`keep_alive` expiry) and prompt evaluation,
+which only pays for the tokens after the longest prefix shared with the
+previous prompt and reply (Ollama's KV-cache reuse). Non-raw prompts are
+wrapped in a chat template first, as Ollama does, and a `context` from an
+earlier non-raw response is detokenized and prepended. Like Ollama, raw
+requests ignore `context` and get none back.
+
+`malformed_rate` makes that share of responses invalid JSON (single-quoted,
+as an unconstrained model sometimes writes it) unless the request sets
+`format`, which on a real server constrains sampling to valid output.
+`slow_rate` delays that share of requests by another `slow_delay` seconds,
+the stragglers behind a latency tail.
+
+Capacity is modelled by `decode_rate` (generated tokens per second, per
+request) and `slots`, the number of requests evaluated at the same time
+(Ollama's OLLAMA_NUM_PARALLEL); further requests wait for a free slot.
+`error_rate` answers that share of requests with `error_status` and
+`stream_error_rate` breaks that share of streams off halfway with an
+`error` chunk, as Ollama reports failures after the response has started.
+
+Usage:
+    python benchmarks/fake_ollama.py --port 11500
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import re
+import threading
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+CANNED_RESPONSE = (
+    '{"action": "get_weather", "parameters": {"location": "Tokyo", '
+    '"units": "metric"}, "reasoning": "User asked for the weather in Tokyo"}'
+)
+
+
+@dataclass
+class FakeOllamaConfig:
+    """Tunable behaviour of the fake server."""
+
+    model: str = "llama3-function-calling"
+    response_text: str = CANNED_RESPONSE
+    trailing_text: str = ""  # chatter the model adds after the JSON
+    response_delay: float = 0.0
+    token_delay: float = 0.0  # seconds per generated token; overrides decode_rate
+    decode_rate: float = 0.0  # generated tokens/sec per request; 0 decodes instantly
+    slots: int = 0  # requests evaluated at once; 0 for no limit
+    load_delay: float = 0.0  # seconds to load the model when it is not resident
+    prompt_eval_rate: float = 0.0  # prompt tokens/sec; 0 evaluates instantly
+    default_keep_alive: float = 300.0  # seconds, when the request sets none
+    malformed_rate: float = 0.0  # share of responses without `format` that are not JSON
+    slow_rate: float = 0.0  # share of requests delayed by `slow_delay` on top
+    slow_delay: float = 0.0
+    error_rate: float = 0.0  # share of requests answered with `error_status`
+    error_status: int = 500
+    stream_error_rate: float = 0.0  # share of streams that fail halfway
+    seed: int | None = None
+
+    def seconds_per_token(self) -> float:
+        if self.token_delay:
+            return self.token_delay
+        return 1 / self.decode_rate if self.decode_rate else 0.0
+
+
+TEMPLATE = (
+    "<|start_header_id|>user<|end_header_id|>\n\n{prompt}<|eot_id|>"
+    "<|start_header_id|>assistant<|end_header_id|>\n\n"
+)
+
+
+def parse_keep_alive(value: str | float | None, default: float) -> float:
+    """Seconds from an Ollama keep_alive value ("5m", 300, -1 = forever)."""
+    if value is None:
+        return default
+    if isinstance(value, str):
+        units = {"s": 1, "m": 60, "h": 3600}
+        if value[-1:] in units:
+            seconds = float(value[:-1]) * units[value[-1]]
+        else:
+            seconds = float(value)
+    else:
+        seconds = float(value)
+    return float("inf") if seconds < 0 else seconds
+
+
+@dataclass
+class ModelState:
+    """Residency and KV cache of the simulated model."""
+
+    loaded_until: float = 0.0  # time.monotonic() when keep_alive expires
+    cached_tokens: tuple[str, ...] = ()
+
+
+class GenerateRequest(BaseModel):
+    """Subset of the Ollama `/api/generate` request body."""
+
+    model: str
+    prompt: str = ""
+    stream: bool = True
+    raw: bool = False
+    keep_alive: str | float | None = None
+    context: list[int] | None = None
+    format: str | dict | None = None
+    options: dict = {}
+
+
+def create_app(config: FakeOllamaConfig | None = None) -> FastAPI:
+    """Build the fake Ollama FastAPI application."""
+    config = config or FakeOllamaConfig()
+    app = FastAPI(title="Fake Ollama")
+    state = ModelState()
+    rng = random.Random(config.seed)
+    slots = asyncio.Semaphore(config.slots) if config.slots else contextlib.nullcontext()
+    token_delay = config.seconds_per_token()
+    vocabulary: dict[str, int] = {}
+    words: list[str] = []
+
+    @app.get("/api/tags")
+    async def tags() -> dict:
+        return {"models": [{"name": f"{config.model}:latest"}]}
+
+    def output_text(request: GenerateRequest) -> str:
+        text = config.response_text
+        if request.format is None and rng.random() < config.malformed_rate:
+            text = text.replace('"', "'")
+        return text + config.trailing_text
+
+    def tokenize(text: str) -> list[str]:
+        return re.findall(r"\s*\S+", text)
+
+    def encode(text: str) -> list[int]:
+        ids = []
+        for word in tokenize(text):
+            if word not in vocabulary:
+                vocabulary[word] = len(words)
+                words.append(word)
+            ids.append(vocabulary[word])
+        return ids
+
+    def full_prompt(request: GenerateRequest) -> str:
+        if request.raw:
+            return request.prompt
+        prompt = TEMPLATE.format(prompt=request.prompt)
+        if request.context:
+            prompt = "".join(words[i] for i in request.context) + prompt
+        return prompt
+
+    def context(request: GenerateRequest, text: str) -> dict[str, list[int]]:
+        """The `context` field of a final response (absent for raw prompts)."""
+        return {} if request.raw else {"context": encode(full_prompt(request) + text)}
+
+    async def load_model() -> int:
+        """Load the model unless it is resident; return the time taken (ns)."""
+        load_start = time.perf_counter_ns()
+        if time.monotonic() >= state.loaded_until:
+            state.cached_tokens = ()
+            if config.load_delay:
+                await asyncio.sleep(config.load_delay)
+        return time.perf_counter_ns() - load_start
+
+    async def evaluate_prompt(request: GenerateRequest) -> dict[str, int]:
+        """Load the model if needed and prefill the uncached part of the prompt."""
+        load_duration = await load_model()
+
+        tokens = tuple(tokenize(full_prompt(request)))
+        shared = 0
+        for cached, token in zip(state.cached_tokens, tokens):
+            if cached != token:
+                break
+            shared += 1
+        # Like llama.cpp, always evaluate at least the last prompt token
+        evaluated = max(len(tokens) - shared, 1)
+        state.cached_tokens = tokens
+
+        eval_start = time.perf_counter_ns()
+        if config.prompt_eval_rate:
+            await asyncio.sleep(evaluated / config.prompt_eval_rate)
+        return {
+            "load_duration": load_duration,
+            "prompt_eval_count": evaluated,
+            "prompt_eval_duration": time.perf_counter_ns() - eval_start,
+        }
+
+    def finish(request: GenerateRequest, text: str = "") -> None:
+        keep_alive = parse_keep_alive(request.keep_alive, config.default_keep_alive)
+        state.loaded_until = time.monotonic() + keep_alive
+        if text:
+            # The generated tokens stay in the KV cache after the prompt
+            state.cached_tokens = tuple(tokenize(full_prompt(request) + text))
+
+    async def stream_chunks(
+        request: GenerateRequest,
+        start: int,
+        prompt_stats: dict[str, int],
+    ) -> AsyncIterator[str]:
+        text = output_text(request)
+        tokens = tokenize(text)
+        fail_halfway = config.stream_error_rate and rng.random() < config.stream_error_rate
+        fail_at = len(tokens) // 2 if fail_halfway else None
+        eval_start = time.perf_counter_ns()
+        for index, token in enumerate(tokens):
+            if index == fail_at:
+                yield json.dumps({"error": "injected failure"}) + "\n"
+                return
+            if token_delay:
+                await asyncio.sleep(token_delay)
+            yield json.dumps({"model": request.model, "response": token, "done": False}) + "\n"
+        now = time.perf_counter_ns()
+        finish(request, text)
+        yield json.dumps(
+            {
+                "model": request.model,
+                "response": "",
+                "done": True,
+                **prompt_stats,
+                **context(request, text),
+                "eval_count": len(tokens),
+                "eval_duration": now - eval_start,
+                "total_duration": now - start,
+            }
+        ) + "\n"
+
+    async def stream_generation(request: GenerateRequest, start: int) -> AsyncIterator[str]:
+        async with slots:
+            prompt_stats = await evaluate_prompt(request)
+            async for chunk in stream_chunks(request, start, prompt_stats):
+                yield chunk
+
+    @app.post("/api/generate", response_model=None)
+    async def generate(request: GenerateRequest) -> dict | JSONResponse | StreamingResponse:
+        start = time.perf_counter_ns()
+        if config.error_rate and rng.random() < config.error_rate:
+            return JSONResponse({"error": "injected failure"}, status_code=config.error_status)
+        if not request.prompt:
+            # Ollama treats an empty prompt as "load the model", no generation
+            load_duration = await load_model()
+            finish(request)
+            return {
+                "model": request.model,
+                "response": "",
+                "done": True,
+                "done_reason": "load",
+                "load_duration": load_duration,
+            }
+        if config.response_delay:
+            await asyncio.sleep(config.response_delay)
+        if config.slow_delay and rng.random() < config.slow_rate:
+            await asyncio.sleep(config.slow_delay)
+        if request.stream:
+            # The slot is taken inside the stream, so it is held until the last chunk
+            return StreamingResponse(
+                stream_generation(request, start),
+                media_type="application/x-ndjson",
+            )
+        async with slots:
+            prompt_stats = await evaluate_prompt(request)
+            text = output_text(request)
+            tokens = tokenize(text)
+            eval_start = time.perf_counter_ns()
+            if token_delay:
+                await asyncio.sleep(token_delay * len(tokens))
+            now = time.perf_counter_ns()
+            finish(request, text)
+        return {
+            "model": request.model,
+            "response": text,
+            "done": True,
+            **prompt_stats,
+            **context(request, text),
+            "eval_count": len(tokens),
+            "eval_duration": now - eval_start,
+            "total_duration": now - start,
+        }
+
+    return app
+
+
+def serve_in_background(
+    config: FakeOllamaConfig | None = None,
+    host: str = "127.0.0.1",
+    port: int = 11500,
+) -> uvicorn.Server:
+    """
+    Start the fake server on a daemon thread and wait until it accepts requests.
+
+    Returns:
+        The running uvicorn server (set `should_exit = True` to stop it)
+    """
+    server = uvicorn.Server(
+        uvicorn.Config(create_app(config), host=host, port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds per response")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds per token")
+    parser.add_argument(
+        "--decode-rate", type=float, default=0.0, help="Generated tokens/sec (0 = instant)"
+    )
+    parser.add_argument("--slots", type=int, default=0, help="Parallel requests (0 = no limit)")
+    parser.add_argument("--load-delay", type=float, default=0.0, help="Model load seconds")
+    parser.add_argument(
+        "--prompt-eval-rate", type=float, default=0.0, help="Prompt tokens/sec (0 = instant)"
+    )
+    parser.add_argument(
+        "--malformed-rate", type=float, default=0.0, help="Share of non-JSON responses"
+    )
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of slow requests")
+    parser.add_argument(
+        "--slow-delay", type=float, default=0.0, help="Extra seconds for a slow request"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Share of requests that fail"
+    )
+    parser.add_argument("--error-status", type=int, default=500, help="Status of a failure")
+    parser.add_argument(
+        "--stream-error-rate", type=float, default=0.0, help="Share of streams that fail halfway"
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    uvicorn.run(
+        create_app(
+            FakeOllamaConfig(
+                response_delay=args.delay,
+                token_delay=args.token_delay,
+                decode_rate=args.decode_rate,
+                slots=args.slots,
+                load_delay=args.load_delay,
+                prompt_eval_rate=args.prompt_eval_rate,
+                malformed_rate=args.malformed_rate,
+                slow_rate=args.slow_rate,
+                slow_delay=args.slow_delay,
+                error_rate=args.error_rate,
+                error_status=args.error_status,
+                stream_error_rate=args.stream_error_rate,
+                seed=args.seed,
+            )
+        ),
+        host=args.host,
+        port=args.port,
+    )
@@ -0,0 +1,368 @@
+"""
+Load test: replay prompts against `/chat` and report latency as JSON.
+
+Prompts come from a JSON list (such as `sample_data.json`) or a JSONL
+file. Each record contributes its `message`, `input` or `prompt` field, or
+the record itself if it is a string. Requests are sent either at a fixed
+rate (`--rps`) or by a fixed number of workers (`--concurrency`). They
+stop after `--requests` requests or after `--duration` seconds.
+
+- `--rps`: open loop. Arrivals do not wait for responses, so overload shows
+  up as growing latency.
+- `--concurrency`: closed loop. Each worker sends its next request once the
+  previous one is answered.
+
+Without `--url`, the backend is started as a subprocess against an
+in-process fake Ollama (`fake_ollama.py`), so a run measures the backend
+alone and needs no model, which makes it suitable for CI. The fake's
+model costs, slots and injected errors are set with the `--fake-*` flags.
+
+With `--stream`, requests go to `/chat/stream` and time to first token is
+measured by the client at the first `token` event. Otherwise it is the
+server-reported `timings.time_to_first_token_ms`.
+
+The JSON report (stdout, or `--output`) holds:
+
+- throughput
+- latency and TTFT percentiles
+- tokens per second
+- the share of responses with parsed JSON
+- errors by status
+
+`--max-error-rate` and `--max-p95-ms` make the exit status 1 when they are
+exceeded.
+
+Usage:
+    python benchmarks/load_test.py --prompts sample_data.json --concurrency 8 --requests 200
+    python benchmarks/load_test.py --url http://localhost:8000 --rps 5 --duration 60 --stream
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+
+from fake_ollama import FakeOllamaConfig, serve_in_background
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "app" / "backend"
+FAKE_HOST, FAKE_PORT = "127.0.0.1", 11505
+BACKEND_PORT = 18000
+DEFAULT_PROMPTS = ["Get weather in Tokyo"]
+
+
+@dataclass
+class Sample:
+    """Outcome of one request."""
+
+    latency_ms: float
+    error: str | None = None  # status code or exception name
+    ttft_ms: float | None = None
+    tokens: int | None = None
+    parsed_json: bool = False
+
+
+def load_prompts(path: Path | None) -> list[str]:
+    """Read prompts from a JSON list or JSONL file."""
+    if path is None:
+        return DEFAULT_PROMPTS
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".jsonl":
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        records = json.loads(text)
+    prompts = []
+    for record in records:
+        if isinstance(record, dict):
+            record = next(
+                (record[key] for key in ("message", "input", "prompt") if key in record), None
+            )
+        if isinstance(record, str) and record.strip():
+            prompts.append(record)
+    if not prompts:
+        raise SystemExit(f"No prompts found in {path}")
+    return prompts
+
+
+async def send_chat(client: httpx.AsyncClient, body: dict) -> Sample:
+    started = time.perf_counter()
+    try:
+        response = await client.post("/chat", json=body)
+    except httpx.HTTPError as e:
+        return Sample((time.perf_counter() - started) * 1000, error=type(e).__name__)
+    latency_ms = (time.perf_counter() - started) * 1000
+    if response.status_code != 200:
+        return Sample(latency_ms, error=str(response.status_code))
+    data = response.json()
+    timings = data.get("timings") or {}
+    return Sample(
+        latency_ms,
+        ttft_ms=timings.get("time_to_first_token_ms"),
+        tokens=data.get("tokens_used"),
+        parsed_json=data["parsed_output"]["parsed_json"] is not None,
+    )
+
+
+async def send_chat_stream(client: httpx.AsyncClient, body: dict) -> Sample:
+    started = time.perf_counter()
+    ttft_ms = None
+    event = None
+    try:
+        async with client.stream("POST", "/chat/stream", json=body) as response:
+            if response.status_code != 200:
+                return Sample(
+                    (time.perf_counter() - started) * 1000, error=str(response.status_code)
+                )
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                    if event == "token" and ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                elif line.startswith("data: ") and event in ("done", "error"):
+                    data = json.loads(line[len("data: "):])
+                    latency_ms = (time.perf_counter() - started) * 1000
+                    if event == "error":
+                        return Sample(latency_ms, error=str(data["status_code"]), ttft_ms=ttft_ms)
+                    return Sample(
+                        latency_ms,
+                        ttft_ms=ttft_ms,
+                        tokens=data.get("tokens_used"),
+                        parsed_json=data["parsed_output"]["parsed_json"] is not None,
+                    )
+    except httpx.HTTPError as e:
+        return Sample((time.perf_counter() - started) * 1000, error=type(e).__name__)
+    return Sample((time.perf_counter() - started) * 1000, error="incomplete_stream")
+
+
+async def run_load(
+    url: str,
+    prompts: list[str],
+    total: int | None,
+    duration: float | None,
+    rps: float | None,
+    concurrency: int,
+    stream: bool,
+    extra: dict,
+) -> tuple[list[Sample], float]:
+    """Send the load; return the samples and the wall-clock seconds it took."""
+    send = send_chat_stream if stream else send_chat
+    samples: list[Sample] = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    started = time.perf_counter()
+
+    def bodies():
+        index = 0
+        while (total is None or index < total) and (
+            duration is None or time.perf_counter() - started < duration
+        ):
+            yield {"message": prompts[index % len(prompts)], **extra}
+            index += 1
+
+    async def record(body: dict) -> None:
+        samples.append(await send(client, body))
+
+    async with httpx.AsyncClient(base_url=url, timeout=None, limits=limits) as client:
+        if rps:
+            tasks = []
+            for index, body in enumerate(bodies()):
+                delay = started + index / rps - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(record(body)))
+            await asyncio.gather(*tasks)
+        else:
+            pending = bodies()
+
+            async def worker() -> None:
+                for body in pending:
+                    await record(body)
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+def percentiles(values: list[float]) -> dict[str, float] | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def at(q: float) -> float:
+        return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)], 1)
+
+    return {
+        "mean": round(statistics.fmean(ordered), 1),
+        "p50": at(0.50),
+        "p95": at(0.95),
+        "p99": at(0.99),
+        "max": round(ordered[-1], 1),
+    }
+
+
+def build_report(samples: list[Sample], elapsed: float, config: dict) -> dict:
+    succeeded = [s for s in samples if s.error is None]
+    tokens = sum(s.tokens or 0 for s in succeeded)
+    return {
+        "config": config,
+        "requests": len(samples),
+        "succeeded": len(succeeded),
+        "error_rate": round(1 - len(succeeded) / len(samples), 4) if samples else 0.0,
+        "errors": dict(Counter(s.error for s in samples if s.error is not None)),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(succeeded) / elapsed, 2) if elapsed else 0.0,
+        "tokens_per_second": round(tokens / elapsed, 1) if elapsed else 0.0,
+        "parsed_json_rate": (
+            round(sum(s.parsed_json for s in succeeded) / len(succeeded), 4) if succeeded else 0.0
+        ),
+        "latency_ms": percentiles([s.latency_ms for s in succeeded]),
+        "ttft_ms": percentiles([s.ttft_ms for s in succeeded if s.ttft_ms is not None]),
+    }
+
+
+def start_backend(port: int, env: dict[str, str]) -> subprocess.Popen:
+    """Run the backend with uvicorn and wait until it answers /health."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)]
+        + ["--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Backend exited with status {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise SystemExit("Backend did not start within 30 seconds")
+
+
+def add_fake_arguments(parser: argparse.ArgumentParser) -> None:
+    fake = parser.add_argument_group("fake Ollama (without --url)")
+    fake.add_argument("--fake-load-delay", type=float, default=0.0)
+    fake.add_argument("--fake-prompt-eval-rate", type=float, default=1000.0)
+    fake.add_argument("--fake-decode-rate", type=float, default=100.0)
+    fake.add_argument("--fake-slots", type=int, default=4)
+    fake.add_argument("--fake-error-rate", type=float, default=0.0)
+    fake.add_argument("--fake-stream-error-rate", type=float, default=0.0)
+
+
+@contextmanager
+def target_backend(args: argparse.Namespace, config: dict) -> Iterator[str]:
+    """
+    Yield the URL of the backend to test: `args.url`, or one started for the
+    run against the fake Ollama (whose settings are added to `config`).
+    """
+    if args.url:
+        yield args.url
+        return
+
+    fake_config = FakeOllamaConfig(
+        load_delay=args.fake_load_delay,
+        prompt_eval_rate=args.fake_prompt_eval_rate,
+        decode_rate=args.fake_decode_rate,
+        slots=args.fake_slots,
+        error_rate=args.fake_error_rate,
+        stream_error_rate=args.fake_stream_error_rate,
+        seed=0,
+    )
+    config["fake_ollama"] = vars(fake_config)
+    fake_server = serve_in_background(fake_config, host=FAKE_HOST, port=FAKE_PORT)
+    try:
+        backend = start_backend(
+            BACKEND_PORT,
+            {
+                "OLLAMA_BASE_URL": f"http://{FAKE_HOST}:{FAKE_PORT}",
+                "RATE_LIMIT_ENABLED": "false",  # all load comes from one client
+                "JOBS_DB_PATH": ":memory:",
+            },
+        )
+        try:
+            yield f"http://127.0.0.1:{BACKEND_PORT}"
+        finally:
+            backend.terminate()
+            backend.wait()
+    finally:
+        fake_server.should_exit = True
+
+
+def write_report(report: dict, output: Path | None) -> None:
+    text = json.dumps(report, indent=2)
+    if output:
+        output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the chat endpoint")
+    parser.add_argument("--url", help="Backend to test; default starts one against a fake Ollama")
+    parser.add_argument("--prompts", type=Path, help="JSON list or JSONL file of prompts")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--rps", type=float, help="Open loop: requests per second")
+    mode.add_argument("--concurrency", type=int, default=4, help="Closed loop: parallel workers")
+    parser.add_argument("--requests", type=int, help="Requests to send (default 100)")
+    parser.add_argument("--duration", type=float, help="Seconds to send requests for")
+    parser.add_argument("--stream", action="store_true", help="Use /chat/stream")
+    parser.add_argument(
+        "--extra", type=json.loads, default={}, help="Extra request fields as a JSON object"
+    )
+    parser.add_argument("--output", type=Path, help="Write the report here instead of stdout")
+    parser.add_argument("--max-error-rate", type=float, help="Fail if the error rate is higher")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail if p95 latency is higher")
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+
+    total = args.requests if args.requests or args.duration else 100
+    prompts = load_prompts(args.prompts)
+    config = {
+        "url": args.url or "local",
+        "mode": f"rps={args.rps}" if args.rps else f"concurrency={args.concurrency}",
+        "requests": total,
+        "duration": args.duration,
+        "stream": args.stream,
+        "prompts": len(prompts),
+        "extra": args.extra,
+    }
+
+    with target_backend(args, config) as url:
+        samples, elapsed = asyncio.run(
+            run_load(
+                url,
+                prompts,
+                total,
+                args.duration,
+                args.rps,
+                args.concurrency,
+                args.stream,
+                args.extra,
+            )
+        )
+
+    report = build_report(samples, elapsed, config)
+    failures = []
+    if args.max_error_rate is not None and report["error_rate"] > args.max_error_rate:
+        failures.append(f"error rate {report['error_rate']} > {args.max_error_rate}")
+    p95 = report["latency_ms"]["p95"] if report["latency_ms"] else None
+    if args.max_p95_ms is not None and (p95 is None or p95 > args.max_p95_ms):
+        failures.append(f"p95 latency {p95} ms > {args.max_p95_ms} ms")
+    report["failures"] = failures
+    write_report(report, args.output)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
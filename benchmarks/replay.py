@@ -0,0 +1,124 @@
+"""
+Replay captured traffic against a backend at its original pace or faster.
+
+Reads a capture written by the backend with CAPTURE_PATH set and sends each
+request to the endpoint it originally hit (`/chat` or `/chat/stream`). The
+gaps between arrivals are kept, divided by `--speed`, so `--speed 2`
+replays twice as fast. Requests are sent on schedule whether or not
+earlier ones have finished, so production bursts reach the backend as
+bursts. Entries captured with CAPTURE_MESSAGES=false get a filler message
+of the recorded size.
+
+As in `load_test.py`, the target is `--url` or a backend started for the
+run against the fake Ollama. The JSON report has the same fields as a load
+test, plus the latency and error rate the requests originally had, and how
+far dispatch fell behind the schedule (if it did, the replay machine rather
+than the backend was the bottleneck).
+
+Usage:
+    python benchmarks/replay.py data/capture.jsonl --speed 4
+    python benchmarks/replay.py capture.jsonl --url http://staging:8000 --limit 1000
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from load_test import (
+    Sample,
+    add_fake_arguments,
+    build_report,
+    percentiles,
+    send_chat,
+    send_chat_stream,
+    target_backend,
+    write_report,
+)
+
+
+def load_capture(path: Path, limit: int | None) -> list[dict]:
+    """Captured entries in arrival order."""
+    with path.open(encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    entries.sort(key=lambda entry: entry["ts"])
+    return entries[:limit] if limit else entries
+
+
+def request_body(entry: dict) -> dict:
+    body = dict(entry["request"])
+    message_tokens = body.pop("message_tokens", None)
+    if "message" not in body:
+        body["message"] = "word " * max(message_tokens or 1, 1)  # ~4 characters per token
+    return body
+
+
+async def replay(
+    url: str,
+    entries: list[dict],
+    speed: float,
+) -> tuple[list[Sample], list[float], float]:
+    """Send the entries on schedule; return samples, dispatch lags (ms) and seconds taken."""
+    samples: list[Sample] = []
+    lags: list[float] = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    first = entries[0]["ts"]
+    started = time.perf_counter()
+
+    async def send(entry: dict) -> None:
+        sender = send_chat_stream if entry["endpoint"] == "chat_stream" else send_chat
+        samples.append(await sender(client, request_body(entry)))
+
+    async with httpx.AsyncClient(base_url=url, timeout=None, limits=limits) as client:
+        tasks = []
+        for entry in entries:
+            delay = started + (entry["ts"] - first) / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lags.append(max(-delay, 0.0) * 1000)
+            tasks.append(asyncio.create_task(send(entry)))
+        await asyncio.gather(*tasks)
+    return samples, lags, time.perf_counter() - started
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay captured traffic")
+    parser.add_argument("capture", type=Path, help="JSONL file written with CAPTURE_PATH")
+    parser.add_argument("--url", help="Backend to replay against; default starts one")
+    parser.add_argument("--speed", type=float, default=1.0, help="2 replays twice as fast")
+    parser.add_argument("--limit", type=int, help="Replay only the first N requests")
+    parser.add_argument("--output", type=Path, help="Write the report here instead of stdout")
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+
+    entries = load_capture(args.capture, args.limit)
+    if not entries:
+        raise SystemExit(f"No requests in {args.capture}")
+    captured_span = entries[-1]["ts"] - entries[0]["ts"]
+    config = {
+        "url": args.url or "local",
+        "capture": str(args.capture),
+        "requests": len(entries),
+        "speed": args.speed,
+    }
+
+    with target_backend(args, config) as url:
+        samples, lags, elapsed = asyncio.run(replay(url, entries, args.speed))
+
+    report = build_report(samples, elapsed, config)
+    report["captured"] = {
+        "duration_s": round(captured_span, 3),
+        "error_rate": round(sum(e["status"] != 200 for e in entries) / len(entries), 4),
+        "latency_ms": percentiles([e["latency_ms"] for e in entries if e["status"] == 200]),
+    }
+    report["dispatch_lag_ms"] = percentiles(lags)
+    write_report(report, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())